@@ -0,0 +1,65 @@
+"""
+Compares two benchmark result files written by run.py.
+
+A benchmark is flagged as a regression when its rate drops by more than the threshold,
+and full-game benchmarks are flagged when their turn counts differ, which means the
+games played out differently. The exit status is 1 if anything was flagged.
+
+Usage:
+    python benchmarks/compare.py baseline.json results.json --threshold 0.1
+"""
+import argparse
+import json
+import sys
+
+
+def compare(baseline: dict, results: dict, threshold: float) -> list:
+    """
+    Compares two sets of benchmark results.
+
+    Args:
+        baseline (dict): The results to compare against.
+        results (dict): The new results.
+        threshold (float): The allowed relative drop in rate.
+
+    Returns:
+        list: (name, baseline rate, new rate, flag) for every shared benchmark, where
+            flag is "", "slower" or "changed".
+    """
+    rows = []
+    for name, new in results["benchmarks"].items():
+        old = baseline["benchmarks"].get(name)
+        if old is None:
+            continue
+        flag = ""
+        if new["per_second"] < (1 - threshold) * old["per_second"]:
+            flag = "slower"
+        if "turns" in new and new.get("games") == old.get("games"):
+            if new["turns"] != old["turns"]:
+                flag = "changed"
+        rows.append((name, old["per_second"], new["per_second"], flag))
+    return rows
+
+
+def main(argv=None):
+    """Compares benchmark files from the command line."""
+    parser = argparse.ArgumentParser(description="Compare two benchmark results.")
+    parser.add_argument("baseline")
+    parser.add_argument("results")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    with open(args.baseline, encoding="utf-8") as file:
+        baseline = json.load(file)
+    with open(args.results, encoding="utf-8") as file:
+        results = json.load(file)
+
+    rows = compare(baseline, results, args.threshold)
+    for name, old, new, flag in rows:
+        print(f"{name:>24}: {old:14.1f} -> {new:14.1f} /s ({new / old:6.2f}x) {flag}")
+    if any(flag for *_, flag in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
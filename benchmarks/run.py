@@ -0,0 +1,248 @@
+"""
+Benchmarks for the engine hot paths and for full-game throughput.
+
+Every benchmark reports a per_second rate, so two result files can be compared with
+compare.py. The full games are seeded, so their turn counts only change if the rules or
+the agents change.
+
+Usage:
+    python benchmarks/run.py --output results.json
+    python benchmarks/compare.py baseline.json results.json
+"""
+from typing import Callable, Dict, List
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "notebooks")
+)
+
+# pylint: disable=wrong-import-position
+import call_my_bluff as cmb
+from call_my_bluff import __main__ as cli
+from call_my_bluff import tournament
+from people_agents.matthew_agent_v0 import MatthewAgentV0
+
+# the benchmarks time the engine internals on purpose
+# pylint: disable=protected-access
+
+SEED = 0
+LINEUP = (cmb.agents.MaxAgent, cmb.agents.SimpleAgent, MatthewAgentV0)
+GAMES_PER_TABLE_SIZE = {2: 400, 3: 300, 6: 100, 12: 40}
+STARTUP_STATEMENTS = {
+    "startup_import_package": "import call_my_bluff",
+    "startup_import_rules": "import call_my_bluff.rules",
+    "startup_import_game": "import call_my_bluff.game",
+    "startup_cli_help": (
+        "import sys; sys.argv = ['call_my_bluff', '--help']; "
+        "import runpy; runpy.run_module('call_my_bluff', run_name='__main__')"
+    ),
+}
+
+
+def time_calls(function: Callable, number: int, repeat: int = 5) -> float:
+    """
+    Returns the best time per call of function() over several runs.
+
+    Args:
+        function (Callable): The function to time.
+        number (int): The number of calls per run.
+        repeat (int): The number of runs.
+
+    Returns:
+        float: The best time per call, in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def time_each(function: Callable, make_inputs: Callable, repeat: int = 5) -> float:
+    """
+    Returns the best time per call of function(x) over fresh lists of inputs.
+
+    This is for functions that change their input, so each input is used once.
+
+    Args:
+        function (Callable): The function to time.
+        make_inputs (Callable): Builds the list of inputs for one run.
+        repeat (int): The number of runs.
+
+    Returns:
+        float: The best time per call, in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        inputs = make_inputs()
+        start = time.perf_counter()
+        for value in inputs:
+            function(value)
+        best = min(best, (time.perf_counter() - start) / len(inputs))
+    return best
+
+
+def _mid_round_state(num_players: int, num_bets: int, seed: int) -> cmb.game.State:
+    state = cmb.game.initialize_game(num_players, seed=seed)
+    for index in range(num_bets):
+        action = cmb.game.Action(
+            type=cmb.game.ActionType.BET, bet=cmb.game.Bet(index=index)
+        )
+        state = cmb.game.player_action(state, action)
+    return state
+
+
+def _calls_to_settle(number: int) -> List[cmb.game.State]:
+    return [_mid_round_state(3, 6, seed) for seed in range(number)]
+
+
+def micro_benchmarks(scale: float) -> Dict[str, float]:
+    """
+    Times the engine hot paths.
+
+    Args:
+        scale (float): Multiplies the number of calls per run.
+
+    Returns:
+        Dict[str, float]: Seconds per call for each benchmark.
+    """
+    number = max(int(20000 * scale), 1)
+    bet = cmb.game.Bet(index=57)
+    bet_indices = np.arange(cmb.game.MAX_BET_INDEX + 1)
+    state = _mid_round_state(3, 6, SEED)
+    reroll_action = cmb.game.Action(
+        type=cmb.game.ActionType.REROLL_BET,
+        bet=cmb.game.Bet(index=50),
+        dice_to_lock=[True, False, True, False, False],
+    )
+    no_locks = [False] * cmb.game.NUM_DICE
+    round_state = cmb.game.initialize_game(6, seed=SEED)
+
+    return {
+        "bet_from_index": time_calls(lambda: cmb.game.Bet(index=57), number),
+        "bet_from_value": time_calls(
+            lambda: cmb.game.Bet(num_dice=7, dice_value=3), number
+        ),
+        "bet_properties": time_calls(lambda: (bet.num_dice, bet.dice_value), number),
+        "bet_index_to_bet_110": time_calls(
+            lambda: cmb.game.bet_index_to_bet(bet_indices), number // 10
+        ),
+        "player_observation": time_calls(
+            lambda: cmb.game.player_observation(state), number // 4
+        ),
+        "validate_action": time_calls(
+            lambda: cmb.game._validate_action(state, reroll_action), number
+        ),
+        "call": time_each(
+            cmb.game._call, lambda: _calls_to_settle(max(number // 20, 1))
+        ),
+        "reroll": time_calls(lambda: cmb.game._reroll(state, no_locks), number // 4),
+        "new_round": time_calls(lambda: cmb.game.new_round(round_state), number // 10),
+        "fork": time_calls(lambda: cmb.game.fork(state), number // 4),
+    }
+
+
+def game_benchmarks(scale: float) -> Dict[str, Dict[str, float]]:
+    """
+    Plays seeded games with the benchmark lineup at several table sizes.
+
+    Args:
+        scale (float): Multiplies the number of games per table size.
+
+    Returns:
+        Dict[str, Dict[str, float]]: The games, turns and seconds for each table size.
+    """
+    results = {}
+    for num_players, num_games in GAMES_PER_TABLE_SIZE.items():
+        num_games = max(int(num_games * scale), 1)
+        agents = [LINEUP[player % len(LINEUP)]() for player in range(num_players)]
+        turns = 0
+        start = time.perf_counter()
+        for game_index in range(num_games):
+            result = tournament.play_game(
+                agents, seed=tournament.game_seed(SEED, game_index)
+            )
+            turns += result.num_turns
+        seconds = time.perf_counter() - start
+        results[f"games_{num_players}_players"] = {
+            "games": num_games,
+            "turns": turns,
+            "seconds": seconds,
+        }
+    return results
+
+
+def startup_benchmarks() -> Dict[str, float]:
+    """
+    Times the cold start of fresh interpreters that import the package.
+
+    Returns:
+        Dict[str, float]: Seconds per start for each benchmark.
+    """
+    return {
+        name: cli.startup_seconds(statement)
+        for name, statement in STARTUP_STATEMENTS.items()
+    }
+
+
+def run(scale: float = 1.0) -> dict:
+    """
+    Runs every benchmark.
+
+    Args:
+        scale (float): Multiplies the amount of work, use less than 1 for a quick run.
+
+    Returns:
+        dict: The machine-readable results.
+    """
+    benchmarks = {}
+    for name, seconds in micro_benchmarks(scale).items():
+        benchmarks[name] = {"seconds_per_call": seconds, "per_second": 1 / seconds}
+    for name, seconds in startup_benchmarks().items():
+        benchmarks[name] = {"seconds_per_call": seconds, "per_second": 1 / seconds}
+    for name, result in game_benchmarks(scale).items():
+        result["per_second"] = result["games"] / result["seconds"]
+        benchmarks[name] = result
+    return {
+        "metadata": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "scale": scale,
+            "seed": SEED,
+        },
+        "benchmarks": benchmarks,
+    }
+
+
+def main(argv=None):
+    """Runs the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description="Run the call_my_bluff benchmarks.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="Multiply the amount of work."
+    )
+    args = parser.parse_args(argv)
+
+    results = run(args.scale)
+    for name, result in results["benchmarks"].items():
+        print(f"{name:>24}: {result['per_second']:14.1f} /s")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,44 @@
 """
 This is the call_my_bluff package.
+
+Submodules are imported the first time they are used, so importing the package does not
+import NumPy. Tools that only need bets and actions can use call_my_bluff.rules.
 """
+import importlib
 
 # from .game import *
 # from .agents import *
 
-from . import game
-from . import agents
+_SUBMODULES = (
+    "agents",
+    "batched",
+    "cfr",
+    "env",
+    "evaluate",
+    "features",
+    "game",
+    "instrument",
+    "league",
+    "probability",
+    "replay",
+    "rules",
+    "search",
+    "server",
+    "tournament",
+)
+
+__all__ = list(_SUBMODULES)
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        # importing a submodule also sets it as an attribute of the package
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
+
 
 # from .game3 import Game, bet_index_to_bet, bet_to_bet_index
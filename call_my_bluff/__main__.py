@@ -0,0 +1,199 @@
+"""
+The command line interface of the call_my_bluff package.
+
+Each command imports only the modules it needs, so starting a command stays cheap.
+
+Usage:
+    python -m call_my_bluff play MaxAgent SimpleAgent --seed 0
+    python -m call_my_bluff simulate MaxAgent SimpleAgent --games 10000
+    python -m call_my_bluff replay games.cmbr
+    python -m call_my_bluff merge shard0.json shard1.json --output merged.json
+    python -m call_my_bluff bench MaxAgent SimpleAgent --games 1000
+"""
+from typing import List, Optional
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+DEFAULT_LINEUP = ["MaxAgent", "SimpleAgent"]
+STARTUP_STATEMENT = "import call_my_bluff.rules"
+
+
+def play(args):
+    """Plays one game and prints every turn."""
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+
+    from call_my_bluff import game
+    from call_my_bluff import tournament
+
+    agents = [tournament.load_agent(spec)() for spec in args.agents or DEFAULT_LINEUP]
+    # Agents draw from the global NumPy random state, seeded like tournament.play_game
+    random_state = np.random.get_state()
+    if args.seed is not None:
+        np.random.seed(args.seed)
+    try:
+        state = game.initialize_game(len(agents), seed=args.seed)
+        while not game.game_over(state):
+            observation = game.player_observation(state)
+            action = agents[state.player_curr].policy(observation)
+            state = game.player_action(state, action)
+            game.render(state)
+            if game.round_over(state) and not game.game_over(state):
+                state = game.new_round(state)
+    finally:
+        np.random.set_state(random_state)
+    print(f"Agent {type(agents[state.player_curr]).__name__} wins.")
+
+
+def simulate(args):
+    """Plays a tournament, see python -m call_my_bluff.tournament."""
+    # pylint: disable=import-outside-toplevel
+    from call_my_bluff import tournament
+
+    tournament.main(args.arguments)
+
+
+def replay(args):
+    """Checks the games of a replay file and prints their winners."""
+    # pylint: disable=import-outside-toplevel
+    from call_my_bluff import replay as replay_module
+
+    reader = replay_module.ReplayReader(args.path)
+    games = range(reader.num_games) if args.game is None else [args.game]
+    for game_index in games:
+        state = reader.replay(game_index)
+        print(f"Game {game_index}: player {state.player_curr} wins.")
+    print(f"{len(games)} of {reader.num_games} games replayed.")
+
+
+def merge(args):
+    """Merges the result files of tournament shards and prints the report."""
+    # pylint: disable=import-outside-toplevel
+    from call_my_bluff import tournament
+
+    try:
+        merged = tournament.merge_shards(args.paths)
+    except (OSError, ValueError) as error:
+        sys.exit(f"merge: {error}")
+    if args.output:
+        merged.save(args.output)
+    if not merged.complete:
+        missing = sorted(set(range(merged.shard_count)) - set(merged.shards))
+        print(f"Missing shards: {missing}", file=sys.stderr)
+    tournament.print_result(merged.result)
+
+
+def startup_seconds(statement: str = STARTUP_STATEMENT, repeat: int = 5) -> float:
+    """
+    Returns the best time to start a fresh interpreter and run a statement.
+
+    The interpreter imports this copy of call_my_bluff whatever the working directory,
+    and its output is discarded.
+
+    Args:
+        statement (str): The statement to run, usually an import.
+        repeat (int): The number of interpreters to start.
+
+    Returns:
+        float: The best time, in seconds.
+    """
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    python_path = os.environ.get("PYTHONPATH")
+    if python_path:
+        package_root = os.pathsep.join([package_root, python_path])
+    env = {**os.environ, "PYTHONPATH": package_root}
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", statement],
+            check=True,
+            env=env,
+            stdout=subprocess.DEVNULL,
+        )
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench(args):
+    """Measures the cold start time and the game throughput."""
+    print(f"python -c pass: {startup_seconds('pass') * 1e3:.1f} ms")
+    for statement in (
+        "import call_my_bluff",
+        "import call_my_bluff.rules",
+        "import call_my_bluff.game",
+    ):
+        print(f"python -c '{statement}': {startup_seconds(statement) * 1e3:.1f} ms")
+
+    # pylint: disable=import-outside-toplevel
+    from call_my_bluff import tournament
+
+    agent_factories = [
+        tournament.load_agent(spec) for spec in args.agents or DEFAULT_LINEUP
+    ]
+    start = time.perf_counter()
+    result = tournament.run_tournament(
+        agent_factories,
+        args.games,
+        num_workers=1,
+        seed=args.seed,
+    )
+    seconds = time.perf_counter() - start
+    print(
+        f"{result.num_games} games in {seconds:.2f} s: "
+        f"{result.num_games / seconds:.0f} games/s, "
+        f"{result.num_turns / seconds:.0f} turns/s"
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    """Runs a command from the command line."""
+    parser = argparse.ArgumentParser(
+        prog="python -m call_my_bluff", description=__doc__.split("\n")[1]
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    play_parser = commands.add_parser("play", help=play.__doc__)
+    play_parser.add_argument(
+        "agents", nargs="*", help="Agent class names or module:Class specs."
+    )
+    play_parser.add_argument("--seed", type=int, default=None)
+    play_parser.set_defaults(handler=play)
+
+    simulate_parser = commands.add_parser(
+        "simulate", help=simulate.__doc__, add_help=False
+    )
+    simulate_parser.add_argument("arguments", nargs=argparse.REMAINDER)
+    simulate_parser.set_defaults(handler=simulate)
+
+    replay_parser = commands.add_parser("replay", help=replay.__doc__)
+    replay_parser.add_argument("path", help="The replay file.")
+    replay_parser.add_argument(
+        "--game", type=int, default=None, help="Only replay this game."
+    )
+    replay_parser.set_defaults(handler=replay)
+
+    merge_parser = commands.add_parser("merge", help=merge.__doc__)
+    merge_parser.add_argument("paths", nargs="+", help="The shard result files.")
+    merge_parser.add_argument(
+        "--output", metavar="FILE", help="Also write the merged result to this file."
+    )
+    merge_parser.set_defaults(handler=merge)
+
+    bench_parser = commands.add_parser("bench", help=bench.__doc__)
+    bench_parser.add_argument(
+        "agents", nargs="*", help="Agent class names or module:Class specs."
+    )
+    bench_parser.add_argument("--games", type=int, default=1000)
+    bench_parser.add_argument("--seed", type=int, default=0)
+    bench_parser.set_defaults(handler=bench)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,50 @@
 """ This file contains some example agents. """
 import numpy as np
 
+from call_my_bluff import batched
 from call_my_bluff import game
 
+# The largest number of dice that can be bet on each dice value
+_MAX_NUM_DICE = [
+    max(
+        game.Bet(index=index).num_dice
+        for index in range(game.MAX_BET_INDEX + 1)
+        if game.Bet(index=index).dice_value == dice_value
+    )
+    for dice_value in range(6)
+]
+_MAX_NUM_DICE_ARRAY = np.array(_MAX_NUM_DICE)
+_DICE_VALUES = np.arange(6)
+
+
+def share_round_results(agents, state: game.State):
+    """
+    Hands the outcome of the round that just ended to the agents.
+
+    The result is built once and shared, and it is not built at all if every agent
+    sets ignores_round_results.
+
+    Args:
+        agents (Sequence): The agents in the game.
+        state (State): The state of the game at the end of the round.
+    """
+    result = None
+    for agent in agents:
+        if getattr(agent, "ignores_round_results", False):
+            continue
+        if result is None:
+            result = game.player_result(state)
+        agent.round_results(result)
+
 
 class SimpleAgent:
     """
     This is a simple agent that plays near the total dice average.
     """
 
+    # round_results does nothing, so the game loop may skip building the result
+    ignores_round_results = True
+
     def __init__(self):
         pass
 
@@ -23,11 +59,7 @@ class SimpleAgent:
             action (Action): The action to take.
         """
 
-        total_unknown_dice = sum(observation.unknown_dice)
-        total_known_dice = 0
-        for dice in observation.known_dice:
-            total_known_dice += len(dice)
-        total_dice = total_unknown_dice + total_known_dice
+        total_dice = sum(observation.unknown_dice) + sum(observation.known_counts)
 
         dice_value = np.random.randint(0, 5)
         num_dice_8 = int(0.8 * total_dice / 3)
@@ -54,12 +86,44 @@ class SimpleAgent:
 
         return action
 
-    def round_results(self, state: game.State):
+    def policy_batch(self, observations: batched.ObservationBatch):
+        """
+        Play a turn in many games, making the same decisions as policy.
+
+        Args:
+            observations (ObservationBatch): The observations, in the order policy
+                would have been called.
+
+        Returns:
+            actions (ActionBatch): The actions to take.
+        """
+        total_dice = observations.num_dice.sum(axis=1)
+        dice_value = np.random.randint(0, 5, size=len(observations))
+        num_dice_8 = np.maximum((0.8 * total_dice / 3).astype(np.int64), 1)
+        bet_8 = game.bet_to_bet_index(num_dice_8, dice_value)
+
+        bet = observations.bet
+        bet_plus_1 = np.minimum(bet + 1, game.MAX_BET_INDEX)
+        num_dice, dice_value = game.bet_index_to_bet(bet_plus_1)
+        expected_dice = np.where(
+            dice_value == game.STAR, total_dice / 6, total_dice / 3
+        )
+        raise_bet = np.where(bet_8 > bet, bet_8, bet_plus_1)
+        is_bet = (bet_8 > bet) | (expected_dice >= num_dice)
+        is_bet &= bet != game.MAX_BET_INDEX
+        is_bet |= bet == game.NO_BET_INDEX
+
+        actions = batched.ActionBatch.empty(len(observations))
+        actions.action_type[is_bet] = game.ActionType.BET.value
+        actions.bet[is_bet] = raise_bet[is_bet]
+        return actions
+
+    def round_results(self, result: game.RoundResult):
         """
         Update the agent's internal state based on the results of the round.
 
         Args:
-            state (State): The state of the game at the end of the round.
+            result (RoundResult): The outcome of the round.
         """
         # pylint: disable=unnecessary-pass
         pass
@@ -70,6 +134,9 @@ class MaxAgent:
     This is an agent that always bets the maximum.
     """
 
+    # round_results does nothing, so the game loop may skip building the result
+    ignores_round_results = True
+
     def __init__(self):
         pass
 
@@ -84,19 +151,21 @@ class MaxAgent:
             action (Action): The action to take.
         """
         expected_bet_indices = [0]
+        total_unknown = sum(observation.unknown_dice)
+        known_counts = observation.known_counts
         for dice_value in range(0, 6):
-            expected_dice = sum(observation.unknown_dice)
             if dice_value == game.STAR:
-                expected_dice /= 6
+                expected_dice = total_unknown / 6 + known_counts[game.STAR]
             else:
-                expected_dice /= 3
-            for known_dice in observation.known_dice:
-                expected_dice += known_dice.count(dice_value)
-                if dice_value != game.STAR:
-                    expected_dice += known_dice.count(game.STAR)
+                expected_dice = (
+                    total_unknown / 3
+                    + known_counts[dice_value]
+                    + known_counts[game.STAR]
+                )
             if int(expected_dice) > 0:
                 expected_bet = game.Bet(
-                    num_dice=int(expected_dice), dice_value=dice_value
+                    num_dice=min(int(expected_dice), _MAX_NUM_DICE[dice_value]),
+                    dice_value=dice_value,
                 )
                 expected_bet_indices.append(expected_bet.index)
         max_index = max(expected_bet_indices)
@@ -109,12 +178,44 @@ class MaxAgent:
 
         return action
 
-    def round_results(self, state: game.State):
+    def policy_batch(self, observations: batched.ObservationBatch):
+        """
+        Play a turn in many games, making the same decisions as policy.
+
+        Args:
+            observations (ObservationBatch): The observations.
+
+        Returns:
+            actions (ActionBatch): The actions to take.
+        """
+        total_unknown = observations.unknown_dice.sum(axis=1)[:, None]
+        stars = observations.known_counts[:, game.STAR, None]
+        expected_dice = np.where(
+            _DICE_VALUES == game.STAR,
+            total_unknown / 6 + stars,
+            total_unknown / 3 + observations.known_counts + stars,
+        ).astype(np.int64)
+        expected_bets = np.where(
+            expected_dice > 0,
+            game.bet_to_bet_index(
+                np.clip(expected_dice, 1, _MAX_NUM_DICE_ARRAY), _DICE_VALUES
+            ),
+            0,
+        )
+        max_index = expected_bets.max(axis=1)
+        is_bet = max_index > observations.bet
+
+        actions = batched.ActionBatch.empty(len(observations))
+        actions.action_type[is_bet] = game.ActionType.BET.value
+        actions.bet[is_bet] = max_index[is_bet]
+        return actions
+
+    def round_results(self, result: game.RoundResult):
         """
         Update the agent's internal state based on the results of the round.
 
         Args:
-            state (State): The state of the game at the end of the round.
+            result (RoundResult): The outcome of the round.
         """
         # pylint: disable=unnecessary-pass
         pass
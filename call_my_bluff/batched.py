@@ -0,0 +1,622 @@
+"""
+The batched module contains an array-backed engine that plays many games in lockstep.
+
+Every game in a BatchedGame follows the same rules as the scalar functions in the game
+module, but the state of all games is held in NumPy arrays and an action for every game
+is applied in a single call. Games that finish are reset automatically.
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from call_my_bluff import game
+
+
+@dataclass
+class StepResult:
+    """
+    This class holds the outcome of applying one action to every game.
+
+    The result fields mirror the result tuple of the scalar RESULT action and are only
+    meaningful where round_over is True.
+    """
+
+    round_over: np.ndarray
+    game_over: np.ndarray
+    winner: np.ndarray
+    loser: np.ndarray
+    dice_lost: np.ndarray
+    actual_num_dice: np.ndarray
+    dice_value: np.ndarray
+
+
+@dataclass
+class LegalActionMasks:
+    """
+    This class holds the legal actions of the current player of every game.
+
+    The masks have the layout of game.LegalActions with a leading game axis.
+    """
+
+    bets: np.ndarray
+    can_call: np.ndarray
+    lock_masks: np.ndarray
+
+
+@dataclass
+class ObservationBatch:
+    """
+    This class holds the observations of the current players of many games as arrays.
+
+    Row i of every array belongs to the same observation. Dice a player does not have
+    are -1.
+
+    Attributes:
+        player (np.ndarray): (n,) current player.
+        bet (np.ndarray): (n,) current bet index.
+        num_dice (np.ndarray): (n, num_players) dice counts.
+        unknown_dice (np.ndarray): (n, num_players) dice the current player cannot see.
+        known_counts (np.ndarray): (n, 6) dice of each value the current player can
+            see, over all players.
+        player_dice (np.ndarray): (n, NUM_DICE) dice of the current player.
+        player_locked_dice (np.ndarray): (n, NUM_DICE) lock mask of the current player.
+    """
+
+    player: np.ndarray
+    bet: np.ndarray
+    num_dice: np.ndarray
+    unknown_dice: np.ndarray
+    known_counts: np.ndarray
+    player_dice: np.ndarray
+    player_locked_dice: np.ndarray
+
+    def __len__(self):
+        return len(self.bet)
+
+    @classmethod
+    def from_observations(
+        cls, observations: Sequence[game.Observation]
+    ) -> "ObservationBatch":
+        """
+        Packs scalar observations of games with the same number of players.
+
+        Args:
+            observations (Sequence[Observation]): The observations.
+
+        Returns:
+            ObservationBatch: The observations as arrays.
+        """
+        num_observations = len(observations)
+        player_dice = np.full((num_observations, game.NUM_DICE), -1, dtype=np.int8)
+        player_locked_dice = np.zeros((num_observations, game.NUM_DICE), dtype=bool)
+        for row, observation in enumerate(observations):
+            own_dice = observation.known_dice[observation.player]
+            player_dice[row, : len(own_dice)] = own_dice
+            player_locked_dice[row, : len(own_dice)] = observation.player_locked_dice
+        return cls(
+            player=np.array([obs.player for obs in observations], dtype=np.int64),
+            bet=np.array([obs.bet.index for obs in observations], dtype=np.int64),
+            num_dice=np.array([obs.num_dice for obs in observations], dtype=np.int64),
+            unknown_dice=np.array(
+                [obs.unknown_dice for obs in observations], dtype=np.int64
+            ),
+            known_counts=np.array(
+                [obs.known_counts for obs in observations], dtype=np.int64
+            ),
+            player_dice=player_dice,
+            player_locked_dice=player_locked_dice,
+        )
+
+
+@dataclass
+class ActionBatch:
+    """
+    This class holds one action for each of many games as arrays, in the form taken
+    by BatchedGame.step.
+
+    Attributes:
+        action_type (np.ndarray): (n,) ActionType values.
+        bet (np.ndarray): (n,) bet indices, NO_BET_INDEX for calls.
+        dice_to_lock (np.ndarray): (n, NUM_DICE) dice to lock for rerolls.
+    """
+
+    action_type: np.ndarray
+    bet: np.ndarray
+    dice_to_lock: np.ndarray
+
+    def __len__(self):
+        return len(self.bet)
+
+    @classmethod
+    def empty(cls, num_actions: int) -> "ActionBatch":
+        """Returns a batch of calls to fill in."""
+        return cls(
+            action_type=np.full(
+                num_actions, game.ActionType.CALL.value, dtype=np.int64
+            ),
+            bet=np.full(num_actions, game.NO_BET_INDEX, dtype=np.int64),
+            dice_to_lock=np.zeros((num_actions, game.NUM_DICE), dtype=bool),
+        )
+
+    def set(self, row: int, action: game.Action):
+        """
+        Stores a scalar action in a row.
+
+        Args:
+            row (int): The row.
+            action (Action): The action.
+        """
+        self.action_type[row] = action.type.value
+        self.bet[row] = game.NO_BET_INDEX if action.bet is None else action.bet.index
+        self.dice_to_lock[row] = False
+        if action.dice_to_lock is not None:
+            self.dice_to_lock[row, : len(action.dice_to_lock)] = action.dice_to_lock
+
+    def action(self, row: int, num_dice: int = game.NUM_DICE) -> game.Action:
+        """
+        Returns the scalar action in a row.
+
+        Args:
+            row (int): The row.
+            num_dice (int): The number of dice of the player, for rerolls.
+
+        Returns:
+            Action: The action.
+        """
+        action_type = game.ActionType(int(self.action_type[row]))
+        if action_type == game.ActionType.CALL:
+            return game.Action(type=action_type)
+        bet = game.Bet(index=int(self.bet[row]))
+        if action_type == game.ActionType.BET:
+            return game.Action(type=action_type, bet=bet)
+        return game.Action(
+            type=action_type,
+            bet=bet,
+            dice_to_lock=tuple(self.dice_to_lock[row, :num_dice].tolist()),
+        )
+
+
+class BatchedGame:
+    """
+    This class is responsible for advancing many games of the same size in lockstep.
+
+    Args:
+        num_games (int): The number of games to play at once.
+        num_players (int): The number of players in every game.
+        seed (int or np.random.Generator, optional): Seed for the random number generator.
+        history (int): The number of most recent actions of each round to keep.
+
+    Attributes:
+        dice (np.ndarray): (num_games, num_players, NUM_DICE) dice values, -1 for dice
+            a player no longer has.
+        dice_locked (np.ndarray): (num_games, num_players, NUM_DICE) lock mask.
+        num_dice (np.ndarray): (num_games, num_players) dice counts.
+        bet (np.ndarray): (num_games,) current bet index.
+        player_curr (np.ndarray): (num_games,) current player.
+        player_prev (np.ndarray): (num_games,) previous player, -1 if there is none.
+        turn_order (np.ndarray): (num_games, num_players) players in turn order,
+            including players that have been knocked out.
+        alive (np.ndarray): (num_games, num_players) True for players with dice.
+        round_turns (np.ndarray): (num_games,) actions taken so far this round.
+        history_type, history_player, history_bet, history_lock (np.ndarray):
+            (num_games, history) ring buffers of the ActionType value, player, bet index
+            and lock bitmask of the most recent actions, where the action taken on turn
+            t of the round is at position t % history.
+    """
+
+    def __init__(self, num_games: int, num_players: int, seed=None, history: int = 0):
+        if num_players < 2:
+            raise ValueError("A game needs at least two players.")
+        self.num_games = num_games
+        self.num_players = num_players
+        self.rng = np.random.default_rng(seed)
+
+        shape = (num_games, num_players)
+        self.dice = np.full(shape + (game.NUM_DICE,), -1, dtype=np.int8)
+        self.dice_locked = np.zeros(shape + (game.NUM_DICE,), dtype=bool)
+        self.num_dice = np.zeros(shape, dtype=np.int64)
+        self.bet = np.full(num_games, game.NO_BET_INDEX, dtype=np.int64)
+        self.player_curr = np.zeros(num_games, dtype=np.int64)
+        self.player_prev = np.full(num_games, -1, dtype=np.int64)
+        self.turn_order = np.zeros(shape, dtype=np.int64)
+        self.turn_position = np.zeros(shape, dtype=np.int64)
+        self.alive = np.zeros(shape, dtype=bool)
+
+        self.history = history
+        self.round_turns = np.zeros(num_games, dtype=np.int64)
+        history_shape = (num_games, max(history, 1))
+        self.history_type = np.zeros(history_shape, dtype=np.int64)
+        self.history_player = np.zeros(history_shape, dtype=np.int64)
+        self.history_bet = np.zeros(history_shape, dtype=np.int64)
+        self.history_lock = np.zeros(history_shape, dtype=np.int64)
+
+        self._games = np.arange(num_games)
+        self._offsets = np.arange(1, num_players + 1)
+        self._slots = np.arange(game.NUM_DICE)
+        self._lock_bits = 1 << self._slots
+        self.reset()
+
+    def reset(self, games: Optional[np.ndarray] = None):
+        """
+        Starts new games, like initialize_game.
+
+        Args:
+            games (np.ndarray, optional): Indices of the games to reset, all if None.
+        """
+        if games is None:
+            games = self._games
+        if len(games) == 0:
+            return
+        order = np.tile(np.arange(self.num_players), (len(games), 1))
+        order = self.rng.permuted(order, axis=1)
+        self.turn_order[games] = order
+        self.turn_position[games[:, None], order] = np.arange(self.num_players)
+        self.num_dice[games] = game.NUM_DICE
+        self.alive[games] = True
+        self.player_curr[games] = order[:, 0]
+        self._new_round(games)
+
+    def _new_round(self, games: np.ndarray):
+        self.bet[games] = game.NO_BET_INDEX
+        self.player_prev[games] = -1
+        self.round_turns[games] = 0
+        rolls = self.rng.integers(
+            0, 6, size=(len(games), self.num_players, game.NUM_DICE), dtype=np.int8
+        )
+        have_dice = self._slots < self.num_dice[games][:, :, None]
+        self.dice[games] = np.where(have_dice, rolls, -1)
+        self.dice_locked[games] = False
+
+    def _validate(self, action_type, bet, dice_to_lock, active):
+        is_call = active & (action_type == game.ActionType.CALL.value)
+        is_bet = active & (action_type == game.ActionType.BET.value)
+        is_reroll = active & (action_type == game.ActionType.REROLL_BET.value)
+        if not np.all(is_call | is_bet | is_reroll | ~active):
+            raise ValueError("Invalid action type.")
+        if np.any(is_call & (self.bet == game.NO_BET_INDEX)):
+            raise ValueError("Cannot call without a bet.")
+        is_any_bet = is_bet | is_reroll
+        if np.any(is_any_bet & ((bet < 0) | (bet > game.MAX_BET_INDEX))):
+            raise ValueError("Invalid bet index")
+        if np.any(is_any_bet & (bet <= self.bet)):
+            raise ValueError("Bet index must be higher than previous bet.")
+        if np.any(is_reroll):
+            if dice_to_lock is None:
+                raise ValueError("Must specify dice to lock.")
+            games = self._games[is_reroll]
+            players = self.player_curr[games]
+            lock = dice_to_lock[games]
+            have_dice = self._slots < self.num_dice[games, players][:, None]
+            if np.any(lock & ~have_dice):
+                raise ValueError("Must specify dice to lock for all dice.")
+            if np.any(lock & self.dice_locked[games, players]):
+                raise ValueError("Cannot lock dice that are already locked.")
+            if np.any(lock.sum(axis=1) == 0):
+                raise ValueError("Must lock at least one die.")
+
+    def legal_actions(self) -> LegalActionMasks:
+        """
+        Returns the legal actions of the current player of every game, like
+        game.legal_actions.
+
+        Returns:
+            LegalActionMasks: The (num_games, NUM_BETS) bet masks, the (num_games,)
+                call masks and the (num_games, NUM_LOCK_MASKS) reroll lock masks.
+        """
+        players = self.player_curr
+        have_dice = self._slots < self.num_dice[self._games, players][:, None]
+        unlocked = have_dice & ~self.dice_locked[self._games, players]
+        free_mask = unlocked @ self._lock_bits
+        return LegalActionMasks(
+            bets=game.LEGAL_BETS[self.bet + 1],
+            can_call=self.bet != game.NO_BET_INDEX,
+            lock_masks=game.LEGAL_LOCK_MASKS[free_mask],
+        )
+
+    def _record(self, games, action_type, bet, dice_to_lock):
+        position = self.round_turns[games] % self.history
+        self.history_type[games, position] = action_type[games]
+        self.history_player[games, position] = self.player_curr[games]
+        self.history_bet[games, position] = bet[games]
+        if dice_to_lock is None:
+            self.history_lock[games, position] = 0
+        else:
+            self.history_lock[games, position] = dice_to_lock[games] @ self._lock_bits
+        self.round_turns[games] += 1
+
+    def _next_player(self, games: np.ndarray, players: np.ndarray) -> np.ndarray:
+        positions = self.turn_position[games, players][:, None] + self._offsets
+        candidates = self.turn_order[games[:, None], positions % self.num_players]
+        first_alive = np.argmax(self.alive[games[:, None], candidates], axis=1)
+        return candidates[np.arange(len(games)), first_alive]
+
+    def _reroll(self, games: np.ndarray, dice_to_lock: np.ndarray):
+        players = self.player_curr[games]
+        locked = self.dice_locked[games, players] | dice_to_lock
+        have_dice = self._slots < self.num_dice[games, players][:, None]
+        rolls = self.rng.integers(0, 6, size=locked.shape, dtype=np.int8)
+        dice = self.dice[games, players]
+        self.dice[games, players] = np.where(have_dice & ~locked, rolls, dice)
+        self.dice_locked[games, players] = locked
+
+    def _bet(self, games: np.ndarray, bet: np.ndarray):
+        self.bet[games] = bet
+        self.player_prev[games] = self.player_curr[games]
+        self.player_curr[games] = self._next_player(games, self.player_curr[games])
+
+    def _lose_dice(self, games: np.ndarray, players: np.ndarray, num_dice: np.ndarray):
+        remaining = np.maximum(self.num_dice[games, players] - num_dice, 0)
+        self.num_dice[games, players] = remaining
+        self.alive[games, players] = remaining > 0
+
+    def _call(self, games: np.ndarray, result: StepResult):
+        num_dice, dice_value = game.bet_index_to_bet(self.bet[games])
+
+        dice = self.dice[games]
+        matches = dice == dice_value[:, None, None]
+        matches |= (dice == game.STAR) & (dice_value != game.STAR)[:, None, None]
+        actual_num_dice = matches.sum(axis=(1, 2))
+        dice_diff = actual_num_dice - num_dice
+
+        player_curr = self.player_curr[games]
+        player_prev = self.player_prev[games]
+        over = dice_diff > 0
+        under = dice_diff < 0
+        exact = ~(over | under)
+        self._lose_dice(games[over], player_curr[over], dice_diff[over])
+        self._lose_dice(games[under], player_prev[under], -dice_diff[under])
+        exact_games = games[exact]
+        losers = self.alive[exact_games].copy()
+        losers[np.arange(len(exact_games)), player_prev[exact]] = False
+        self.num_dice[exact_games] -= losers
+        self.alive[exact_games] = self.num_dice[exact_games] > 0
+
+        result.loser[games] = np.where(
+            over, player_curr, np.where(under, player_prev, -1)
+        )
+        result.dice_lost[games] = np.where(exact, 1, np.abs(dice_diff))
+        result.actual_num_dice[games] = actual_num_dice
+        result.dice_value[games] = dice_value
+
+        self.player_curr[games] = np.where(dice_diff >= 0, player_prev, player_curr)
+        self.player_prev[games] = -1
+
+    def step(
+        self,
+        action_type: np.ndarray,
+        bet: Optional[np.ndarray] = None,
+        dice_to_lock: Optional[np.ndarray] = None,
+        active: Optional[np.ndarray] = None,
+    ) -> StepResult:
+        """
+        Applies one action to every game, like player_action.
+
+        A game whose round is settled by a call starts a new round straight away, and a
+        game that is won is reset with new_round replaced by a fresh game.
+
+        Args:
+            action_type (np.ndarray): (num_games,) ActionType values.
+            bet (np.ndarray, optional): (num_games,) bet indices for BET and REROLL_BET.
+            dice_to_lock (np.ndarray, optional): (num_games, NUM_DICE) dice to lock for
+                REROLL_BET.
+            active (np.ndarray, optional): (num_games,) mask of the games that take an
+                action, all if None. The other games are left as they are.
+
+        Returns:
+            StepResult: The outcome of the step for every game.
+
+        Raises:
+            ValueError: If the action for any game is invalid.
+        """
+        action_type = np.asarray(action_type)
+        if bet is None:
+            bet = np.full(self.num_games, game.NO_BET_INDEX, dtype=np.int64)
+        bet = np.asarray(bet)
+        if dice_to_lock is not None:
+            dice_to_lock = np.asarray(dice_to_lock, dtype=bool)
+        if active is None:
+            active = np.ones(self.num_games, dtype=bool)
+        else:
+            active = np.asarray(active, dtype=bool)
+        self._validate(action_type, bet, dice_to_lock, active)
+        if self.history > 0:
+            self._record(self._games[active], action_type, bet, dice_to_lock)
+
+        result = StepResult(
+            round_over=active & (action_type == game.ActionType.CALL.value),
+            game_over=np.zeros(self.num_games, dtype=bool),
+            winner=np.full(self.num_games, -1, dtype=np.int64),
+            loser=np.full(self.num_games, -1, dtype=np.int64),
+            dice_lost=np.zeros(self.num_games, dtype=np.int64),
+            actual_num_dice=np.zeros(self.num_games, dtype=np.int64),
+            dice_value=np.zeros(self.num_games, dtype=np.int64),
+        )
+
+        rerolls = self._games[
+            active & (action_type == game.ActionType.REROLL_BET.value)
+        ]
+        if len(rerolls) > 0:
+            self._reroll(rerolls, dice_to_lock[rerolls])
+        bets = self._games[active & (action_type != game.ActionType.CALL.value)]
+        if len(bets) > 0:
+            self._bet(bets, bet[bets])
+        calls = self._games[result.round_over]
+        if len(calls) > 0:
+            self._call(calls, result)
+            finished = self.alive[calls].sum(axis=1) == 1
+            result.game_over[calls] = finished
+            result.winner[calls[finished]] = self.player_curr[calls[finished]]
+            self._new_round(calls[~finished])
+            self.reset(calls[finished])
+        return result
+
+    def load_state(self, index: int, state: game.State):
+        """
+        Copies a scalar game state into one of the games.
+
+        Args:
+            index (int): The game to overwrite.
+            state (State): The scalar state, which must have num_players players.
+        """
+        if state.num_players != self.num_players:
+            raise ValueError("State has the wrong number of players.")
+        knocked_out = [p for p in range(self.num_players) if p not in state.turn_order]
+        order = list(state.turn_order) + knocked_out
+        self.turn_order[index] = order
+        self.turn_position[index, order] = np.arange(self.num_players)
+        self.num_dice[index] = state.num_dice
+        self.alive[index] = np.asarray(state.num_dice) > 0
+        self.bet[index] = state.bet.index
+        self.player_curr[index] = state.player_curr
+        self.player_prev[index] = -1 if state.player_prev is None else state.player_prev
+        self.dice[index] = -1
+        self.dice_locked[index] = False
+        for player in range(self.num_players):
+            num_dice = len(state.dice[player])
+            self.dice[index, player, :num_dice] = state.dice[player]
+            self.dice_locked[index, player, :num_dice] = state.dice_locked[player]
+        turns = [
+            action
+            for action in state.action_log
+            if action.type != game.ActionType.RESULT
+        ]
+        self.round_turns[index] = len(turns)
+        for turn in range(max(len(turns) - self.history, 0), len(turns)):
+            action = turns[turn]
+            position = turn % self.history
+            self.history_type[index, position] = action.type.value
+            self.history_player[index, position] = action.player
+            self.history_bet[index, position] = (
+                game.NO_BET_INDEX if action.bet is None else action.bet.index
+            )
+            self.history_lock[index, position] = sum(
+                1 << slot for slot, lock in enumerate(action.dice_to_lock or ()) if lock
+            )
+
+    def to_state(self, index: int) -> game.State:
+        """
+        Builds a scalar game state from one of the games.
+
+        The action log of the returned state holds the most recent history actions of
+        the round, so it is only complete if the round is no longer than that. The state
+        rolls its dice with the generator of the batch, so it is reproducible from the
+        batch seed.
+
+        Args:
+            index (int): The game to convert.
+
+        Returns:
+            State: The scalar state of the game.
+        """
+        dice = []
+        dice_locked = []
+        for player in range(self.num_players):
+            num_dice = int(self.num_dice[index, player])
+            dice.append(self.dice[index, player, :num_dice].tolist())
+            dice_locked.append(self.dice_locked[index, player, :num_dice].tolist())
+        player_prev = int(self.player_prev[index])
+        return game.State(
+            num_players=self.num_players,
+            bet=game.Bet(index=int(self.bet[index])),
+            player_curr=int(self.player_curr[index]),
+            player_prev=None if player_prev == -1 else player_prev,
+            turn_order=[
+                int(player)
+                for player in self.turn_order[index]
+                if self.alive[index, player]
+            ],
+            num_dice=self.num_dice[index].tolist(),
+            dice=dice,
+            dice_locked=dice_locked,
+            action_log=self._action_log(index),
+            roller=game.DiceRoller(self.rng),
+        )
+
+    def _action_log(self, index: int) -> game.ActionLog:
+        turns = int(self.round_turns[index])
+        action_log = game.ActionLog()
+        for turn in range(max(turns - self.history, 0), turns):
+            position = turn % self.history
+            action_type = game.ActionType(int(self.history_type[index, position]))
+            player = int(self.history_player[index, position])
+            bet = None
+            dice_to_lock = None
+            if action_type != game.ActionType.CALL:
+                bet = game.Bet(index=int(self.history_bet[index, position]))
+            if action_type == game.ActionType.REROLL_BET:
+                lock = int(self.history_lock[index, position])
+                dice_to_lock = tuple(
+                    bool(lock >> slot & 1)
+                    for slot in range(int(self.num_dice[index, player]))
+                )
+            action_log.append(
+                game.Action(
+                    type=action_type, bet=bet, dice_to_lock=dice_to_lock, player=player
+                )
+            )
+        return action_log
+
+    def observation(self, index: int) -> game.Observation:
+        """
+        Returns the observation for the current player of one of the games.
+
+        Args:
+            index (int): The game to observe.
+
+        Returns:
+            Observation: The observation for the current player.
+        """
+        return game.player_observation(self.to_state(index))
+
+    def observation_batch(self, games: Optional[np.ndarray] = None) -> ObservationBatch:
+        """
+        Returns the observations for the current players of some games as arrays.
+
+        Args:
+            games (np.ndarray, optional): Indices of the games, all if None.
+
+        Returns:
+            ObservationBatch: The observations.
+        """
+        if games is None:
+            games = self._games
+        players = self.player_curr[games]
+        dice = self.dice[games]
+        have_dice = dice >= 0
+        is_player = np.arange(self.num_players) == players[:, None]
+        known = have_dice & (self.dice_locked[games] | is_player[:, :, None])
+        faces = dice[:, :, :, None] == np.arange(6)
+        return ObservationBatch(
+            player=players,
+            bet=self.bet[games],
+            num_dice=self.num_dice[games],
+            unknown_dice=(have_dice & ~known).sum(axis=2),
+            known_counts=(faces & known[:, :, :, None]).sum(axis=(1, 2)),
+            player_dice=dice[np.arange(len(games)), players],
+            player_locked_dice=self.dice_locked[games, players],
+        )
+
+
+def policy_batch(agent, batch: BatchedGame, games: np.ndarray) -> ActionBatch:
+    """
+    Asks an agent for the actions of the current players of some games.
+
+    Agents may implement policy_batch(observations), which takes an ObservationBatch
+    and returns an ActionBatch, to decide for many independent games in one call.
+    Other agents are asked for one game at a time with policy(observation).
+
+    Args:
+        agent: The agent.
+        batch (BatchedGame): The games.
+        games (np.ndarray): Indices of the games the agent plays the current turn of.
+
+    Returns:
+        ActionBatch: The actions, one row for each of games.
+    """
+    if hasattr(agent, "policy_batch"):
+        return agent.policy_batch(batch.observation_batch(games))
+    actions = ActionBatch.empty(len(games))
+    for row, index in enumerate(games):
+        actions.set(row, agent.policy(batch.observation(index)))
+    return actions
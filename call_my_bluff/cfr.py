@@ -0,0 +1,456 @@
+"""
+The cfr module solves small configurations of the game with CFR+.
+
+The solver plays a single round between two players who each have num_dice dice. To
+keep the game small, bets are limited to indices 0 to max_bet and rerolls are left
+out, so a player either calls or raises the bet. The bet that was called is settled
+with the rules of game._call, and a player's utility is the number of dice the other
+player lost minus the number of dice they lost.
+
+Since bets only go up, the bets of a round are a bitmask over bet indices, and the
+player to act follows from the number of bets. An information set is a player's hand,
+the multiset of their dice, together with that bitmask. Its integer key is
+hand << (max_bet + 1) | bitmask, and the regrets and strategy sums of all information
+sets are NumPy arrays indexed by key.
+
+Each iteration walks the tree of bet histories once per player, with a vector of reach
+probabilities over the hands of each player, so the chance of the deal is handled
+exactly rather than sampled.
+
+Usage:
+    python -m call_my_bluff.cfr --dice 1 --max-bet 10 --iterations 1000 --policy p.npz
+"""
+from typing import List, Optional, Tuple
+import argparse
+import itertools
+import os
+import time
+
+import numpy as np
+
+from call_my_bluff import agents
+from call_my_bluff import game
+
+CALL = 0
+_BET_COLUMN = game.ACTION_LOG_COLUMNS.index("bet")
+_TYPE_COLUMN = game.ACTION_LOG_COLUMNS.index("type")
+
+
+def hands(num_dice: int) -> Tuple[List[Tuple[int, ...]], np.ndarray]:
+    """
+    Lists the hands of num_dice dice and their probabilities.
+
+    Args:
+        num_dice (int): The number of dice in a hand.
+
+    Returns:
+        Tuple[List[Tuple[int, ...]], np.ndarray]: The sorted dice of each hand and the
+            probability of rolling each hand.
+    """
+    counts = {}
+    for roll in itertools.product(range(6), repeat=num_dice):
+        hand = tuple(sorted(roll))
+        counts[hand] = counts.get(hand, 0) + 1
+    sorted_hands = sorted(counts)
+    probabilities = np.array([counts[hand] for hand in sorted_hands]) / 6**num_dice
+    return sorted_hands, probabilities
+
+
+def _bettor_gains(hand_list: List[Tuple[int, ...]], num_dice: int, num_bets: int):
+    # [bet, i, j] the utility of the bettor when the bet is called and the players
+    # hold hands i and j, following game._call
+    counts = np.array([[hand.count(face) for face in range(6)] for hand in hand_list])
+    gains = np.zeros((num_bets, len(hand_list), len(hand_list)))
+    for index in range(num_bets):
+        bet = game.Bet(index=index)
+        matches = counts[:, bet.dice_value]
+        if bet.dice_value != game.STAR:
+            matches = matches + counts[:, game.STAR]
+        diff = matches[:, None] + matches[None, :] - bet.num_dice
+        caller_loses = np.where(diff > 0, diff, np.where(diff == 0, 1, 0))
+        bettor_loses = np.where(diff < 0, -diff, 0)
+        gains[index] = np.minimum(caller_loses, num_dice) - np.minimum(
+            bettor_loses, num_dice
+        )
+    return gains
+
+
+class CFRSolver:
+    """
+    This class is responsible for solving a single two player round with CFR+.
+
+    Args:
+        num_dice (int): The number of dice of each player.
+        max_bet (int): The highest bet index that can be bet.
+    """
+
+    def __init__(self, num_dice: int = 1, max_bet: int = 10):
+        if not 0 <= max_bet <= game.MAX_BET_INDEX:
+            raise ValueError("Invalid bet index")
+        self.num_dice = num_dice
+        self.max_bet = max_bet
+        self.num_bets = max_bet + 1
+        self.num_actions = self.num_bets + 1
+        self.hands, self.hand_probabilities = hands(num_dice)
+        self.hand_index = {hand: index for index, hand in enumerate(self.hands)}
+        chance = np.outer(self.hand_probabilities, self.hand_probabilities)
+        self._terminal = chance * _bettor_gains(self.hands, num_dice, self.num_bets)
+        shape = (len(self.hands), 1 << self.num_bets, self.num_actions)
+        self.regrets = np.zeros(shape)
+        self.strategy_sum = np.zeros(shape)
+        self.iterations = 0
+        self.seconds = 0.0
+
+    @property
+    def num_infosets(self) -> int:
+        """The number of information sets, including unreachable ones."""
+        return len(self.hands) << self.num_bets
+
+    def infoset_key(self, hand: Tuple[int, ...], history: int) -> int:
+        """
+        Returns the integer key of an information set.
+
+        Args:
+            hand (Tuple[int, ...]): The player's dice.
+            history (int): The bitmask of the bets of the round.
+
+        Returns:
+            int: The key, an index into the flattened regret and strategy arrays.
+        """
+        return self.hand_index[tuple(sorted(hand))] << self.num_bets | history
+
+    def _legal(self, last: int) -> np.ndarray:
+        legal = np.zeros(self.num_actions, dtype=bool)
+        legal[CALL] = last >= 0
+        legal[last + 2 :] = True
+        return legal
+
+    def _strategy(self, history: int, legal: np.ndarray) -> np.ndarray:
+        positive = np.maximum(self.regrets[:, history], 0) * legal
+        total = positive.sum(axis=1, keepdims=True)
+        uniform = legal / legal.sum()
+        return np.where(total > 0, positive / np.where(total > 0, total, 1), uniform)
+
+    def _walk(
+        self, history: int, last: int, reach: List[np.ndarray], update: int
+    ) -> List[np.ndarray]:
+        # Returns the counterfactual values of both players for every hand
+        actor = bin(history).count("1") % 2
+        legal = self._legal(last)
+        strategy = self._strategy(history, legal)
+        action_values = np.zeros((self.num_actions, len(self.hands)))
+        values = [np.zeros(len(self.hands)), np.zeros(len(self.hands))]
+        for action in np.flatnonzero(legal):
+            child_reach = list(reach)
+            child_reach[actor] = reach[actor] * strategy[:, action]
+            if action == CALL:
+                # The bettor is the other player
+                gains = self._terminal[last] if actor == 1 else -self._terminal[last]
+                child = [gains @ child_reach[1], -(child_reach[0] @ gains)]
+            else:
+                bet = action - 1
+                child = self._walk(history | 1 << bet, bet, child_reach, update)
+            action_values[action] = child[actor]
+            values[actor] += strategy[:, action] * child[actor]
+            values[1 - actor] += child[1 - actor]
+
+        if actor == update:
+            regrets = self.regrets[:, history]
+            regrets += (action_values.T - values[actor][:, None]) * legal
+            np.maximum(regrets, 0, out=regrets)
+            self.strategy_sum[:, history] += (
+                (self.iterations + 1) * reach[actor][:, None] * strategy
+            )
+        return values
+
+    def iterate(self, num_iterations: int = 1):
+        """
+        Runs iterations of CFR+ with alternating updates.
+
+        Args:
+            num_iterations (int): The number of iterations to run.
+        """
+        start = time.perf_counter()
+        ones = np.ones(len(self.hands))
+        for _ in range(num_iterations):
+            for player in range(2):
+                self._walk(0, -1, [ones, ones], player)
+            self.iterations += 1
+        self.seconds += time.perf_counter() - start
+
+    def average_strategy(self) -> np.ndarray:
+        """
+        Returns the average strategy, which converges to an equilibrium.
+
+        Returns:
+            np.ndarray: (hands, histories, actions) probabilities, uniform over legal
+                actions where an information set was never reached.
+        """
+        totals = self.strategy_sum.sum(axis=2, keepdims=True)
+        legal = np.array(
+            [
+                self._legal(history.bit_length() - 1)
+                for history in range(1 << self.num_bets)
+            ]
+        )
+        uniform = legal / legal.sum(axis=1, keepdims=True)
+        return np.where(
+            totals > 0,
+            self.strategy_sum / np.where(totals > 0, totals, 1),
+            uniform[None],
+        )
+
+    def _best_response(
+        self, strategy: np.ndarray, history: int, last: int, reach: np.ndarray, player
+    ) -> np.ndarray:
+        # The values of player's hands when they best respond to strategy
+        actor = bin(history).count("1") % 2
+        legal = self._legal(last)
+        best = np.full(len(self.hands), -np.inf)
+        total = np.zeros(len(self.hands))
+        for action in np.flatnonzero(legal):
+            child_reach = reach
+            if actor != player:
+                child_reach = reach * strategy[:, history, action]
+            if action == CALL:
+                gains = self._terminal[last] if actor == 1 else -self._terminal[last]
+                child = gains @ child_reach if player == 0 else -(child_reach @ gains)
+            else:
+                bet = action - 1
+                child = self._best_response(
+                    strategy, history | 1 << bet, bet, child_reach, player
+                )
+            best = np.maximum(best, child)
+            total += child
+        return best if actor == player else total
+
+    def exploitability(self) -> float:
+        """
+        Returns how much a best response gains against the average strategy.
+
+        Returns:
+            float: The average over both players of the best response value, which is
+                0 at an equilibrium, in dice per round.
+        """
+        strategy = self.average_strategy()
+        ones = np.ones(len(self.hands))
+        values = [
+            self._best_response(strategy, 0, -1, ones, player).sum()
+            for player in range(2)
+        ]
+        return float(sum(values) / 2)
+
+    def stats(self) -> dict:
+        """
+        Returns the size and speed of the solver.
+
+        Returns:
+            dict: The iterations run, the seconds spent, the iterations per second,
+                the number of information sets and the bytes of the NumPy stores.
+        """
+        return {
+            "iterations": self.iterations,
+            "seconds": self.seconds,
+            "iterations_per_second": self.iterations / max(self.seconds, 1e-9),
+            "infosets": self.num_infosets,
+            "memory_bytes": self.regrets.nbytes + self.strategy_sum.nbytes,
+        }
+
+    def save(self, path: str):
+        """
+        Writes a checkpoint that load resumes from.
+
+        Args:
+            path (str): The .npz file to write.
+        """
+        np.savez(
+            path,
+            num_dice=self.num_dice,
+            max_bet=self.max_bet,
+            iterations=self.iterations,
+            seconds=self.seconds,
+            regrets=self.regrets,
+            strategy_sum=self.strategy_sum,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "CFRSolver":
+        """
+        Resumes a solver from a checkpoint.
+
+        Args:
+            path (str): The .npz file written by save.
+
+        Returns:
+            CFRSolver: The solver.
+        """
+        with np.load(path) as data:
+            solver = cls(int(data["num_dice"]), int(data["max_bet"]))
+            solver.iterations = int(data["iterations"])
+            solver.seconds = float(data["seconds"])
+            solver.regrets[:] = data["regrets"]
+            solver.strategy_sum[:] = data["strategy_sum"]
+        return solver
+
+    def policy_table(self) -> "PolicyTable":
+        """Returns the average strategy as a table for LookupAgent."""
+        return PolicyTable(self.num_dice, self.max_bet, self.average_strategy())
+
+
+class PolicyTable:
+    """
+    This class is responsible for the action probabilities of a solved configuration.
+
+    Args:
+        num_dice (int): The number of dice of each player.
+        max_bet (int): The highest bet index in the table.
+        probabilities (np.ndarray): (hands, histories, actions) probabilities, where
+            action 0 is a call and action i + 1 is bet index i.
+    """
+
+    def __init__(self, num_dice: int, max_bet: int, probabilities: np.ndarray):
+        self.num_dice = num_dice
+        self.max_bet = max_bet
+        self.probabilities = probabilities
+        self.cumulative = np.cumsum(probabilities, axis=2)
+        hand_list, _ = hands(num_dice)
+        # Hands are looked up by their dice as a base 6 number, with sorted dice
+        self.hand_codes = np.full(6**num_dice, -1)
+        for index, hand in enumerate(hand_list):
+            self.hand_codes[_dice_code(hand)] = index
+
+    def save(self, path: str):
+        """
+        Writes the table.
+
+        Args:
+            path (str): The .npz file to write.
+        """
+        np.savez(
+            path,
+            num_dice=self.num_dice,
+            max_bet=self.max_bet,
+            probabilities=self.probabilities.astype(np.float32),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "PolicyTable":
+        """
+        Reads a table written by save.
+
+        Args:
+            path (str): The .npz file to read.
+
+        Returns:
+            PolicyTable: The table.
+        """
+        with np.load(path) as data:
+            return cls(
+                int(data["num_dice"]), int(data["max_bet"]), data["probabilities"]
+            )
+
+
+def _dice_code(dice) -> int:
+    code = 0
+    for dice_value in sorted(dice):
+        code = code * 6 + dice_value
+    return code
+
+
+class LookupAgent:
+    """
+    This is an agent that plays a solved policy table.
+
+    Moves outside of the table, because of the number of players or dice, rerolls or
+    bets above the table's max_bet, are played by the fallback agent.
+
+    Args:
+        table (PolicyTable): The solved policy.
+        fallback (Callable): Builds the agent for moves outside of the table.
+        seed (int, optional): Seed for sampling actions.
+    """
+
+    # round_results does nothing, so the game loop may skip building the result
+    ignores_round_results = True
+
+    def __init__(
+        self, table: PolicyTable, fallback=agents.MaxAgent, seed: Optional[int] = None
+    ):
+        self.table = table
+        self.fallback = fallback()
+        self.rng = np.random.default_rng(seed)
+        self.bet_bits = 1 << np.arange(table.max_bet + 1)
+
+    def policy(self, observation: game.Observation):
+        """
+        Play a turn.
+
+        Args:
+            observation (Observation): The observation of the current state of the game.
+
+        Returns:
+            action (Action): The action to take.
+        """
+        table = self.table
+        columns = observation.action_log.columns
+        if (
+            len(observation.turn_order) != 2
+            or any(num_dice != table.num_dice for num_dice in observation.num_dice)
+            or observation.bet.index > table.max_bet
+            or np.any(columns[:, _TYPE_COLUMN] != game.ActionType.BET.value)
+        ):
+            return self.fallback.policy(observation)
+
+        history = int(self.bet_bits[columns[:, _BET_COLUMN]].sum())
+        hand = table.hand_codes[_dice_code(observation.known_dice[observation.player])]
+        cumulative = table.cumulative[hand, history]
+        action = int(np.searchsorted(cumulative, self.rng.random() * cumulative[-1]))
+        if action == CALL:
+            return game.Action(type=game.ActionType.CALL)
+        return game.Action(type=game.ActionType.BET, bet=game.Bet(index=action - 1))
+
+    def round_results(self, result: game.RoundResult):
+        """
+        Update the agent's internal state based on the results of the round.
+
+        Args:
+            result (RoundResult): The outcome of the round.
+        """
+        # pylint: disable=unnecessary-pass
+        pass
+
+
+def main(argv: Optional[List[str]] = None):
+    """Runs the solver from the command line."""
+    parser = argparse.ArgumentParser(
+        prog="python -m call_my_bluff.cfr", description=__doc__.split("\n")[1]
+    )
+    parser.add_argument("--dice", type=int, default=1)
+    parser.add_argument("--max-bet", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--report-every", type=int, default=100)
+    parser.add_argument("--checkpoint", help="Resume from and save to this .npz file.")
+    parser.add_argument("--policy", help="Write the policy table to this .npz file.")
+    args = parser.parse_args(argv)
+
+    if args.checkpoint and os.path.exists(args.checkpoint):
+        solver = CFRSolver.load(args.checkpoint)
+    else:
+        solver = CFRSolver(args.dice, args.max_bet)
+    while solver.iterations < args.iterations:
+        solver.iterate(min(args.report_every, args.iterations - solver.iterations))
+        stats = solver.stats()
+        print(
+            f"{stats['iterations']} iterations, "
+            f"{stats['iterations_per_second']:.1f} /s, "
+            f"{stats['memory_bytes'] / 2**20:.1f} MiB, "
+            f"exploitability {solver.exploitability():.5f}"
+        )
+        if args.checkpoint:
+            solver.save(args.checkpoint)
+    if args.policy:
+        solver.policy_table().save(args.policy)
+
+
+if __name__ == "__main__":
+    main()
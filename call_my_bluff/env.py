@@ -0,0 +1,187 @@
+"""
+The env module contains a vectorized, Gym-style environment for learning agents.
+
+The learner always plays as player 0 of every table, and the other seats are played by
+scripted agents. Actions are integers: a bet is lock_mask * NUM_BETS + bet_index, where
+bit i of lock_mask locks die i and a lock_mask of 0 is a plain bet, and CALL_ACTION
+calls the current bet.
+"""
+from typing import Callable, Sequence, Tuple
+
+import numpy as np
+
+from call_my_bluff import batched
+from call_my_bluff import features
+from call_my_bluff import game
+
+LEARNER = 0
+NUM_BETS = game.MAX_BET_INDEX + 1
+NUM_LOCK_MASKS = game.NUM_LOCK_MASKS
+CALL_ACTION = NUM_LOCK_MASKS * NUM_BETS
+NUM_ACTIONS = CALL_ACTION + 1
+
+# The dice locked by each lock mask
+_LOCK_MASK_DICE = np.array(game.LOCK_MASK_DICE)
+
+
+class VecEnv:
+    """
+    This class is responsible for running many independent tables for one learner.
+
+    Scripted opponents are stepped inside the environment, so every observation
+    returned is for the learner's turn. A table whose game ends, or where the learner
+    runs out of dice, reports done and starts a new game straight away.
+
+    Args:
+        num_envs (int): The number of tables.
+        opponents (Sequence[Callable]): Factories for the agents in seats 1 and up.
+            Each table gets its own instances.
+        history (int): The number of recent actions in the observation features.
+        seed (int, optional): Seed for the games and the opponents. Opponents that draw
+            from the global NumPy random state, like SimpleAgent, draw from a state of
+            their own seeded from it, and the global state is left as it was.
+    """
+
+    def __init__(
+        self,
+        num_envs: int,
+        opponents: Sequence[Callable],
+        history: int = 8,
+        seed=None,
+    ):
+        self.num_envs = num_envs
+        self.num_players = len(opponents) + 1
+        self.batch = batched.BatchedGame(
+            num_envs, self.num_players, seed=seed, history=history
+        )
+        self.encoder = features.ObservationEncoder(self.num_players, history=history)
+        self.opponents = [
+            [None] + [factory() for factory in opponents] for _ in range(num_envs)
+        ]
+        # The global NumPy random state the opponents see while they play
+        self._random_state = np.random.RandomState(
+            np.random.SeedSequence(seed, spawn_key=(0,)).generate_state(1)
+        ).get_state()
+        self.observation_size = self.encoder.size
+        self._observations = np.zeros((num_envs, self.encoder.size), dtype=np.float32)
+
+    def reset(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Starts a new game at every table.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The (num_envs, observation_size) observations
+                and the (num_envs, NUM_ACTIONS) legal action masks.
+        """
+        self.batch.reset()
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+        dones = np.zeros(self.num_envs, dtype=bool)
+        self._play_opponents(rewards, dones)
+        return self._observe(), self.legal_actions()
+
+    def step(
+        self, actions: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Applies the learner's action at every table and plays until its next turn.
+
+        Args:
+            actions (np.ndarray): (num_envs,) integer actions.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: The observations,
+                the rewards (1 for a win and -1 for a loss), the done flags and the
+                legal action masks.
+
+        Raises:
+            ValueError: If any action is illegal.
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        if np.any((actions < 0) | (actions >= NUM_ACTIONS)):
+            raise ValueError("Invalid action.")
+        is_call = actions == CALL_ACTION
+        lock_mask, bet = np.divmod(np.where(is_call, 0, actions), NUM_BETS)
+        action_type = np.where(
+            is_call,
+            game.ActionType.CALL.value,
+            np.where(
+                lock_mask > 0,
+                game.ActionType.REROLL_BET.value,
+                game.ActionType.BET.value,
+            ),
+        )
+
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+        dones = np.zeros(self.num_envs, dtype=bool)
+        result = self.batch.step(action_type, bet, _LOCK_MASK_DICE[lock_mask])
+        self._settle(result, rewards, dones)
+        self._play_opponents(rewards, dones)
+        return self._observe(), rewards, dones, self.legal_actions()
+
+    def legal_actions(self) -> np.ndarray:
+        """
+        Returns the legal actions of the current player at every table.
+
+        Returns:
+            np.ndarray: (num_envs, NUM_ACTIONS) mask of legal actions.
+        """
+        masks = self.batch.legal_actions()
+        # lock mask 0 is a plain bet
+        locks = masks.lock_masks.copy()
+        locks[:, 0] = True
+        legal = np.empty((self.num_envs, NUM_ACTIONS), dtype=bool)
+        legal[:, :CALL_ACTION] = (locks[:, :, None] & masks.bets[:, None, :]).reshape(
+            self.num_envs, -1
+        )
+        legal[:, CALL_ACTION] = masks.can_call
+        return legal
+
+    def _observe(self) -> np.ndarray:
+        return self.encoder.encode_games(self.batch, self._observations).copy()
+
+    def _settle(self, result, rewards: np.ndarray, dones: np.ndarray):
+        won = result.game_over & (result.winner == LEARNER)
+        knocked_out = ~result.game_over & ~self.batch.alive[:, LEARNER]
+        lost = (result.game_over & (result.winner != LEARNER)) | knocked_out
+        rewards[won] += 1
+        rewards[lost] -= 1
+        dones |= won | lost
+        self.batch.reset(np.flatnonzero(knocked_out))
+
+    def _play_opponents(self, rewards: np.ndarray, dones: np.ndarray):
+        random_state = np.random.get_state()
+        np.random.set_state(self._random_state)
+        try:
+            self._play_opponent_turns(rewards, dones)
+        finally:
+            self._random_state = np.random.get_state()
+            np.random.set_state(random_state)
+
+    def _play_opponent_turns(self, rewards: np.ndarray, dones: np.ndarray):
+        batch = self.batch
+        while True:
+            waiting = np.flatnonzero(batch.player_curr != LEARNER)
+            if len(waiting) == 0:
+                return
+            action_type = np.zeros(self.num_envs, dtype=np.int64)
+            bet = np.full(self.num_envs, game.NO_BET_INDEX, dtype=np.int64)
+            dice_to_lock = np.zeros((self.num_envs, game.NUM_DICE), dtype=bool)
+            for player in np.unique(batch.player_curr[waiting]):
+                games = waiting[batch.player_curr[waiting] == player]
+                agent = self.opponents[games[0]][player]
+                if hasattr(agent, "policy_batch"):
+                    # policy_batch treats games independently, so one instance
+                    # decides for the seat at every table
+                    actions = agent.policy_batch(batch.observation_batch(games))
+                else:
+                    actions = batched.ActionBatch.empty(len(games))
+                    for row, index in enumerate(games):
+                        agent = self.opponents[index][player]
+                        actions.set(row, agent.policy(batch.observation(index)))
+                action_type[games] = actions.action_type
+                bet[games] = actions.bet
+                dice_to_lock[games] = actions.dice_to_lock
+            active = np.zeros(self.num_envs, dtype=bool)
+            active[waiting] = True
+            result = batch.step(action_type, bet, dice_to_lock, active=active)
+            self._settle(result, rewards, dones)
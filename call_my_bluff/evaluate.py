@@ -0,0 +1,328 @@
+"""
+The evaluate module plays a lineup only until its win rates are known well enough.
+
+Games are played in batches, numbered and seeded as in a tournament with the same seed.
+After each batch the win rate of every agent gets a Wilson score interval, and the
+evaluation stops once every interval is narrower than the target precision. For two
+agents a sequential probability ratio test can also stop the evaluation as soon as it
+is clear which agent wins more often. Stopping is only checked between batches, so the
+games played depend on the seed and batch size and not on the number of workers.
+
+Usage:
+    python -m call_my_bluff.evaluate MaxAgent SimpleAgent --precision 0.01 --margin 0.05
+"""
+from typing import Callable, List, Optional, Sequence, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from statistics import NormalDist
+import argparse
+import math
+import os
+
+import numpy as np
+
+from call_my_bluff import tournament
+
+STOP_PRECISION = "precision"
+STOP_SPRT = "sprt"
+STOP_MAX_GAMES = "max_games"
+
+
+def wilson_interval(
+    wins: np.ndarray, num_games: int, confidence: float = 0.95
+) -> np.ndarray:
+    """
+    Returns the Wilson score intervals of win rates.
+
+    Args:
+        wins (np.ndarray): The number of games won by each agent.
+        num_games (int): The number of games played.
+        confidence (float): The probability that an interval holds the true win rate.
+
+    Returns:
+        np.ndarray: The lower and upper bounds, with shape (len(wins), 2).
+    """
+    wins = np.asarray(wins, dtype=np.float64)
+    if num_games == 0:
+        return np.tile([0.0, 1.0], (len(wins), 1))
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    rate = wins / num_games
+    denominator = 1 + z * z / num_games
+    centre = (rate + z * z / (2 * num_games)) / denominator
+    half_width = (
+        z
+        * np.sqrt(rate * (1 - rate) / num_games + z * z / (4 * num_games**2))
+        / denominator
+    )
+    return np.stack([centre - half_width, centre + half_width], axis=1)
+
+
+class SPRT:
+    """
+    This class is responsible for the sequential probability ratio test between two
+    agents.
+
+    The test weighs the hypothesis that the first agent wins a game with probability
+    0.5 + margin against the hypothesis that it wins with probability 0.5 - margin.
+
+    Args:
+        margin (float): The difference from an even win rate worth detecting.
+        alpha (float): The probability of wrongly deciding for the first agent.
+        beta (float): The probability of wrongly deciding for the second agent.
+    """
+
+    def __init__(self, margin: float = 0.05, alpha: float = 0.05, beta: float = 0.05):
+        if not 0 < margin < 0.5:
+            raise ValueError("Margin must be between 0 and 0.5.")
+        self.margin = margin
+        self.alpha = alpha
+        self.beta = beta
+        self.upper = math.log((1 - beta) / alpha)
+        self.lower = math.log(beta / (1 - alpha))
+
+    def llr(self, wins: int, losses: int) -> float:
+        """
+        Returns the log-likelihood ratio of the first agent being the better one.
+
+        Args:
+            wins (int): The games won by the first agent.
+            losses (int): The games won by the second agent.
+
+        Returns:
+            float: The log-likelihood ratio.
+        """
+        better = 0.5 + self.margin
+        worse = 0.5 - self.margin
+        return (wins - losses) * math.log(better / worse)
+
+    def decide(self, wins: int, losses: int) -> Optional[int]:
+        """
+        Returns the agent the test decides for.
+
+        Args:
+            wins (int): The games won by the first agent.
+            losses (int): The games won by the second agent.
+
+        Returns:
+            int: 0 or 1 for the agent that wins more often, or None to keep playing.
+        """
+        llr = self.llr(wins, losses)
+        if llr >= self.upper:
+            return 0
+        if llr <= self.lower:
+            return 1
+        return None
+
+
+@dataclass
+class EvaluationResult:
+    """
+    This class holds the outcome of an evaluation.
+
+    The stop reason is one of STOP_PRECISION, STOP_SPRT and STOP_MAX_GAMES, and the
+    SPRT fields are only set when a test was run.
+    """
+
+    result: tournament.TournamentResult
+    intervals: np.ndarray
+    confidence: float
+    stop_reason: str
+    llr: Optional[float] = None
+    sprt_winner: Optional[int] = None
+
+    @property
+    def num_games(self) -> int:
+        """The number of games played."""
+        return self.result.num_games
+
+
+def _check_stop(
+    result: tournament.TournamentResult,
+    intervals: np.ndarray,
+    precision: Optional[float],
+    sprt: Optional[SPRT],
+    max_games: int,
+) -> Tuple[Optional[str], Optional[float], Optional[int]]:
+    llr = winner = None
+    if sprt is not None:
+        llr = sprt.llr(result.wins[0], result.wins[1])
+        winner = sprt.decide(result.wins[0], result.wins[1])
+        if winner is not None:
+            return STOP_SPRT, llr, winner
+    if precision is not None:
+        half_widths = (intervals[:, 1] - intervals[:, 0]) / 2
+        if half_widths.max() <= precision:
+            return STOP_PRECISION, llr, winner
+    if result.num_games >= max_games:
+        return STOP_MAX_GAMES, llr, winner
+    return None, llr, winner
+
+
+def evaluate(
+    agent_factories: Sequence[Callable],
+    max_games: int = 10000,
+    batch_size: int = 200,
+    precision: Optional[float] = 0.01,
+    confidence: float = 0.95,
+    sprt: Optional[SPRT] = None,
+    num_workers: Optional[int] = 1,
+    chunk_size: int = tournament.DEFAULT_CHUNK_SIZE,
+    seed: Optional[int] = None,
+) -> EvaluationResult:
+    """
+    Plays games between a lineup of agents until the win rates are settled.
+
+    Args:
+        agent_factories (Sequence[Callable]): Picklable callables that build the agents.
+        max_games (int): The most games to play.
+        batch_size (int): The number of games played between checks.
+        precision (float, optional): Stop once every win rate interval has at most
+            this half width. None to only stop on the SPRT or max_games.
+        confidence (float): The confidence of the intervals.
+        sprt (SPRT, optional): A test between the two agents of a two player lineup.
+        num_workers (int, optional): The number of processes, os.cpu_count() if None.
+            With one worker the games are played in this process.
+        chunk_size (int): The number of games handed to a worker at once.
+        seed (int, optional): The evaluation seed, drawn at random if None.
+
+    Returns:
+        EvaluationResult: The statistics of the games played and why they stopped.
+
+    Raises:
+        ValueError: If the batch size is not positive, or a test is given for a lineup
+            that is not two agents.
+    """
+    if batch_size <= 0:
+        raise ValueError("Batch size must be positive.")
+    if sprt is not None and len(agent_factories) != 2:
+        raise ValueError("The SPRT compares exactly two agents.")
+    if seed is None:
+        seed = int(np.random.SeedSequence().generate_state(1)[0])
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    result = tournament.TournamentResult(
+        agent_names=[tournament.agent_name(factory) for factory in agent_factories],
+        seed=seed,
+    )
+    executor = None if num_workers == 1 else ProcessPoolExecutor(num_workers)
+    random_state = np.random.get_state()
+    try:
+        while True:
+            batch_stop = min(result.num_games + batch_size, max_games)
+            chunks = [
+                (start, min(start + chunk_size, batch_stop))
+                for start in range(result.num_games, batch_stop, chunk_size)
+            ]
+            if executor is None:
+                for start, stop in chunks:
+                    result.merge(
+                        tournament.play_games(agent_factories, seed, start, stop)
+                    )
+            else:
+                futures = [
+                    executor.submit(
+                        tournament.play_games,
+                        agent_factories,
+                        seed,
+                        start,
+                        stop,
+                    )
+                    for start, stop in chunks
+                ]
+                for future in futures:
+                    result.merge(future.result())
+
+            intervals = wilson_interval(result.wins, result.num_games, confidence)
+            stop_reason, llr, winner = _check_stop(
+                result, intervals, precision, sprt, max_games
+            )
+            if stop_reason is not None:
+                return EvaluationResult(
+                    result=result,
+                    intervals=intervals,
+                    confidence=confidence,
+                    stop_reason=stop_reason,
+                    llr=llr,
+                    sprt_winner=winner,
+                )
+    finally:
+        np.random.set_state(random_state)
+        if executor is not None:
+            executor.shutdown()
+
+
+def print_evaluation(evaluation: EvaluationResult):
+    """
+    Prints the win rates and intervals of an evaluation.
+
+    Args:
+        evaluation (EvaluationResult): The outcome of the evaluation.
+    """
+    result = evaluation.result
+    print(
+        f"Stopped on {evaluation.stop_reason} after {result.num_games} games "
+        f"(seed {result.seed}):"
+    )
+    for name, rate, (low, high) in zip(
+        result.agent_names, result.win_rates(), evaluation.intervals
+    ):
+        print(
+            f"{name}: {rate:.4f} "
+            f"[{low:.4f}, {high:.4f}] at {evaluation.confidence:.0%} confidence"
+        )
+    if evaluation.llr is not None:
+        decision = (
+            "undecided"
+            if evaluation.sprt_winner is None
+            else f"{result.agent_names[evaluation.sprt_winner]} is better"
+        )
+        print(f"SPRT log-likelihood ratio {evaluation.llr:.3f}: {decision}")
+
+
+def main(argv: Optional[List[str]] = None):
+    """Runs an evaluation from the command line."""
+    parser = argparse.ArgumentParser(
+        prog="python -m call_my_bluff.evaluate", description=__doc__.split("\n")[1]
+    )
+    parser.add_argument(
+        "agents", nargs="+", help="Agent class names or module:Class specs."
+    )
+    parser.add_argument("--max-games", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument(
+        "--precision",
+        type=float,
+        default=0.01,
+        help="Target half width of the win rate intervals, 0 to disable.",
+    )
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument(
+        "--margin",
+        type=float,
+        default=None,
+        help="Run an SPRT that detects this difference from an even win rate.",
+    )
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    sprt = None
+    if args.margin is not None:
+        sprt = SPRT(args.margin, args.alpha, args.beta)
+    evaluation = evaluate(
+        [tournament.load_agent(spec) for spec in args.agents],
+        max_games=args.max_games,
+        batch_size=args.batch_size,
+        precision=args.precision or None,
+        confidence=args.confidence,
+        sprt=sprt,
+        num_workers=args.workers,
+        seed=args.seed,
+    )
+    print_evaluation(evaluation)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+The features module encodes observations as fixed-width vectors for learning agents.
+
+Players are ordered relative to the observing player, so offset 0 is always the
+observer and offset 1 is the next player in seat order.
+"""
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from call_my_bluff import game
+
+NUM_FACES = 6
+ACTION_TYPES = (game.ActionType.CALL, game.ActionType.BET, game.ActionType.REROLL_BET)
+# The column of each ActionType value among ACTION_TYPES
+_TYPE_COLUMN = np.array(
+    [
+        ACTION_TYPES.index(action_type) if action_type in ACTION_TYPES else -1
+        for action_type in game.ActionType
+    ]
+)
+
+
+class ObservationEncoder:
+    """
+    This class is responsible for turning observations into feature vectors.
+
+    The features are, in order: a one-hot of the current bet (including no bet), a
+    histogram of the known dice of each player, the number of unknown dice of each
+    player, a one-hot of the value of each of the observer's dice, the observer's lock
+    mask and the last actions of the round, most recent first. Each action is a one-hot
+    of its type, a one-hot of the player and its bet index divided by MAX_BET_INDEX.
+
+    Args:
+        num_players (int): The number of players in the game.
+        history (int): The number of most recent actions to encode.
+    """
+
+    def __init__(self, num_players: int, history: int = 8):
+        self.num_players = num_players
+        self.history = history
+        self.action_size = len(ACTION_TYPES) + num_players + 1
+
+        self.bet_offset = 0
+        self.known_offset = self.bet_offset + game.MAX_BET_INDEX + 2
+        self.unknown_offset = self.known_offset + num_players * NUM_FACES
+        self.dice_offset = self.unknown_offset + num_players
+        self.locked_offset = self.dice_offset + game.NUM_DICE * NUM_FACES
+        self.history_offset = self.locked_offset + game.NUM_DICE
+        self.size = self.history_offset + history * self.action_size
+
+    def encode(
+        self, observation: game.Observation, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Encodes one observation.
+
+        Args:
+            observation (Observation): The observation to encode.
+            out (np.ndarray, optional): A (size,) array to write into.
+
+        Returns:
+            np.ndarray: The (size,) feature vector.
+        """
+        if out is None:
+            out = np.zeros(self.size, dtype=np.float32)
+        else:
+            out[:] = 0
+        self._encode_into(observation, out)
+        return out
+
+    def encode_batch(
+        self,
+        observations: Sequence[game.Observation],
+        out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        Encodes a batch of observations into consecutive rows.
+
+        The observations are gathered into flat arrays, and the action logs are read
+        from their int16 columns, so the rows are filled by array assignments without
+        building any Actions.
+
+        Args:
+            observations (Sequence[Observation]): The observations to encode.
+            out (np.ndarray, optional): A (batch, size) array to write into, with at
+                least as many rows as there are observations.
+
+        Returns:
+            np.ndarray: The (len(observations), size) rows that were written.
+        """
+        num_observations, num_players = len(observations), self.num_players
+        if out is None:
+            out = np.zeros((num_observations, self.size), dtype=np.float32)
+        rows = out[:num_observations]
+        rows[:] = 0
+        if num_observations == 0:
+            return rows
+        observation_index = np.arange(num_observations)
+        observer = np.fromiter((obs.player for obs in observations), np.intp)
+        bet = np.fromiter((obs.bet.index for obs in observations), np.intp)
+        rows[observation_index, self.bet_offset + bet + 1] = 1
+
+        players = (observer[:, None] + np.arange(num_players)) % num_players
+        unknown = np.array([obs.unknown_dice for obs in observations])
+        rows[:, self.unknown_offset : self.dice_offset] = unknown[
+            observation_index[:, None], players
+        ]
+
+        # The known dice of every player of every observation, flattened
+        known_dice = [dice for obs in observations for dice in obs.known_dice]
+        cell, position, dice_value = _flatten(known_dice)
+        owner, player = np.divmod(cell, num_players)
+        offset = (player - observer[owner]) % num_players
+        np.add.at(rows, (owner, self.known_offset + offset * NUM_FACES + dice_value), 1)
+        own = offset == 0
+        rows[
+            owner[own], self.dice_offset + position[own] * NUM_FACES + dice_value[own]
+        ] = 1
+
+        owner, position, dice_locked = _flatten(
+            [obs.player_locked_dice for obs in observations]
+        )
+        rows[owner, self.locked_offset + position] = dice_locked
+
+        # The last actions of every round, most recent first
+        owner, age, actions = _flatten(
+            [obs.action_log.columns[::-1][: self.history] for obs in observations]
+        )
+        if len(actions) == 0:
+            return rows
+        column = _TYPE_COLUMN[actions[:, 0]]
+        encoded = column >= 0
+        owner, age, actions = owner[encoded], age[encoded], actions[encoded]
+        start = self.history_offset + age * self.action_size
+        rows[owner, start + column[encoded]] = 1
+        offset = (actions[:, 1] - observer[owner]) % num_players
+        rows[owner, start + len(ACTION_TYPES) + offset] = 1
+        rows[owner, start + self.action_size - 1] = np.where(
+            actions[:, 0] == game.ActionType.CALL.value,
+            0,
+            actions[:, 2] / game.MAX_BET_INDEX,
+        )
+        return rows
+
+    def encode_games(self, batch, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Encodes the observation of the current player of every game in a BatchedGame.
+
+        This works on the arrays of the batched engine directly, and gives the same
+        features as encoding each game's observation. Only as many actions as the
+        batch keeps in its history can be encoded.
+
+        Args:
+            batch (BatchedGame): The games to encode, with num_players players.
+            out (np.ndarray, optional): A (batch, size) array to write into, with at
+                least num_games rows.
+
+        Returns:
+            np.ndarray: The (num_games, size) rows that were written.
+        """
+        num_games, num_players = batch.num_games, self.num_players
+        if out is None:
+            out = np.zeros((num_games, self.size), dtype=np.float32)
+        rows = out[:num_games]
+        rows[:] = 0
+        games = np.arange(num_games)
+        observer = batch.player_curr
+        rows[games, self.bet_offset + batch.bet + 1] = 1
+
+        players = (observer[:, None] + np.arange(num_players)) % num_players
+        dice = batch.dice[games[:, None], players]
+        has_dice = dice >= 0
+        known = batch.dice_locked[games[:, None], players] & has_dice
+        known[:, 0] = has_dice[:, 0]
+        faces = dice[..., None] == np.arange(NUM_FACES)
+        histogram = (faces & known[..., None]).sum(axis=2)
+        rows[:, self.known_offset : self.unknown_offset] = histogram.reshape(
+            num_games, -1
+        )
+        rows[:, self.unknown_offset : self.dice_offset] = (has_dice & ~known).sum(
+            axis=2
+        )
+        rows[:, self.dice_offset : self.locked_offset] = faces[:, 0].reshape(
+            num_games, -1
+        )
+        rows[:, self.locked_offset : self.history_offset] = batch.dice_locked[
+            games, observer
+        ]
+
+        for age in range(min(self.history, batch.history)):
+            turn = batch.round_turns - 1 - age
+            taken = games[turn >= 0]
+            position = turn[taken] % batch.history
+            start = self.history_offset + age * self.action_size
+            action_type = batch.history_type[taken, position]
+            rows[taken, start + _TYPE_COLUMN[action_type]] = 1
+            offset = (
+                batch.history_player[taken, position] - observer[taken]
+            ) % num_players
+            rows[taken, start + len(ACTION_TYPES) + offset] = 1
+            rows[taken, start + self.action_size - 1] = np.where(
+                action_type == game.ActionType.CALL.value,
+                0,
+                batch.history_bet[taken, position] / game.MAX_BET_INDEX,
+            )
+        return rows
+
+    def _encode_into(self, observation: game.Observation, out: np.ndarray):
+        num_players = self.num_players
+        observer = observation.player
+        out[self.bet_offset + observation.bet.index + 1] = 1
+
+        for player in range(num_players):
+            offset = (player - observer) % num_players
+            histogram = self.known_offset + offset * NUM_FACES
+            for dice_value in observation.known_dice[player]:
+                out[histogram + dice_value] += 1
+            out[self.unknown_offset + offset] = observation.unknown_dice[player]
+
+        for dice_index, dice_value in enumerate(observation.known_dice[observer]):
+            out[self.dice_offset + dice_index * NUM_FACES + dice_value] = 1
+        for dice_index, dice_locked in enumerate(observation.player_locked_dice):
+            out[self.locked_offset + dice_index] = dice_locked
+
+        action_log = observation.action_log
+        for age in range(min(self.history, len(action_log))):
+            action = action_log[len(action_log) - 1 - age]
+            if action.type not in ACTION_TYPES:
+                continue
+            start = self.history_offset + age * self.action_size
+            out[start + ACTION_TYPES.index(action.type)] = 1
+            offset = (action.player - observer) % num_players
+            out[start + len(ACTION_TYPES) + offset] = 1
+            if action.bet is not None:
+                out[start + self.action_size - 1] = (
+                    action.bet.index / game.MAX_BET_INDEX
+                )
+
+
+def _flatten(sequences: Sequence) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # The index of the sequence and the position in it of every item, and the items
+    lengths = np.fromiter((len(items) for items in sequences), np.intp, len(sequences))
+    index = np.repeat(np.arange(len(sequences)), lengths)
+    position = np.arange(len(index)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    items = [items for items in sequences if len(items)]
+    if not items:
+        return index, position, np.zeros(0, dtype=np.intp)
+    return index, position, np.concatenate(items)
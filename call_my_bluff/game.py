@@ -1,200 +1,613 @@
 """
 The game module contains the game state defintion and the game logic as functions.
 """
-from typing import List, Optional, Tuple
-from dataclasses import dataclass
-from enum import Enum
-import copy
+from typing import List, NamedTuple, Optional, Sequence, Tuple, Union
+from collections.abc import Sequence as SequenceABC
+from dataclasses import dataclass, field
 
 import numpy as np
 
-NO_BET_INDEX = -1
-MAX_BET_INDEX = 109
-NUM_DICE = 5
-STAR = 5
+# pylint: disable=unused-import
+from call_my_bluff.rules import (
+    BETS,
+    MAX_BET_INDEX,
+    NO_BET_INDEX,
+    NUM_DICE,
+    STAR,
+    Action,
+    ActionType,
+    Bet,
+)
+
+DICE_BUFFER_SIZE = 256
+ACTION_LOG_CAPACITY = 16
+
+# Lookup tables over bet indices, offset by one so NO_BET_INDEX is at position 0
+_BET_NUM_DICE = np.array([bet.num_dice for bet in BETS], dtype=np.int64)
+_BET_DICE_VALUE = np.array([bet.dice_value for bet in BETS], dtype=np.int64)
+_BET_INDEX = np.full((_BET_NUM_DICE.max() + 1, 6), MAX_BET_INDEX + 1, dtype=np.int64)
+for _bet in BETS:
+    _BET_INDEX[_bet.num_dice, _bet.dice_value] = _bet.index
+del _bet
+
+NUM_LOCK_MASKS = 1 << NUM_DICE
+_LOCK_MASKS = np.arange(NUM_LOCK_MASKS)
+# LEGAL_BETS[bet_index + 1] marks the bets that may follow bet_index
+LEGAL_BETS = (
+    np.arange(MAX_BET_INDEX + 1) > np.arange(NO_BET_INDEX, MAX_BET_INDEX + 1)[:, None]
+)
+LEGAL_BETS.setflags(write=False)
+# LEGAL_LOCK_MASKS[free_mask] marks the lock masks of a legal reroll, where bit i of
+# free_mask is set if die i can still be locked and a reroll locks at least one die
+LEGAL_LOCK_MASKS = ((_LOCK_MASKS & ~_LOCK_MASKS[:, None]) == 0) & (_LOCK_MASKS > 0)
+LEGAL_LOCK_MASKS.setflags(write=False)
+# LOCK_MASK_DICE[lock_mask] is the dice_to_lock of a lock mask for a full hand
+LOCK_MASK_DICE = tuple(
+    tuple(bool(lock_mask >> die & 1) for die in range(NUM_DICE))
+    for lock_mask in range(NUM_LOCK_MASKS)
+)
+
+
+def bet_index_to_bet(index) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converts bet indices to numbers of dice and dice values.
 
+    Args:
+        index (array_like): Bet indices from NO_BET_INDEX to MAX_BET_INDEX.
 
-class ActionType(Enum):
-    """
-    This class is responsible for enumerating the different types of actions.
-    """
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The numbers of dice and the dice values.
 
-    CALL = 0
-    BET = 1
-    REROLL_BET = 2
-    RESULT = 3
+    Raises:
+        ValueError: If any bet index is invalid.
+    """
+    index = np.asarray(index)
+    if np.any((index < NO_BET_INDEX) | (index > MAX_BET_INDEX)):
+        raise ValueError("Invalid bet index")
+    return _BET_NUM_DICE[index + 1], _BET_DICE_VALUE[index + 1]
 
 
-class Bet:
+def bet_to_bet_index(num_dice, dice_value) -> np.ndarray:
     """
-    This class is responsible for representing a bet.
+    Converts numbers of dice and dice values to bet indices.
 
     Args:
-        num_dice (int): The number of dice in the bet.
-        dice_value (int): The value of the dice in the bet.
-
-        or
+        num_dice (array_like): The numbers of dice in the bets.
+        dice_value (array_like): The values of the dice in the bets.
 
-        index (int): The bet index.
+    Returns:
+        np.ndarray: The bet indices.
 
     Raises:
-        ValueError: If the bet index is invalid.
+        ValueError: If any bet is invalid.
+    """
+    num_dice, dice_value = np.broadcast_arrays(num_dice, dice_value)
+    valid = (
+        (num_dice >= 0)
+        & (num_dice < _BET_INDEX.shape[0])
+        & (dice_value >= 0)
+        & (dice_value <= STAR)
+    )
+    if not np.all(valid):
+        raise ValueError("Invalid bet index")
+    index = _BET_INDEX[num_dice, dice_value]
+    if np.any(index > MAX_BET_INDEX):
+        raise ValueError("Invalid bet index")
+    return index
+
+
+# The columns of an ActionLog, missing values are stored as -1
+ACTION_LOG_COLUMNS = (
+    "type",
+    "player",
+    "bet",
+    "lock_mask",
+    "num_locks",
+    "loser",
+    "dice_lost",
+    "actual_num_dice",
+    "dice_value",
+)
+_LOG_TYPE, _LOG_PLAYER, _LOG_BET, _LOG_LOCK_MASK, _LOG_NUM_LOCKS = range(5)
+_ACTION_TYPES = tuple(ActionType)
+_RESULT = ActionType.RESULT.value
+
+
+class ActionLog(SequenceABC):
+    """
+    This class is responsible for the append-only action log of a round.
+
+    Actions are stored as rows of a preallocated int16 array with one column per entry
+    of ACTION_LOG_COLUMNS, and the array doubles in size when it is full. Reading an
+    entry builds a read-only Action from its row, and the columns property gives the
+    filled rows as a NumPy view without building any Actions. A forked log shares the
+    array with the log it was forked from until either of them appends.
 
+    Args:
+        capacity (int): The number of actions that fit before the first resize.
     """
 
-    def __init__(self, **kwargs):
-        # Accept either (num_dice, dice_value) or bet_index
-        if "index" in kwargs:
-            self._index = kwargs["index"]
-        elif "num_dice" in kwargs and "dice_value" in kwargs:
-            self._index = self._bet_to_bet_index(
-                kwargs["num_dice"], kwargs["dice_value"]
+    __slots__ = ("_columns", "_length", "_shared")
+    __hash__ = None
+
+    def __init__(self, capacity: int = ACTION_LOG_CAPACITY):
+        self._columns = np.empty((capacity, len(ACTION_LOG_COLUMNS)), dtype=np.int16)
+        self._length = 0
+        self._shared = False
+
+    def fork(self) -> "ActionLog":
+        """
+        Returns a log with the same actions that can be appended to independently.
+
+        Both logs keep sharing their rows until one of them appends, which then
+        copies the rows first.
+
+        Returns:
+            ActionLog: The forked log.
+        """
+        action_log = ActionLog.__new__(ActionLog)
+        action_log._columns = self._columns
+        action_log._length = self._length
+        action_log._shared = self._shared = True
+        return action_log
+
+    def append(self, action: Action, player: Optional[int] = None):
+        """
+        Adds an action to the end of the log.
+
+        Args:
+            action (Action): The action to add.
+            player (int, optional): The player who took the action, action.player if
+                None.
+        """
+        if self._length == len(self._columns):
+            self._columns = np.concatenate(
+                [self._columns, np.empty_like(self._columns)]
             )
-        else:
-            raise ValueError("Invalid bet arguments")
-        if self._index < NO_BET_INDEX or self._index > MAX_BET_INDEX:
-            raise ValueError("Invalid bet index")
+            self._shared = False
+        elif self._shared:
+            self._columns = self._columns.copy()
+            self._shared = False
+        if player is None:
+            player = -1 if action.player is None else action.player
+        bet = -1 if action.bet is None else action.bet.index
+        lock_mask = 0
+        num_locks = -1
+        if action.dice_to_lock is not None:
+            num_locks = len(action.dice_to_lock)
+            for dice_index, lock_dice in enumerate(action.dice_to_lock):
+                if lock_dice:
+                    lock_mask |= 1 << dice_index
+        result = (-1, -1, -1, -1) if action.result is None else action.result
+        self._columns[self._length] = (
+            action.type.value,
+            player,
+            bet,
+            lock_mask,
+            num_locks,
+            *result,
+        )
+        self._length += 1
 
     @property
-    def index(self):
-        """The bet index."""
-        return self._index
+    def columns(self) -> np.ndarray:
+        """A read-only (len(self), len(ACTION_LOG_COLUMNS)) view of the log."""
+        columns = self._columns[: self._length]
+        columns.flags.writeable = False
+        return columns
+
+    @classmethod
+    def from_columns(cls, columns) -> "ActionLog":
+        """
+        Builds an action log from rows like those of the columns property.
+
+        Args:
+            columns (array_like): (num_actions, len(ACTION_LOG_COLUMNS)) rows.
+
+        Returns:
+            ActionLog: A log holding a copy of the rows.
+        """
+        columns = np.asarray(columns, dtype=np.int16).reshape(
+            -1, len(ACTION_LOG_COLUMNS)
+        )
+        action_log = cls(capacity=max(len(columns), 1))
+        action_log._columns[: len(columns)] = columns
+        action_log._length = len(columns)
+        return action_log
+
+    def last_type(self) -> Optional[ActionType]:
+        """Returns the type of the last action, None if the log is empty."""
+        if self._length == 0:
+            return None
+        return _ACTION_TYPES[self._columns[self._length - 1, _LOG_TYPE]]
+
+    def _action(self, index: int) -> Action:
+        action_type, player, bet, lock_mask, num_locks, *result = self._columns[
+            index
+        ].tolist()
+        action_type = _ACTION_TYPES[action_type]
+        return Action(
+            type=action_type,
+            dice_to_lock=(
+                None
+                if num_locks < 0
+                else tuple(bool(lock_mask >> i & 1) for i in range(num_locks))
+            ),
+            bet=None if bet < 0 else BETS[bet + 1],
+            result=tuple(result) if action_type == ActionType.RESULT else None,
+            player=None if player < 0 else player,
+        )
 
-    @index.setter
-    def index(self, value):
-        self._index = value
+    def __len__(self):
+        return self._length
 
-    @property
-    def num_dice(self):
-        """The number of dice in the bet."""
-        return self._bet_index_to_bet(self._index)[0]
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self._action(i) for i in range(*index.indices(self._length)))
+        if index < 0:
+            index += self._length
+        if index < 0 or index >= self._length:
+            raise IndexError("action log index out of range")
+        return self._action(index)
 
-    @num_dice.setter
-    def num_dice(self, value):
-        dice_value = self._bet_index_to_bet(self._index)[1]
-        self._index = self._bet_to_bet_index(value, dice_value)
+    def __eq__(self, other):
+        if not isinstance(other, ActionLog):
+            return NotImplemented
+        return np.array_equal(self.columns, other.columns)
 
-    @property
-    def dice_value(self):
-        """The value of the dice in the bet."""
-        return self._bet_index_to_bet(self._index)[1]
-
-    @dice_value.setter
-    def dice_value(self, value):
-        num_dice = self._bet_index_to_bet(self._index)[0]
-        self._index = self._bet_to_bet_index(num_dice, value)
-
-    def _bet_index_to_bet(self, index: int):
-        if index == NO_BET_INDEX:
-            return (0, 0)
-
-        group = index // 11
-        position = index % 11
-        if position == 5:
-            bet = (group + 1, STAR)
-        elif position < 5:
-            bet = (2 * group + 1, position)
-        else:
-            bet = (2 * group + 2, position - 6)
+    def __repr__(self):
+        return f"ActionLog({list(self)})"
 
-        return bet
 
-    def _bet_to_bet_index(self, num_dice: int, dice_value: int):
-        if (num_dice, dice_value) is (0, 0):
-            return NO_BET_INDEX
+class DiceRoller:
+    """
+    This class is responsible for the random numbers of a single game.
 
-        if dice_value == STAR:
-            group = num_dice - 1
-            position = 5
-        else:
-            group = (num_dice - 1) // 2
-            position = dice_value
-            if num_dice % 2 == 0:
-                position += 6
+    Dice are drawn from a NumPy Generator in bulk and served from a buffer, so a game
+    is reproducible from its seed and rolling dice is a list slice. A forked roller
+    only copies the state of the generator, and builds its own generator from it the
+    first time it needs more random numbers than its buffer holds.
 
-        index = group * 11 + position
-        return index
+    Args:
+        seed (int, np.random.Generator or np.random.SeedSequence, optional): The seed
+            or generator for the game, fresh entropy if None.
+        buffer_size (int): The number of dice drawn at once.
+    """
 
-    def __str__(self):
-        return f"[Dice Num: {self.dice_value}, Num Dice: {self.num_dice}, Dice Index: {self.index}]"
+    def __init__(self, seed=None, buffer_size: int = DICE_BUFFER_SIZE):
+        self._rng = np.random.default_rng(seed)
+        self._rng_state = None
+        self.buffer_size = buffer_size
+        self._buffer = []
+        self._position = 0
 
-    # pylint: disable=unused-argument, invalid-name
-    def _repr_pretty_(self, p, cycle):
-        p.text(
-            f"[Dice Num: {self.dice_value}, Num Dice: {self.num_dice}, Dice Index: {self.index}]"
-        )
+    @property
+    def rng(self) -> np.random.Generator:
+        """The generator the dice are drawn from."""
+        if self._rng is None:
+            bit_generator_type, bit_generator_state = self._rng_state
+            bit_generator = bit_generator_type()
+            bit_generator.state = bit_generator_state
+            self._rng = np.random.Generator(bit_generator)
+            self._rng_state = None
+        return self._rng
+
+    def fork(self) -> "DiceRoller":
+        """
+        Returns a roller that rolls the same dice as this one from now on.
+
+        Returns:
+            DiceRoller: The forked roller.
+        """
+        roller = DiceRoller.__new__(DiceRoller)
+        if self._rng is None:
+            roller._rng_state = self._rng_state
+        else:
+            bit_generator = self._rng.bit_generator
+            roller._rng_state = (type(bit_generator), bit_generator.state)
+        roller._rng = None
+        roller.buffer_size = self.buffer_size
+        # the buffer is replaced rather than changed when it is refilled
+        roller._buffer = self._buffer
+        roller._position = self._position
+        return roller
+
+    def _refill(self):
+        self._buffer = self.rng.integers(0, 6, size=self.buffer_size).tolist()
+        self._position = 0
+
+    def roll(self, num_dice: int) -> List[int]:
+        """
+        Rolls dice.
+
+        Args:
+            num_dice (int): The number of dice to roll.
+
+        Returns:
+            List[int]: The dice values.
+        """
+        end = self._position + num_dice
+        if end > len(self._buffer):
+            if num_dice > self.buffer_size:
+                return self.rng.integers(0, 6, size=num_dice).tolist()
+            self._refill()
+            end = num_dice
+        dice = self._buffer[self._position : end]
+        self._position = end
+        return dice
+
+    def shuffle(self, values: List[int]) -> List[int]:
+        """
+        Returns the values in a random order.
+
+        Args:
+            values (List[int]): The values to shuffle.
+
+        Returns:
+            List[int]: A shuffled copy of the values.
+        """
+        return [values[i] for i in self.rng.permutation(len(values)).tolist()]
+
+
+class FaceCounts:
+    """
+    This class is responsible for counting the faces of one player's dice.
 
-    def __repr__(self):
-        return f"Bet(num_dice={self.num_dice}, dice_value={self.dice_value})"
+    The counts are the engine's record of the dice and lock lists they were built
+    from, and the engine updates them whenever it rolls or locks dice, so reading them
+    never looks at the dice. Replacing a player's dice or lock list is noticed by
+    face_counts, which then counts the new lists, but dice changed in place outside the
+    engine must be set with set_dice.
 
+    Args:
+        dice (List[int]): The player's dice.
+        dice_locked (List[bool]): The player's lock mask.
 
-@dataclass
-class Action:
-    """This class is responsible for holding the action for the current player."""
+    Attributes:
+        locked (List[int]): The number of locked dice of each value.
+        unlocked (List[int]): The number of unlocked dice of each value.
+        num_locked (int): The number of locked dice.
+    """
 
-    type: ActionType
-    dice_to_lock: Optional[List[bool]] = None
-    bet: Optional[Bet] = None
-    result: Optional[Tuple[int]] = None
-    player: Optional[int] = None
+    __slots__ = ("dice", "dice_locked", "locked", "unlocked", "num_locked")
 
+    def __init__(self, dice: List[int], dice_locked: List[bool]):
+        self.dice = dice
+        self.dice_locked = dice_locked
+        self.locked = [0] * 6
+        self.unlocked = [0] * 6
+        for dice_value, locked in zip(dice, dice_locked):
+            if locked:
+                self.locked[dice_value] += 1
+            else:
+                self.unlocked[dice_value] += 1
+        self.num_locked = sum(self.locked)
 
-@dataclass
+
+@dataclass(init=False)
 class State:
     """
     This class is responsible for keeping track of the state of the game.
+
+    The players with dice are linked in turn order through next_player and
+    prev_player, and counted in players_alive, so finding the next player and knocking
+    a player out do not depend on the size of the table. Knocked out players link to
+    themselves. The links are built from turn_order when they are not given.
+
+    Reading turn_order walks the links from first_player, once after every knockout,
+    and gives a new list, so changing that list does not change the state. Assigning
+    a new turn order links it again.
+
+    Args:
+        num_players (int): The number of players in the game.
+        bet (Bet): The current bet.
+        player_curr (int): The player whose turn it is.
+        player_prev (int, optional): The player who made the current bet.
+        turn_order (Sequence[int]): The players with dice, in turn order.
+        num_dice (List[int]): The number of dice of each player.
+        dice (List[List[int]]): The dice of each player.
+        dice_locked (List[List[bool]]): The lock mask of each player.
+        action_log (ActionLog): The actions of the round.
+        roller (DiceRoller, optional): The random numbers of the game, fresh entropy
+            if None.
+        histograms (List[FaceCounts], optional): The face counts of each player.
+        next_player, prev_player (List[int], optional): The links of turn_order.
+        players_alive (int, optional): The number of players in turn_order.
     """
 
     num_players: int
     bet: Bet
     player_curr: int
     player_prev: Optional[int]
-    turn_order: List[int]
     num_dice: List[int]
     dice: List[List[int]]
     dice_locked: List[List[bool]]
-    action_log: List[Action]
+    action_log: ActionLog
+    roller: DiceRoller = field(repr=False, compare=False)
+    # The FaceCounts of each player, see face_counts
+    histograms: Optional[List[Optional[FaceCounts]]] = field(repr=False, compare=False)
+    # The turn order, as its first player and the links of the circle
+    first_player: Optional[int] = field(repr=False)
+    next_player: List[int] = field(repr=False)
+    prev_player: List[int] = field(repr=False, compare=False)
+    players_alive: int = field(repr=False, compare=False)
+
+    # pylint: disable-next=too-many-arguments
+    def __init__(
+        self,
+        num_players: int,
+        bet: Bet,
+        player_curr: int,
+        player_prev: Optional[int],
+        turn_order: Sequence[int],
+        num_dice: List[int],
+        dice: List[List[int]],
+        dice_locked: List[List[bool]],
+        action_log: ActionLog,
+        roller: Optional[DiceRoller] = None,
+        histograms: Optional[List[Optional[FaceCounts]]] = None,
+        next_player: Optional[List[int]] = None,
+        prev_player: Optional[List[int]] = None,
+        players_alive: Optional[int] = None,
+    ):
+        self.num_players = num_players
+        self.bet = bet
+        self.player_curr = player_curr
+        self.player_prev = player_prev
+        self.num_dice = num_dice
+        self.dice = dice
+        self.dice_locked = dice_locked
+        self.action_log = action_log
+        self.roller = DiceRoller() if roller is None else roller
+        self.histograms = histograms
+        if next_player is None:
+            _link_turn_order(self, turn_order)
+        else:
+            self.next_player = next_player
+            self.prev_player = prev_player
+            self.players_alive = players_alive
+            self.first_player = turn_order[0] if turn_order else None
+            self._turn_order = tuple(turn_order)
 
+    @property
+    def turn_order(self) -> List[int]:
+        """The players with dice in turn order, as a new list."""
+        return list(_turn_order(self))
+
+    @turn_order.setter
+    def turn_order(self, turn_order: Sequence[int]):
+        _link_turn_order(self, turn_order)
+
+
+def _link_turn_order(state: State, turn_order: Sequence[int]):
+    # Links the players of turn_order into a circular list
+    # pylint: disable=protected-access
+    turn_order = tuple(turn_order)
+    state.next_player = list(range(state.num_players))
+    state.prev_player = list(range(state.num_players))
+    for position, player in enumerate(turn_order):
+        following = turn_order[(position + 1) % len(turn_order)]
+        state.next_player[player] = following
+        state.prev_player[following] = player
+    state.players_alive = len(turn_order)
+    state.first_player = turn_order[0] if turn_order else None
+    state._turn_order = turn_order
+
+
+def _turn_order(state: State) -> Tuple[int, ...]:
+    # The turn order as a tuple, walked from the links once after every knockout
+    # pylint: disable=protected-access
+    turn_order = state._turn_order
+    if turn_order is None:
+        player = state.first_player
+        order = []
+        for _ in range(state.players_alive):
+            order.append(player)
+            player = state.next_player[player]
+        turn_order = state._turn_order = tuple(order)
+    return turn_order
+
+
+class ActionLogView(SequenceABC):
+    """
+    This class is a read-only view of the first entries of an action log.
+
+    The action log of a round is only ever appended to, so a view keeps showing the
+    actions that had been taken when it was created.
+
+    Args:
+        action_log (ActionLog): The action log of the round.
+        length (int, optional): The number of actions to show, all if None.
+    """
+
+    __slots__ = ("_action_log", "_length")
+
+    def __init__(self, action_log: ActionLog, length: Optional[int] = None):
+        self._action_log = action_log
+        self._length = len(action_log) if length is None else length
+
+    @property
+    def columns(self) -> np.ndarray:
+        """A read-only view of the rows of the shown actions, see ActionLog."""
+        return self._action_log.columns[: self._length]
 
-@dataclass
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(
+                self._action_log[i] for i in range(*index.indices(self._length))
+            )
+        if index < 0:
+            index += self._length
+        if index < 0 or index >= self._length:
+            raise IndexError("action log index out of range")
+        return self._action_log[index]
+
+    def __repr__(self):
+        return f"ActionLogView({list(self)})"
+
+
+@dataclass(frozen=True)
 class Observation:
     """
     This class holds the observation for the current player.
+
+    The observation only holds tuples and read-only views, so it is built without
+    copying the state and agents cannot change the game through it.
     """
 
     player: int
-    turn_order: List[int]
-    num_dice: List[int]
+    turn_order: Tuple[int, ...]
+    num_dice: Tuple[int, ...]
+    bet: Bet
+    unknown_dice: Tuple[int, ...]
+    known_dice: Tuple[Tuple[int, ...], ...]
+    known_counts: Tuple[int, ...]
+    player_locked_dice: Tuple[bool, ...]
+    action_log: Sequence[Action]
+
+
+@dataclass(frozen=True)
+class RoundResult:
+    """
+    This class holds the outcome of a finished round.
+
+    A single result is built per round and shared by all agents, so it only holds
+    tuples and read-only views.
+    """
+
+    dice: Tuple[Tuple[int, ...], ...]
+    num_dice: Tuple[int, ...]
     bet: Bet
-    unknown_dice: List[int]
-    known_dice: List[List[int]]
-    player_locked_dice: List[bool]
-    action_log: List[Action]
+    bettor: int
+    caller: int
+    loser: int
+    dice_lost: int
+    actual_num_dice: int
+    action_log: Sequence[Action]
 
 
-def initialize_game(num_players: int) -> State:
+def initialize_game(num_players: int, seed=None) -> State:
     """
     Starts a new game.
 
     Args:
         num_players (int): The number of players in the game.
+        seed (int, np.random.Generator or np.random.SeedSequence, optional): The seed
+            of the game. Games with the same seed and actions play out identically.
 
     Returns:
         State: The state of the game.
     """
+    roller = DiceRoller(seed)
     bet = Bet(index=NO_BET_INDEX)
     num_dice = [NUM_DICE for _ in range(num_players)]
-    turn_order = list(range(num_players))
-    np.random.shuffle(turn_order)
-    dice = [
-        np.random.randint(low=0, high=6, size=num_dice[player]).tolist()
-        for player in range(num_players)
-    ]
-    dice_locked = [
-        np.zeros((num_dice[player]), dtype=bool).tolist()
-        for player in range(num_players)
-    ]
-    action_log = []
+    turn_order = roller.shuffle(list(range(num_players)))
+    dice = [roller.roll(num_dice[player]) for player in range(num_players)]
+    dice_locked = [[False] * num_dice[player] for player in range(num_players)]
+    action_log = ActionLog()
     return State(
         num_players=num_players,
         bet=bet,
@@ -205,9 +618,191 @@ def initialize_game(num_players: int) -> State:
         dice=dice,
         dice_locked=dice_locked,
         action_log=action_log,
+        roller=roller,
+    )
+
+
+def fork(state: State, seed=None) -> State:
+    """
+    Copies a game state, to play it out in different ways.
+
+    Only the dice, locks, counts and turn order are copied. The action log is shared
+    until either state appends to it, and the random numbers are only copied when the
+    fork needs more of them. A fork without a seed plays out exactly like the original
+    given the same actions.
+
+    Args:
+        state (State): The state of the game.
+        seed (int, np.random.Generator or np.random.SeedSequence, optional): The seed
+            of the fork's dice, the original's upcoming dice if None.
+
+    Returns:
+        State: The copy of the state.
+    """
+    roller = state.roller
+    return State(
+        num_players=state.num_players,
+        bet=state.bet,
+        player_curr=state.player_curr,
+        player_prev=state.player_prev,
+        turn_order=_turn_order(state),
+        num_dice=state.num_dice.copy(),
+        dice=[dice.copy() for dice in state.dice],
+        dice_locked=[dice_locked.copy() for dice_locked in state.dice_locked],
+        action_log=state.action_log.fork(),
+        roller=roller.fork() if seed is None else DiceRoller(seed, roller.buffer_size),
+        next_player=state.next_player.copy(),
+        prev_player=state.prev_player.copy(),
+        players_alive=state.players_alive,
     )
 
 
+class Snapshot(NamedTuple):
+    """
+    This class holds a game state that can no longer change, see snapshot.
+    """
+
+    num_players: int
+    bet: Bet
+    player_curr: int
+    player_prev: Optional[int]
+    turn_order: Tuple[int, ...]
+    num_dice: Tuple[int, ...]
+    dice: Tuple[Tuple[int, ...], ...]
+    dice_locked: Tuple[Tuple[bool, ...], ...]
+    action_log: ActionLog
+    roller: DiceRoller
+    next_player: Tuple[int, ...]
+    prev_player: Tuple[int, ...]
+    players_alive: int
+
+
+def snapshot(state: State) -> Snapshot:
+    """
+    Saves a game state so that it can be restored any number of times.
+
+    Args:
+        state (State): The state of the game.
+
+    Returns:
+        Snapshot: The saved state, which the game does not change.
+    """
+    return Snapshot(
+        num_players=state.num_players,
+        bet=state.bet,
+        player_curr=state.player_curr,
+        player_prev=state.player_prev,
+        turn_order=_turn_order(state),
+        num_dice=tuple(state.num_dice),
+        dice=tuple(map(tuple, state.dice)),
+        dice_locked=tuple(map(tuple, state.dice_locked)),
+        action_log=state.action_log.fork(),
+        roller=state.roller.fork(),
+        next_player=tuple(state.next_player),
+        prev_player=tuple(state.prev_player),
+        players_alive=state.players_alive,
+    )
+
+
+def restore(saved: Snapshot, seed=None) -> State:
+    """
+    Builds a game state from a snapshot.
+
+    Args:
+        saved (Snapshot): The saved state.
+        seed (int, np.random.Generator or np.random.SeedSequence, optional): The seed
+            of the restored state's dice, the saved state's upcoming dice if None.
+
+    Returns:
+        State: A state that plays out like the saved one, see fork.
+    """
+    roller = saved.roller
+    return State(
+        num_players=saved.num_players,
+        bet=saved.bet,
+        player_curr=saved.player_curr,
+        player_prev=saved.player_prev,
+        turn_order=saved.turn_order,
+        num_dice=list(saved.num_dice),
+        dice=list(map(list, saved.dice)),
+        dice_locked=list(map(list, saved.dice_locked)),
+        action_log=saved.action_log.fork(),
+        roller=roller.fork() if seed is None else DiceRoller(seed, roller.buffer_size),
+        next_player=list(saved.next_player),
+        prev_player=list(saved.prev_player),
+        players_alive=saved.players_alive,
+    )
+
+
+def face_counts(state: State, player: int) -> FaceCounts:
+    """
+    Returns the face counts of a player's dice.
+
+    Args:
+        state (State): The state of the game.
+        player (int): The player.
+
+    Returns:
+        FaceCounts: The counts, which the engine updates in place.
+    """
+    histograms = state.histograms
+    if histograms is None:
+        histograms = state.histograms = [None] * state.num_players
+    counts = histograms[player]
+    dice = state.dice[player]
+    dice_locked = state.dice_locked[player]
+    if (
+        counts is None
+        or counts.dice is not dice
+        or counts.dice_locked is not dice_locked
+    ):
+        counts = histograms[player] = FaceCounts(dice, dice_locked)
+    return counts
+
+
+def set_dice(
+    state: State,
+    player: int,
+    dice: Sequence[int],
+    dice_locked: Optional[Sequence[bool]] = None,
+):
+    """
+    Replaces a player's dice and drops their face counts.
+
+    Use this rather than writing into state.dice, which the face counts do not see.
+
+    Args:
+        state (State): The state of the game.
+        player (int): The player.
+        dice (Sequence[int]): The player's new dice.
+        dice_locked (Sequence[bool], optional): The player's new lock mask, no dice
+            locked if None.
+    """
+    state.dice[player] = list(dice)
+    if dice_locked is None:
+        dice_locked = [False] * len(dice)
+    state.dice_locked[player] = list(dice_locked)
+    if state.histograms is not None:
+        state.histograms[player] = None
+
+
+def _all_face_counts(state: State) -> List[FaceCounts]:
+    # face_counts for every player at once
+    histograms = state.histograms
+    if histograms is None:
+        histograms = state.histograms = [None] * state.num_players
+    for player, (counts, dice, dice_locked) in enumerate(
+        zip(histograms, state.dice, state.dice_locked)
+    ):
+        if (
+            counts is None
+            or counts.dice is not dice
+            or counts.dice_locked is not dice_locked
+        ):
+            histograms[player] = FaceCounts(dice, dice_locked)
+    return histograms
+
+
 def game_over(state: State) -> bool:
     """
     Determines if the game is over.
@@ -218,11 +813,8 @@ def game_over(state: State) -> bool:
     Returns:
         bool: True if the game is over, False otherwise.
     """
-    players_with_dice = 0
-    for player in range(state.num_players):
-        if state.num_dice[player] > 0:
-            players_with_dice += 1
-    return players_with_dice == 1
+    # num_dice rather than players_alive, so that setting num_dice is enough
+    return state.num_players - state.num_dice.count(0) == 1
 
 
 def round_over(state: State) -> bool:
@@ -235,13 +827,10 @@ def round_over(state: State) -> bool:
     Returns:
         bool: True if the round is over, False otherwise.
     """
-    if len(state.action_log) == 0:
-        return False
-
-    return state.action_log[-1].type == ActionType.RESULT
+    return state.action_log.last_type() == ActionType.RESULT
 
 
-def player_observation(state: State):
+def player_observation(state: State) -> Observation:
     """
     Returns the observation for the current player.
 
@@ -249,36 +838,137 @@ def player_observation(state: State):
         state (State): The state of the game.
 
     Returns:
-        dict: The observation for the current player.
+        Observation: The observation for the current player.
     """
+    player_curr = state.player_curr
+    histograms = state.histograms
+    if histograms is None:
+        histograms = state.histograms = [None] * state.num_players
+    all_dice_locked = state.dice_locked
+    # The locked dice of the other players, if there are any
+    others_locked = None
     unknown_dice = []
     known_dice = []
-    for player in range(state.num_players):
-        if player == state.player_curr:
+    for player, dice in enumerate(state.dice):
+        # face_counts, inlined since observations are built every turn
+        counts = histograms[player]
+        dice_locked = all_dice_locked[player]
+        if (
+            counts is None
+            or counts.dice is not dice
+            or counts.dice_locked is not dice_locked
+        ):
+            counts = histograms[player] = FaceCounts(dice, dice_locked)
+        if player == player_curr:
             unknown_dice.append(0)
-            known_dice.append(state.dice[player])
+            known_dice.append(tuple(dice))
+        elif counts.num_locked == 0:
+            unknown_dice.append(len(dice))
+            known_dice.append(())
         else:
-            unknown = 0
-            known = []
-            for dice_index, dice_value in enumerate(state.dice[player]):
-                if state.dice_locked[player][dice_index]:
-                    known.append(dice_value)
-                else:
-                    unknown += 1
-            unknown_dice.append(unknown)
-            known_dice.append(known)
-
-    observation = Observation(
-        player=state.player_curr,
-        turn_order=state.turn_order,
-        num_dice=state.num_dice,
+            unknown_dice.append(len(dice) - counts.num_locked)
+            known_dice.append(
+                tuple(
+                    dice_value
+                    for dice_value, locked in zip(dice, dice_locked)
+                    if locked
+                )
+            )
+            if others_locked is None:
+                others_locked = counts.locked
+            else:
+                others_locked = [
+                    total + count for total, count in zip(others_locked, counts.locked)
+                ]
+
+    own_counts = histograms[player_curr]
+    known_counts = own_counts.unlocked
+    if own_counts.num_locked:
+        known_counts = [
+            total + count for total, count in zip(known_counts, own_counts.locked)
+        ]
+    if others_locked is not None:
+        known_counts = [
+            total + count for total, count in zip(known_counts, others_locked)
+        ]
+
+    return Observation(
+        player=player_curr,
+        turn_order=_turn_order(state),
+        num_dice=tuple(state.num_dice),
         bet=state.bet,
-        unknown_dice=unknown_dice,
-        known_dice=known_dice,
-        player_locked_dice=state.dice_locked[state.player_curr],
-        action_log=state.action_log,
+        unknown_dice=tuple(unknown_dice),
+        known_dice=tuple(known_dice),
+        known_counts=tuple(known_counts),
+        player_locked_dice=tuple(state.dice_locked[player_curr]),
+        action_log=ActionLogView(state.action_log),
+    )
+
+
+class LegalActions(NamedTuple):
+    """
+    This class holds the legal actions of the current player as masks.
+
+    A reroll may combine any legal bet with any legal lock mask, and the masks are
+    read-only rows of precomputed tables, so they cost nothing to build.
+    """
+
+    bets: np.ndarray
+    can_call: bool
+    free_mask: int
+    num_dice: int
+
+    @property
+    def lock_masks(self) -> np.ndarray:
+        """The (NUM_LOCK_MASKS,) mask of lock masks a reroll may use."""
+        return LEGAL_LOCK_MASKS[self.free_mask]
+
+    def bet_action(self, bet_index: int, lock_mask: int = 0) -> Action:
+        """
+        Builds a bet, or a reroll if lock_mask is not 0, without checking it.
+
+        Args:
+            bet_index (int): The bet index.
+            lock_mask (int): Bit i locks die i.
+
+        Returns:
+            Action: The action.
+        """
+        if lock_mask == 0:
+            return Action(type=ActionType.BET, bet=BETS[bet_index + 1])
+        return Action(
+            type=ActionType.REROLL_BET,
+            bet=BETS[bet_index + 1],
+            dice_to_lock=LOCK_MASK_DICE[lock_mask][: self.num_dice],
+        )
+
+
+def legal_actions(source: Union[State, Observation]) -> LegalActions:
+    """
+    Returns the legal actions of the current player.
+
+    Args:
+        source (State or Observation): The state of the game, or the observation of the
+            current player.
+
+    Returns:
+        LegalActions: The legal actions.
+    """
+    if isinstance(source, Observation):
+        locked = source.player_locked_dice
+    else:
+        locked = source.dice_locked[source.player_curr]
+    free_mask = 0
+    for die, die_locked in enumerate(locked):
+        if not die_locked:
+            free_mask |= 1 << die
+    bet_index = source.bet.index
+    return LegalActions(
+        bets=LEGAL_BETS[bet_index + 1],
+        can_call=bet_index != NO_BET_INDEX,
+        free_mask=free_mask,
+        num_dice=len(locked),
     )
-    return copy.deepcopy(observation)
 
 
 def _validate_action(state: State, action: Action):
@@ -304,12 +994,25 @@ def _validate_action(state: State, action: Action):
         raise ValueError("Invalid action type.")
 
 
+def _knock_out(state: State, player: int):
+    # Unlinks a player, turn_order is rebuilt from the links when it is next read
+    # pylint: disable=protected-access
+    following = state.next_player[player]
+    preceding = state.prev_player[player]
+    state.next_player[preceding] = following
+    state.prev_player[following] = preceding
+    state.next_player[player] = state.prev_player[player] = player
+    state.players_alive -= 1
+    if state.first_player == player:
+        state.first_player = following
+    state._turn_order = None
+
+
 def _lose_dice(state: State, player: int, num_dice: int):
     state.num_dice[player] -= num_dice
-    if state.num_dice[player] < 0:
+    if state.num_dice[player] <= 0:
         state.num_dice[player] = 0
-    if state.num_dice[player] == 0:
-        state.turn_order.remove(player)
+        _knock_out(state, player)
     return state
 
 
@@ -319,10 +1022,10 @@ def _call(state: State):
     dice_value = state.bet.dice_value
 
     actual_num_dice = 0
-    for dice in state.dice:
-        actual_num_dice += dice.count(dice_value)
+    for counts in _all_face_counts(state):
+        actual_num_dice += counts.locked[dice_value] + counts.unlocked[dice_value]
         if dice_value != STAR:
-            actual_num_dice += dice.count(STAR)
+            actual_num_dice += counts.locked[STAR] + counts.unlocked[STAR]
     dice_diff = actual_num_dice - num_dice
 
     # Determine who loses dice
@@ -339,9 +1042,14 @@ def _call(state: State):
             result=(state.player_prev, -dice_diff, actual_num_dice, dice_value),
         )
     else:
-        for player in state.turn_order:
-            if player != state.player_prev:
-                state = _lose_dice(state, player, 1)
+        # Walk the circle once
+        player = state.next_player[state.player_prev]
+        while player != state.player_prev:
+            following = state.next_player[player]
+            state.num_dice[player] -= 1
+            if state.num_dice[player] == 0:
+                _knock_out(state, player)
+            player = following
         result = Action(
             type=ActionType.RESULT, result=(-1, 1, actual_num_dice, dice_value)
         )
@@ -364,32 +1072,44 @@ def new_round(state: State) -> State:
     Returns:
         State: The new state of the game.
     """
-    state.bet.index = NO_BET_INDEX
+    state.bet = Bet(index=NO_BET_INDEX)
     state.player_prev = None
-    state.action_log = []
+    state.action_log = ActionLog()
+    histograms = state.histograms = [None] * state.num_players
     for player in range(state.num_players):
-        state.dice[player] = np.random.randint(0, 6, state.num_dice[player]).tolist()
-        state.dice_locked[player] = np.zeros(
-            state.num_dice[player], dtype=bool
-        ).tolist()
+        dice = state.dice[player] = state.roller.roll(state.num_dice[player])
+        dice_locked = state.dice_locked[player] = [False] * state.num_dice[player]
+        histograms[player] = FaceCounts(dice, dice_locked)
     return state
 
 
-def _reroll(state: State, dice_to_lock: List[bool]):
+def _reroll(state: State, dice_to_lock: Sequence[bool]):
+    counts = face_counts(state, state.player_curr)
+    dice = counts.dice
+    dice_locked = counts.dice_locked
+    rerolled = [
+        dice_index
+        for dice_index, lock_dice in enumerate(dice_to_lock)
+        if not lock_dice and not dice_locked[dice_index]
+    ]
+    unlocked = counts.unlocked
+    for dice_index, dice_value in zip(rerolled, state.roller.roll(len(rerolled))):
+        unlocked[dice[dice_index]] -= 1
+        unlocked[dice_value] += 1
+        dice[dice_index] = dice_value
     for dice_index, lock_dice in enumerate(dice_to_lock):
-        if not lock_dice and not state.dice_locked[state.player_curr][dice_index]:
-            state.dice[state.player_curr][dice_index] = np.random.randint(0, 6)
-        else:
-            state.dice_locked[state.player_curr][dice_index] = True
+        if lock_dice:
+            dice_locked[dice_index] = True
+            unlocked[dice[dice_index]] -= 1
+            counts.locked[dice[dice_index]] += 1
+            counts.num_locked += 1
     return state
 
 
 def _bet(state: State, bet: Bet):
     state.bet = bet
     state.player_prev = state.player_curr
-    state.player_curr = state.turn_order[
-        (state.turn_order.index(state.player_curr) + 1) % len(state.turn_order)
-    ]
+    state.player_curr = state.next_player[state.player_curr]
     return state
 
 
@@ -408,8 +1128,8 @@ def player_action(state: State, action: Action) -> State:
         ValueError: If the action is invalid.
     """
     _validate_action(state, action)
-    action.player = state.player_curr
-    state.action_log.append(action)
+    # The log stores its own copy, so agents cannot change the history afterwards
+    state.action_log.append(action, player=state.player_curr)
     if action.type == ActionType.CALL:
         state = _call(state)
     elif action.type == ActionType.BET:
@@ -422,17 +1142,34 @@ def player_action(state: State, action: Action) -> State:
     return state
 
 
-def player_result(state: State) -> State:
+def player_result(state: State) -> RoundResult:
     """
-    Returns the state at the end of the round.
+    Returns the outcome of the round that just ended.
 
     Args:
         state (State): The state of the game.
 
     Returns:
-        State: A copy of the state of the game.
+        RoundResult: The outcome of the round. The loser is -1 if everyone but the
+            bettor lost a die.
+
+    Raises:
+        ValueError: If the round is not over.
     """
-    return copy.deepcopy(state)
+    if not round_over(state):
+        raise ValueError("The round is not over.")
+    result = state.action_log[-1].result
+    return RoundResult(
+        dice=tuple(tuple(dice) for dice in state.dice),
+        num_dice=tuple(state.num_dice),
+        bet=state.bet,
+        bettor=state.action_log[-3].player,
+        caller=state.action_log[-2].player,
+        loser=result[0],
+        dice_lost=result[1],
+        actual_num_dice=result[2],
+        action_log=ActionLogView(state.action_log),
+    )
 
 
 def render(state: State):
@@ -0,0 +1,322 @@
+"""
+The instrument module contains opt-in timers for the game loop.
+
+Instrumentation is off by default. The game loop in call_my_bluff.tournament looks up
+the active profiler once per game, and when instrumentation is off it plays the game
+without reading the clock at all. When it is on, the loop records wall time per engine
+phase, a latency histogram per agent class and counts of games, rounds, turns, calls
+and rerolls.
+
+Usage:
+    profiler = instrument.enable()
+    tournament.run_tournament(...)
+    print(profiler.snapshot())
+"""
+from typing import Dict, Iterable, Optional
+import atexit
+import json
+import math
+import sys
+
+from call_my_bluff.rules import Action, ActionType
+
+PHASES = ("observation", "policy", "action", "result", "new_round")
+COUNTS = ("games", "rounds", "turns", "calls", "rerolls")
+
+# Latency histograms use log-spaced buckets from MIN_LATENCY seconds upwards
+MIN_LATENCY = 1e-7
+BUCKETS_PER_DECADE = 10
+NUM_BUCKETS = 8 * BUCKETS_PER_DECADE
+
+_PROFILER = None
+
+
+class LatencyHistogram:
+    """
+    This class is responsible for a log-spaced histogram of latencies.
+
+    Percentiles are the upper edge of the bucket they fall in, so they are accurate to
+    within a factor of 10 ** (1 / BUCKETS_PER_DECADE).
+    """
+
+    def __init__(self):
+        self.buckets = [0] * NUM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        """
+        Records one latency.
+
+        Args:
+            seconds (float): The latency.
+        """
+        if seconds > MIN_LATENCY:
+            bucket = int(math.log10(seconds / MIN_LATENCY) * BUCKETS_PER_DECADE)
+            bucket = min(bucket, NUM_BUCKETS - 1)
+        else:
+            bucket = 0
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: "LatencyHistogram"):
+        """
+        Adds the latencies of another histogram.
+
+        Args:
+            other (LatencyHistogram): The histogram to add.
+        """
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, fraction: float) -> float:
+        """
+        Returns an upper bound on a percentile of the latencies.
+
+        Args:
+            fraction (float): The percentile as a fraction, e.g. 0.99.
+
+        Returns:
+            float: The latency in seconds, 0 if nothing was recorded.
+        """
+        if self.count == 0:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target:
+                edge = MIN_LATENCY * 10 ** ((bucket + 1) / BUCKETS_PER_DECADE)
+                return min(edge, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        """Returns the histogram as a JSON-friendly dict."""
+        return {
+            "count": self.count,
+            "total": self.total,
+            "max": self.max,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.5),
+            "p99": self.percentile(0.99),
+            "buckets": list(self.buckets),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        """Rebuilds a histogram from to_dict."""
+        histogram = cls()
+        histogram.buckets = list(data["buckets"])
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.max = data["max"]
+        return histogram
+
+
+class Profiler:
+    """
+    This class is responsible for collecting the timings of the game loop.
+
+    Attributes:
+        phase_seconds (Dict[str, float]): Wall time spent in each phase.
+        phase_calls (Dict[str, int]): The number of times each phase ran.
+        counts (Dict[str, int]): Counts of games, rounds, turns, calls and rerolls.
+        agents (Dict[str, LatencyHistogram]): Policy latency per agent class.
+    """
+
+    def __init__(self):
+        self.phase_seconds = {phase: 0.0 for phase in PHASES}
+        self.phase_calls = {phase: 0 for phase in PHASES}
+        self.counts = {count: 0 for count in COUNTS}
+        self.agents: Dict[str, LatencyHistogram] = {}
+
+    def add_phase(self, phase: str, seconds: float):
+        """
+        Records time spent in a phase.
+
+        Args:
+            phase (str): One of PHASES.
+            seconds (float): The time spent.
+        """
+        self.phase_seconds[phase] += seconds
+        self.phase_calls[phase] += 1
+
+    def add_policy(self, agent_name: str, seconds: float):
+        """
+        Records the latency of one policy call.
+
+        Args:
+            agent_name (str): The name of the agent class.
+            seconds (float): The time the policy took.
+        """
+        histogram = self.agents.get(agent_name)
+        if histogram is None:
+            histogram = self.agents[agent_name] = LatencyHistogram()
+        histogram.add(seconds)
+        self.add_phase("policy", seconds)
+
+    def add_turn(
+        self,
+        agent_name: str,
+        action: Action,
+        observation_seconds: float,
+        policy_seconds: float,
+        action_seconds: float,
+    ):
+        """
+        Records one turn of the game loop.
+
+        Args:
+            agent_name (str): The name of the agent class that took the turn.
+            action (Action): The action the agent took.
+            observation_seconds (float): The time spent building the observation.
+            policy_seconds (float): The time the policy took.
+            action_seconds (float): The time spent applying the action.
+        """
+        self.add_phase("observation", observation_seconds)
+        self.add_policy(agent_name, policy_seconds)
+        self.add_phase("action", action_seconds)
+        if action.type == ActionType.CALL:
+            self.counts["calls"] += 1
+        elif action.type == ActionType.REROLL_BET:
+            self.counts["rerolls"] += 1
+
+    def add_round(self, result_seconds: float, new_round_seconds: float):
+        """
+        Records the end of a round in the game loop.
+
+        Args:
+            result_seconds (float): The time spent sharing the round results.
+            new_round_seconds (float): The time spent starting the next round.
+        """
+        self.add_phase("result", result_seconds)
+        self.add_phase("new_round", new_round_seconds)
+
+    def add_game(self, num_rounds: int, num_turns: int):
+        """
+        Records the end of a game.
+
+        Args:
+            num_rounds (int): The number of rounds in the game.
+            num_turns (int): The number of turns in the game.
+        """
+        self.counts["games"] += 1
+        self.counts["rounds"] += num_rounds
+        self.counts["turns"] += num_turns
+
+    def snapshot(self) -> dict:
+        """
+        Returns everything recorded so far as a JSON-friendly dict.
+
+        Returns:
+            dict: The phases, counts and per-agent latency summaries.
+        """
+        return {
+            "phases": {
+                phase: {
+                    "seconds": self.phase_seconds[phase],
+                    "calls": self.phase_calls[phase],
+                }
+                for phase in PHASES
+            },
+            "counts": dict(self.counts),
+            "agents": {
+                name: histogram.to_dict() for name, histogram in self.agents.items()
+            },
+        }
+
+    def merge(self, snapshot: dict):
+        """
+        Adds a snapshot, e.g. one taken in a worker process.
+
+        Args:
+            snapshot (dict): A snapshot from Profiler.snapshot.
+        """
+        for phase, values in snapshot["phases"].items():
+            self.phase_seconds[phase] += values["seconds"]
+            self.phase_calls[phase] += values["calls"]
+        for count, value in snapshot["counts"].items():
+            self.counts[count] += value
+        for name, data in snapshot["agents"].items():
+            histogram = LatencyHistogram.from_dict(data)
+            if name in self.agents:
+                self.agents[name].merge(histogram)
+            else:
+                self.agents[name] = histogram
+
+
+def enable() -> Profiler:
+    """
+    Turns instrumentation on, keeping the current profiler if there is one.
+
+    Returns:
+        Profiler: The active profiler.
+    """
+    global _PROFILER  # pylint: disable=global-statement
+    if _PROFILER is None:
+        _PROFILER = Profiler()
+    return _PROFILER
+
+
+def disable() -> Optional[Profiler]:
+    """
+    Turns instrumentation off.
+
+    Returns:
+        Profiler: The profiler that was active, if any.
+    """
+    global _PROFILER  # pylint: disable=global-statement
+    profiler, _PROFILER = _PROFILER, None
+    return profiler
+
+
+def active_profiler() -> Optional[Profiler]:
+    """Returns the active profiler, None if instrumentation is off."""
+    return _PROFILER
+
+
+def snapshot() -> Optional[dict]:
+    """Returns a snapshot of the active profiler, None if instrumentation is off."""
+    return None if _PROFILER is None else _PROFILER.snapshot()
+
+
+def merge_snapshots(snapshots: Iterable[dict]) -> dict:
+    """
+    Combines snapshots, e.g. from several worker processes.
+
+    Args:
+        snapshots (Iterable[dict]): Snapshots from Profiler.snapshot.
+
+    Returns:
+        dict: The combined snapshot.
+    """
+    profiler = Profiler()
+    for data in snapshots:
+        profiler.merge(data)
+    return profiler.snapshot()
+
+
+def dump_at_exit(path: Optional[str] = None):
+    """
+    Turns instrumentation on and writes the snapshot when the process exits.
+
+    Args:
+        path (str, optional): The JSON file to write, standard error if None.
+    """
+    profiler = enable()
+
+    def _dump():
+        data = json.dumps(profiler.snapshot(), indent=2, sort_keys=True)
+        if path is None:
+            print(data, file=sys.stderr)
+        else:
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(data)
+
+    atexit.register(_dump)
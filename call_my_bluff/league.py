@@ -0,0 +1,301 @@
+"""
+The league module ranks many agents by playing the games that matter most.
+
+The league keeps, for every pair of agents, the number of games they played at the same
+table in which one of them won, and how often each of them won. Ratings are fitted to
+these counts with the Bradley-Terry model and shown on the Elo scale, where a lead of
+400 points means ten to one odds of winning. Because the counts only ever add up, the
+ratings do not depend on the order in which games were played, and results of
+separate runs can be merged.
+
+Each batch plays tables between agents that are next to each other on the leaderboard
+and whose ratings are the least certain to be in the right order, so clear matchups
+stop using games early.
+
+Usage:
+    python -m call_my_bluff.league MaxAgent SimpleAgent \
+        people_agents.matthew_agent_v0:MatthewAgentV0 --state league.json --batches 10
+"""
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+import argparse
+import json
+import math
+
+import numpy as np
+
+from call_my_bluff import tournament
+
+BASE_RATING = 1500.0
+ELO_SCALE = tournament.ELO_SCALE
+# Every agent starts with one win and one loss against an agent of BASE_RATING
+PRIOR_GAMES = 1.0
+
+
+class Rating(NamedTuple):
+    """This class holds an agent's place on the leaderboard."""
+
+    name: str
+    rating: float
+    uncertainty: float
+    games: int
+
+
+class League:
+    """
+    This class is responsible for the results and ratings of a set of agents.
+
+    Args:
+        agent_specs (Sequence[str]): Agent class names or "module:Class" specs, see
+            tournament.load_agent.
+        table_size (int): The number of players at each table.
+        seed (int): The seed of the league, batch i is played with a seed derived
+            from it.
+    """
+
+    def __init__(self, agent_specs: Sequence[str], table_size: int = 2, seed: int = 0):
+        if len(set(agent_specs)) != len(agent_specs):
+            raise ValueError("Agents must be unique.")
+        if table_size < 2 or table_size > len(agent_specs):
+            raise ValueError("Table size must be between 2 and the number of agents.")
+        self.agents = list(agent_specs)
+        self.table_size = table_size
+        self.seed = seed
+        self.num_batches = 0
+        num_agents = len(self.agents)
+        # wins[i, j] is the number of games at a table with j that i won
+        self.wins = np.zeros((num_agents, num_agents), dtype=np.int64)
+        self.games = np.zeros(num_agents, dtype=np.int64)
+
+    def add_agent(self, spec: str):
+        """
+        Adds an agent with no results.
+
+        Args:
+            spec (str): The agent class name or "module:Class" spec.
+        """
+        if spec in self.agents:
+            raise ValueError(f"Agent {spec} is already in the league.")
+        self.agents.append(spec)
+        self.wins = np.pad(self.wins, ((0, 1), (0, 1)))
+        self.games = np.append(self.games, 0)
+
+    def record(self, lineup: Sequence[str], result: tournament.TournamentResult):
+        """
+        Adds the results of games played between a lineup.
+
+        Args:
+            lineup (Sequence[str]): The agent specs, in the order they played.
+            result (TournamentResult): The statistics of the games.
+        """
+        indices = [self.agents.index(spec) for spec in lineup]
+        for player, winner in enumerate(indices):
+            for other, loser in enumerate(indices):
+                if other != player:
+                    self.wins[winner, loser] += result.wins[player]
+            self.games[winner] += result.num_games
+
+    def merge(self, other: "League"):
+        """
+        Adds the results of another league over the same agents.
+
+        Args:
+            other (League): The league to add.
+        """
+        if other.agents != self.agents:
+            raise ValueError("Cannot merge leagues with different agents.")
+        self.wins += other.wins
+        self.games += other.games
+
+    def _strengths(self) -> np.ndarray:
+        # Bradley-Terry strengths by minorization-maximization, with the prior games
+        pair_games = self.wins + self.wins.T
+        total_wins = self.wins.sum(axis=1) + PRIOR_GAMES
+        strengths = np.ones(len(self.agents))
+        for _ in range(1000):
+            denominator = (pair_games / (strengths[:, None] + strengths[None, :])).sum(
+                axis=1
+            ) + 2 * PRIOR_GAMES / (strengths + 1)
+            updated = total_wins / denominator
+            converged = np.allclose(updated, strengths, rtol=1e-10, atol=0)
+            strengths = updated
+            if converged:
+                break
+        return strengths
+
+    def leaderboard(self) -> List[Rating]:
+        """
+        Returns the agents from the highest to the lowest rating.
+
+        Returns:
+            List[Rating]: The rating of each agent, with the standard error of the
+                rating as its uncertainty.
+        """
+        strengths = self._strengths()
+        pair_games = self.wins + self.wins.T
+        share = strengths[:, None] / (strengths[:, None] + strengths[None, :])
+        information = (pair_games * share * share.T).sum(axis=1)
+        information += 2 * PRIOR_GAMES * strengths / (strengths + 1) ** 2
+        ratings = [
+            Rating(
+                name=name,
+                rating=BASE_RATING + ELO_SCALE * math.log(strength),
+                uncertainty=ELO_SCALE / math.sqrt(info),
+                games=int(games),
+            )
+            for name, strength, info, games in zip(
+                self.agents, strengths, information, self.games
+            )
+        ]
+        return sorted(ratings, key=lambda rating: (-rating.rating, rating.name))
+
+    def schedule(self, num_tables: int) -> List[Tuple[str, ...]]:
+        """
+        Picks the lineups whose results would most improve the leaderboard.
+
+        Neighbours on the leaderboard are scored by how much their rating intervals
+        overlap, and each of the best scoring pairs is seated with the agents next to
+        it on the leaderboard until the table is full.
+
+        Args:
+            num_tables (int): The number of lineups.
+
+        Returns:
+            List[Tuple[str, ...]]: The lineups, possibly with repeats.
+        """
+        board = self.leaderboard()
+        overlaps = [
+            (first.uncertainty + second.uncertainty) - (first.rating - second.rating)
+            for first, second in zip(board, board[1:])
+        ]
+        order = sorted(range(len(overlaps)), key=lambda pair: -overlaps[pair])
+        lineups = []
+        for table in range(num_tables):
+            pair = order[table % len(order)]
+            start = pair - (self.table_size - 2) // 2
+            start = min(max(start, 0), len(board) - self.table_size)
+            lineups.append(
+                tuple(rating.name for rating in board[start : start + self.table_size])
+            )
+        return lineups
+
+    def run_batch(
+        self,
+        num_tables: int = 4,
+        games_per_table: int = 100,
+        num_workers: Optional[int] = 1,
+    ):
+        """
+        Schedules and plays one batch of tables, and records the results.
+
+        Args:
+            num_tables (int): The number of lineups to play.
+            games_per_table (int): The number of games each lineup plays.
+            num_workers (int, optional): Passed to tournament.run_tournament.
+        """
+        batch_seed = tournament.game_seed(self.seed, self.num_batches)
+        for table, lineup in enumerate(self.schedule(num_tables)):
+            result = tournament.run_tournament(
+                [tournament.load_agent(spec) for spec in lineup],
+                games_per_table,
+                num_workers=num_workers,
+                seed=tournament.game_seed(batch_seed, table),
+            )
+            self.record(lineup, result)
+        self.num_batches += 1
+
+    def to_json(self) -> dict:
+        """Returns the league as a JSON-friendly dict."""
+        return {
+            "agents": self.agents,
+            "table_size": self.table_size,
+            "seed": self.seed,
+            "num_batches": self.num_batches,
+            "wins": self.wins.tolist(),
+            "games": self.games.tolist(),
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "League":
+        """Rebuilds a league from to_json."""
+        league = cls(data["agents"], data["table_size"], data["seed"])
+        league.num_batches = data["num_batches"]
+        league.wins[:] = data["wins"]
+        league.games[:] = data["games"]
+        return league
+
+    def save(self, path: str):
+        """
+        Writes the league to a JSON file.
+
+        Args:
+            path (str): The file to write.
+        """
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.to_json(), file, indent=1)
+
+    @classmethod
+    def load(cls, path: str) -> "League":
+        """
+        Reads a league written by save.
+
+        Args:
+            path (str): The file to read.
+
+        Returns:
+            League: The league.
+        """
+        with open(path, encoding="utf-8") as file:
+            return cls.from_json(json.load(file))
+
+
+def print_leaderboard(league: League):
+    """
+    Prints the leaderboard of a league.
+
+    Args:
+        league (League): The league.
+    """
+    for place, rating in enumerate(league.leaderboard(), start=1):
+        print(
+            f"{place:3d}. {rating.name}: {rating.rating:.0f} "
+            f"+/- {rating.uncertainty:.0f} ({rating.games} games)"
+        )
+
+
+def _load_or_create(args) -> League:
+    try:
+        league = League.load(args.state)
+    except FileNotFoundError:
+        return League(args.agents, table_size=args.table_size, seed=args.seed)
+    for spec in args.agents:
+        if spec not in league.agents:
+            league.add_agent(spec)
+    return league
+
+
+def main(argv: Optional[List[str]] = None):
+    """Runs a league from the command line."""
+    parser = argparse.ArgumentParser(
+        prog="python -m call_my_bluff.league", description=__doc__.split("\n")[1]
+    )
+    parser.add_argument(
+        "agents", nargs="*", help="Agent class names or module:Class specs."
+    )
+    parser.add_argument("--state", required=True, help="The JSON file of the league.")
+    parser.add_argument("--batches", type=int, default=1)
+    parser.add_argument("--tables", type=int, default=4)
+    parser.add_argument("--games", type=int, default=100, help="Games per table.")
+    parser.add_argument("--table-size", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    league = _load_or_create(args)
+    for _ in range(args.batches):
+        league.run_batch(args.tables, args.games, num_workers=args.workers)
+        league.save(args.state)
+    print_leaderboard(league)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+The probability module computes the chance that each bet is true.
+
+A face value is matched by that face or a star, so each unknown die matches it with
+probability 1/3, while stars are only matched by stars, with probability 1/6. The
+binomial tail tables behind this are built once per process and cached.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from call_my_bluff import game
+
+FACE_PROBABILITY = 1 / 3
+STAR_PROBABILITY = 1 / 6
+TABLE_BLOCK_SIZE = 32
+
+_BET_NUM_DICE, _BET_DICE_VALUE = game.bet_index_to_bet(
+    np.arange(game.MAX_BET_INDEX + 1)
+)
+_BET_IS_STAR = (_BET_DICE_VALUE == game.STAR).astype(np.int64)
+
+
+@lru_cache(maxsize=None)
+def _tail_table(size: int) -> np.ndarray:
+    table = np.zeros((size + 1, 2, size + 2))
+    table[:, :, 0] = 1.0
+    probability = np.array([FACE_PROBABILITY, STAR_PROBABILITY])[:, None]
+    for num_unknown in range(1, size + 1):
+        previous = table[num_unknown - 1]
+        table[num_unknown, :, 1:] = (
+            probability * previous[:, :-1] + (1 - probability) * previous[:, 1:]
+        )
+    table.setflags(write=False)
+    return table
+
+
+def tail_table(num_unknown: int) -> np.ndarray:
+    """
+    Returns the binomial tail table covering up to num_unknown unknown dice.
+
+    Args:
+        num_unknown (int): The largest number of unknown dice to cover.
+
+    Returns:
+        np.ndarray: A read-only table where [n, s, k] is the probability that at least
+            k of n unknown dice match a face value (s = 0) or a star (s = 1). The table
+            has at least num_unknown + 1 rows and num_unknown + 2 columns.
+    """
+    size = -(-max(num_unknown, 1) // TABLE_BLOCK_SIZE) * TABLE_BLOCK_SIZE
+    return _tail_table(size)
+
+
+def matching_dice(known_counts) -> np.ndarray:
+    """
+    Counts the known dice that match each dice value, with stars counted as wild.
+
+    Args:
+        known_counts (array_like): (..., 6) counts of known dice of each face.
+
+    Returns:
+        np.ndarray: (..., 6) the number of known dice that match each dice value.
+    """
+    known_counts = np.asarray(known_counts)
+    matches = known_counts + known_counts[..., game.STAR : game.STAR + 1]
+    matches[..., game.STAR] = known_counts[..., game.STAR]
+    return matches
+
+
+def bet_probabilities_from_counts(known_counts, num_unknown) -> np.ndarray:
+    """
+    Returns the probability that each bet is true.
+
+    Args:
+        known_counts (array_like): (..., 6) counts of known dice of each face.
+        num_unknown (array_like): (...) the number of unknown dice.
+
+    Returns:
+        np.ndarray: (..., MAX_BET_INDEX + 1) the probability of each bet index.
+    """
+    num_unknown = np.asarray(num_unknown)
+    table = tail_table(int(num_unknown.max()))
+    matches = matching_dice(known_counts)
+    needed = _BET_NUM_DICE - matches[..., _BET_DICE_VALUE]
+    needed = np.clip(needed, 0, table.shape[2] - 1)
+    return table[num_unknown[..., None], _BET_IS_STAR, needed]
+
+
+def bet_probabilities(observation: game.Observation) -> np.ndarray:
+    """
+    Returns the probability that each bet is true, given what a player can see.
+
+    Args:
+        observation (Observation): The observation of the current player.
+
+    Returns:
+        np.ndarray: (MAX_BET_INDEX + 1,) the probability of each bet index.
+    """
+    known_counts = np.array(observation.known_counts, dtype=np.int64)
+    return bet_probabilities_from_counts(known_counts, sum(observation.unknown_dice))
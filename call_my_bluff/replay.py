@@ -0,0 +1,291 @@
+"""
+The replay module stores games in a compact binary file and reads them back.
+
+A replay file is a 16-byte header followed by aligned 16-byte records of RECORD_DTYPE.
+Each game starts with a GAME record holding its seed and number of players and a DICE record
+per player with the initial dice, followed by a record per action and result in the
+order they were taken. The dice of later rounds are not stored, since they follow from the
+seed and the actions.
+
+The reader memory-maps the file, so every field is a NumPy view of the whole file that
+can be scanned without loading it into memory. Games are found by their GAME records,
+and any game can be replayed through the game module.
+
+Usage:
+    with replay.ReplayWriter("games.cmbr") as recorder:
+        tournament.play_game(agents, seed=0, recorder=recorder)
+    reader = replay.ReplayReader("games.cmbr")
+    state = reader.replay(0)
+"""
+from typing import Optional, Tuple
+import os
+import struct
+
+import numpy as np
+
+from call_my_bluff import game
+
+MAGIC = b"CMBR"
+VERSION = 3
+# Magic, version and record size
+_HEADER = struct.Struct("<4sII")
+HEADER_SIZE = 16
+
+# Record kinds, actions and results use their ActionType value
+RECORD_GAME = 4
+RECORD_DICE = 5
+
+RECORD_DTYPE = np.dtype(
+    [
+        ("value", "<u4"),
+        ("player", "<i2"),
+        ("bet", "<i2"),
+        ("loser", "<i2"),
+        ("dice_lost", "<i2"),
+        ("actual_num_dice", "<i2"),
+        ("kind", "u1"),
+        ("lock_mask", "u1"),
+    ]
+)
+# The value field holds the seed of a GAME record, the base 6 packed dice of a DICE
+# record and the number of dice of a REROLL_BET record. The player field of a GAME
+# record holds the number of players, the lock_mask field of a DICE record the number
+# of dice and the bet field of a RESULT record the bet that was called. Players and dice
+# counts take 16 bits, like the columns of an action log, so large tables fit. The
+# fields are ordered by size so that every field of a 16-byte record is aligned.
+
+# The number of records the reader scans at once when it looks for games
+SCAN_CHUNK_SIZE = 1 << 20
+
+_RESULT = game.ActionType.RESULT.value
+_REROLL_BET = game.ActionType.REROLL_BET.value
+_PLACES = 6 ** np.arange(game.NUM_DICE)
+
+
+def _pack_dice(dice) -> int:
+    return int(np.dot(dice, _PLACES[: len(dice)]))
+
+
+def _unpack_dice(value: int, num_dice: int) -> list:
+    return (value // _PLACES[:num_dice] % 6).tolist()
+
+
+class ReplayWriter:
+    """
+    This class is responsible for streaming games into a replay file.
+
+    Records are collected in a buffer and written in bulk. The writer is passed to
+    tournament.play_game as its recorder, or driven directly with start_game and
+    record_round.
+
+    Args:
+        path (str): The file to write, replaced if it exists.
+        buffer_size (int): The number of records written at once.
+    """
+
+    def __init__(self, path: str, buffer_size: int = 1 << 16):
+        self.path = path
+        self.num_games = 0
+        self.num_records = 0
+        self._buffer = np.zeros(buffer_size, dtype=RECORD_DTYPE)
+        self._count = 0
+        self._file = open(path, "wb")  # pylint: disable=consider-using-with
+        self._file.write(
+            _HEADER.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize).ljust(
+                HEADER_SIZE, b"\0"
+            )
+        )
+
+    def _reserve(self, num_records: int) -> np.ndarray:
+        if self._count + num_records > len(self._buffer):
+            self.flush()
+            if num_records > len(self._buffer):
+                self._buffer = np.zeros(num_records, dtype=RECORD_DTYPE)
+        records = self._buffer[self._count : self._count + num_records]
+        records[:] = 0
+        self._count += num_records
+        self.num_records += num_records
+        return records
+
+    def start_game(self, state: game.State, seed: int):
+        """
+        Records the start of a game.
+
+        Args:
+            state (State): The state returned by initialize_game.
+            seed (int): The seed passed to initialize_game, below 2 ** 32.
+
+        Raises:
+            ValueError: If the seed cannot be stored.
+        """
+        if seed is None or not 0 <= seed < 1 << 32:
+            raise ValueError("Replays need a seed between 0 and 2 ** 32 - 1.")
+        records = self._reserve(1 + state.num_players)
+        records[0]["kind"] = RECORD_GAME
+        records[0]["player"] = state.num_players
+        records[0]["value"] = seed
+        for player, dice in enumerate(state.dice):
+            record = records[1 + player]
+            record["kind"] = RECORD_DICE
+            record["player"] = player
+            record["value"] = _pack_dice(dice)
+            record["lock_mask"] = len(dice)
+        self.num_games += 1
+
+    def record_round(self, state: game.State):
+        """
+        Records the actions and the result of a round that just ended.
+
+        Args:
+            state (State): The state of the game before new_round is called.
+        """
+        columns = state.action_log.columns
+        kind = columns[:, 0]
+        records = self._reserve(len(columns))
+        records["kind"] = kind
+        records["player"] = columns[:, 1]
+        records["bet"] = np.where(kind == _RESULT, state.bet.index, columns[:, 2])
+        records["value"] = np.where(kind == _REROLL_BET, columns[:, 4], 0)
+        records["lock_mask"] = columns[:, 3]
+        records["loser"] = columns[:, 5]
+        records["dice_lost"] = columns[:, 6]
+        records["actual_num_dice"] = columns[:, 7]
+
+    def flush(self):
+        """Writes the buffered records to the file."""
+        self._file.write(self._buffer[: self._count].tobytes())
+        self._file.flush()
+        self._count = 0
+
+    def close(self):
+        """Writes the buffered records and closes the file."""
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ReplayReader:
+    """
+    This class is responsible for reading a replay file without loading it.
+
+    Attributes:
+        records (np.ndarray): A read-only memory map of all records. Each field, e.g.
+            records["bet"], is a view over the whole file.
+
+    Args:
+        path (str): The file to read.
+
+    Raises:
+        ValueError: If the file is not a replay file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            header = file.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            raise ValueError("Not a replay file.")
+        magic, version, record_size = _HEADER.unpack(header[: _HEADER.size])
+        if magic != MAGIC or record_size != RECORD_DTYPE.itemsize:
+            raise ValueError("Not a replay file.")
+        if version != VERSION:
+            raise ValueError(f"Unsupported replay version {version}.")
+        if os.path.getsize(path) == HEADER_SIZE:
+            # An empty memory map is not allowed
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+        else:
+            self.records = np.memmap(
+                path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE
+            )
+        self._game_starts = None
+
+    @property
+    def game_starts(self) -> np.ndarray:
+        """The index of the GAME record of every game, plus the number of records."""
+        if self._game_starts is None:
+            # Scanned in chunks, so that no mask over the whole file is built
+            kinds = self.records["kind"]
+            starts = []
+            for start in range(0, len(kinds), SCAN_CHUNK_SIZE):
+                chunk = kinds[start : start + SCAN_CHUNK_SIZE]
+                starts.append(start + np.flatnonzero(chunk == RECORD_GAME))
+            starts.append([len(kinds)])
+            self._game_starts = np.concatenate(starts).astype(np.intp)
+        return self._game_starts
+
+    @property
+    def num_games(self) -> int:
+        """The number of games in the file."""
+        return len(self.game_starts) - 1
+
+    def game_records(self, index: int) -> np.ndarray:
+        """
+        Returns the records of one game.
+
+        Args:
+            index (int): The game, in the order the games were recorded.
+
+        Returns:
+            np.ndarray: A view of the records of the game.
+        """
+        if not 0 <= index < self.num_games:
+            raise IndexError("game index out of range")
+        return self.records[self.game_starts[index] : self.game_starts[index + 1]]
+
+    def action_mask(self) -> np.ndarray:
+        """Returns a mask of the records that are actions taken by players."""
+        return self.records["kind"] < _RESULT
+
+    def replay(self, index: int) -> game.State:
+        """
+        Plays one game again from its seed and recorded actions.
+
+        Args:
+            index (int): The game to replay.
+
+        Returns:
+            State: The state at the end of the last round, as it was when recorded.
+
+        Raises:
+            ValueError: If the replayed game does not match the recording.
+        """
+        records = self.game_records(index)
+        num_players, seed = int(records[0]["player"]), int(records[0]["value"])
+        state = game.initialize_game(num_players, seed=seed)
+        dice = records[1 : 1 + num_players]
+        for player, record in enumerate(dice):
+            expected = _unpack_dice(int(record["value"]), int(record["lock_mask"]))
+            if state.dice[player] != expected:
+                raise ValueError(f"Replay of game {index} rolled different dice.")
+
+        for record in records[1 + num_players :].tolist():
+            player, bet, result, kind = record[1], record[2], record[3:6], record[6]
+            if kind == _RESULT:
+                if state.action_log[-1].result[:3] != result:
+                    raise ValueError(f"Replay of game {index} has a different result.")
+                continue
+            if game.round_over(state):
+                state = game.new_round(state)
+            if player != state.player_curr:
+                raise ValueError(f"Replay of game {index} has a different player.")
+            state = game.player_action(state, self._action(kind, bet, record))
+        return state
+
+    @staticmethod
+    def _action(kind: int, bet: int, record: Tuple) -> game.Action:
+        action_type = game.ActionType(kind)
+        if action_type == game.ActionType.CALL:
+            return game.Action(type=action_type)
+        dice_to_lock: Optional[Tuple[bool, ...]] = None
+        if action_type == game.ActionType.REROLL_BET:
+            num_dice, lock_mask = record[0], record[7]
+            dice_to_lock = tuple(bool(lock_mask >> i & 1) for i in range(num_dice))
+        return game.Action(
+            type=action_type, bet=game.Bet(index=bet), dice_to_lock=dice_to_lock
+        )
@@ -0,0 +1,148 @@
+"""
+The rules module contains the bets, actions and scoring rules of the game.
+
+It only uses the standard library, so tools that convert bets or read action logs can
+import it without the cost of importing NumPy. The game module re-exports everything
+defined here.
+"""
+from typing import Optional, Sequence, Tuple
+from dataclasses import dataclass
+from enum import Enum
+
+NO_BET_INDEX = -1
+MAX_BET_INDEX = 109
+NUM_DICE = 5
+STAR = 5
+
+
+class ActionType(Enum):
+    """
+    This class is responsible for enumerating the different types of actions.
+    """
+
+    CALL = 0
+    BET = 1
+    REROLL_BET = 2
+    RESULT = 3
+
+
+def _bet_index_to_bet(index: int) -> Tuple[int, int]:
+    if index == NO_BET_INDEX:
+        return (0, 0)
+
+    group = index // 11
+    position = index % 11
+    if position == 5:
+        bet = (group + 1, STAR)
+    elif position < 5:
+        bet = (2 * group + 1, position)
+    else:
+        bet = (2 * group + 2, position - 6)
+
+    return bet
+
+
+class Bet:
+    """
+    This class is responsible for representing a bet.
+
+    Bets are immutable and interned: there is exactly one Bet object for each bet
+    index, and constructing a Bet is a table lookup.
+
+    Args:
+        num_dice (int): The number of dice in the bet.
+        dice_value (int): The value of the dice in the bet.
+
+        or
+
+        index (int): The bet index.
+
+    Raises:
+        ValueError: If the bet index is invalid.
+
+    """
+
+    __slots__ = ("_index", "_num_dice", "_dice_value")
+
+    def __new__(cls, **kwargs):
+        # Accept either (num_dice, dice_value) or bet_index
+        if "index" in kwargs:
+            index = kwargs["index"]
+            if index < NO_BET_INDEX or index > MAX_BET_INDEX:
+                raise ValueError("Invalid bet index")
+            return BETS[index + 1]
+        if "num_dice" in kwargs and "dice_value" in kwargs:
+            try:
+                return _BETS_BY_VALUE[(kwargs["num_dice"], kwargs["dice_value"])]
+            except KeyError:
+                raise ValueError("Invalid bet index") from None
+        raise ValueError("Invalid bet arguments")
+
+    @classmethod
+    def _create(cls, index: int) -> "Bet":
+        bet = object.__new__(cls)
+        num_dice, dice_value = _bet_index_to_bet(index)
+        object.__setattr__(bet, "_index", index)
+        object.__setattr__(bet, "_num_dice", num_dice)
+        object.__setattr__(bet, "_dice_value", dice_value)
+        return bet
+
+    @property
+    def index(self):
+        """The bet index."""
+        return self._index
+
+    @property
+    def num_dice(self):
+        """The number of dice in the bet."""
+        return self._num_dice
+
+    @property
+    def dice_value(self):
+        """The value of the dice in the bet."""
+        return self._dice_value
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Bet is immutable, create a new Bet instead.")
+
+    def __reduce__(self):
+        return (_bet_from_index, (self._index,))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __str__(self):
+        return f"[Dice Num: {self.dice_value}, Num Dice: {self.num_dice}, Dice Index: {self.index}]"
+
+    # pylint: disable=unused-argument, invalid-name
+    def _repr_pretty_(self, p, cycle):
+        p.text(
+            f"[Dice Num: {self.dice_value}, Num Dice: {self.num_dice}, Dice Index: {self.index}]"
+        )
+
+    def __repr__(self):
+        return f"Bet(num_dice={self.num_dice}, dice_value={self.dice_value})"
+
+
+def _bet_from_index(index: int) -> Bet:
+    return BETS[index + 1]
+
+
+# Every bet, offset by one so NO_BET_INDEX is at position 0
+# pylint: disable=protected-access
+BETS = tuple(Bet._create(index) for index in range(NO_BET_INDEX, MAX_BET_INDEX + 1))
+_BETS_BY_VALUE = {(bet.num_dice, bet.dice_value): bet for bet in BETS}
+
+
+@dataclass(frozen=True)
+class Action:
+    """This class is responsible for holding the action for the current player."""
+
+    type: ActionType
+    dice_to_lock: Optional[Sequence[bool]] = None
+    bet: Optional[Bet] = None
+    result: Optional[Tuple[int]] = None
+    player: Optional[int] = None
@@ -0,0 +1,290 @@
+"""
+The search module contains an information-set Monte Carlo search agent.
+
+Each iteration samples the dice the agent cannot see, consistent with the dice it knows
+and the dice that opponents locked, applies one of the agent's candidate actions to the
+sampled state and plays the rest of the round out with rollout agents. Candidates are
+chosen with UCB1 and the agent plays the candidate that was tried the most. The value
+of a rollout is the average number of dice lost by the other players minus the number
+of dice lost by the agent.
+
+With an executor, the budget is split over independent searches with their own seeds
+that run on the executor, and their statistics are added up before choosing.
+"""
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+import math
+import time
+
+import numpy as np
+
+from call_my_bluff import agents
+from call_my_bluff import game
+
+
+class _Root(NamedTuple):
+    # The parts of an observation the search needs, cheap to send to a worker
+    player: int
+    turn_order: Tuple[int, ...]
+    num_dice: Tuple[int, ...]
+    bet: int
+    known_dice: Tuple[Tuple[int, ...], ...]
+    unknown_dice: Tuple[int, ...]
+    locked_dice: Tuple[bool, ...]
+    player_prev: Optional[int]
+
+
+def _root(observation: game.Observation) -> _Root:
+    action_log = observation.action_log
+    return _Root(
+        player=observation.player,
+        turn_order=observation.turn_order,
+        num_dice=observation.num_dice,
+        bet=observation.bet.index,
+        known_dice=observation.known_dice,
+        unknown_dice=observation.unknown_dice,
+        locked_dice=observation.player_locked_dice,
+        player_prev=action_log[-1].player if len(action_log) > 0 else None,
+    )
+
+
+def determinize(observation: game.Observation, rng: np.random.Generator) -> game.State:
+    """
+    Samples a full game state consistent with an observation.
+
+    The dice of other players that are not locked are rolled at random. The locked
+    dice of other players are put in their first slots, since their positions are not
+    observed.
+
+    Args:
+        observation (Observation): The observation of the current player.
+        rng (np.random.Generator): The random number generator to sample with.
+
+    Returns:
+        State: A state in which it is the observing player's turn.
+    """
+    return _determinize(_root(observation), rng)
+
+
+def _determinize(root: _Root, rng: np.random.Generator) -> game.State:
+    rolls = rng.integers(0, 6, size=sum(root.unknown_dice)).tolist()
+    dice = []
+    dice_locked = []
+    position = 0
+    for player, known in enumerate(root.known_dice):
+        if player == root.player:
+            dice.append(list(known))
+            dice_locked.append(list(root.locked_dice))
+            continue
+        unknown = root.unknown_dice[player]
+        dice.append(list(known) + rolls[position : position + unknown])
+        dice_locked.append([True] * len(known) + [False] * unknown)
+        position += unknown
+    return game.State(
+        num_players=len(root.num_dice),
+        bet=game.Bet(index=root.bet),
+        player_curr=root.player,
+        player_prev=root.player_prev,
+        turn_order=list(root.turn_order),
+        num_dice=list(root.num_dice),
+        dice=dice,
+        dice_locked=dice_locked,
+        action_log=game.ActionLog(),
+        roller=game.DiceRoller(rng),
+    )
+
+
+def candidate_actions(
+    observation: game.Observation, num_bets: int = 8
+) -> List[game.Action]:
+    """
+    Returns the actions the search chooses between.
+
+    These are a call, the num_bets lowest legal bets, and for each of those bets a
+    reroll that locks the unlocked dice counting towards it.
+
+    Args:
+        observation (Observation): The observation of the current player.
+        num_bets (int): The number of bets to consider.
+
+    Returns:
+        List[Action]: The candidate actions.
+    """
+    return _candidate_actions(_root(observation), num_bets)
+
+
+def _candidate_actions(root: _Root, num_bets: int) -> List[game.Action]:
+    candidates = []
+    if root.bet != game.NO_BET_INDEX:
+        candidates.append(game.Action(type=game.ActionType.CALL))
+    dice = root.known_dice[root.player]
+    stop = min(root.bet + 1 + num_bets, game.MAX_BET_INDEX + 1)
+    for index in range(root.bet + 1, stop):
+        bet = game.Bet(index=index)
+        candidates.append(game.Action(type=game.ActionType.BET, bet=bet))
+        dice_to_lock = tuple(
+            not locked and (dice_value == bet.dice_value or dice_value == game.STAR)
+            for dice_value, locked in zip(dice, root.locked_dice)
+        )
+        num_unlocked = root.locked_dice.count(False)
+        if 0 < sum(dice_to_lock) < num_unlocked:
+            candidates.append(
+                game.Action(
+                    type=game.ActionType.REROLL_BET, bet=bet, dice_to_lock=dice_to_lock
+                )
+            )
+    return candidates
+
+
+def _rollout(
+    root: _Root,
+    action: game.Action,
+    rollout_agents: Sequence,
+    rng: np.random.Generator,
+) -> float:
+    state = _determinize(root, rng)
+    num_dice = list(state.num_dice)
+    state = game.player_action(state, action)
+    while not game.round_over(state):
+        observation = game.player_observation(state)
+        state = game.player_action(
+            state, rollout_agents[state.player_curr].policy(observation)
+        )
+    lost = [before - after for before, after in zip(num_dice, state.num_dice)]
+    others = len(root.turn_order) - 1
+    return (sum(lost) - lost[root.player]) / max(others, 1) - lost[root.player]
+
+
+def _search(
+    root: _Root,
+    candidates: Sequence[game.Action],
+    rollout_factories: Sequence[Callable],
+    iterations: int,
+    time_limit: Optional[float],
+    exploration: float,
+    seed,
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Runs UCB1 over the candidates and returns their visit counts and total values
+    rng = np.random.default_rng(seed)
+    rollout_agents = [
+        rollout_factories[player % len(rollout_factories)]()
+        for player in range(len(root.num_dice))
+    ]
+    visits = np.zeros(len(candidates))
+    values = np.zeros(len(candidates))
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    for iteration in range(iterations):
+        if deadline is not None and iteration > 0 and time.perf_counter() > deadline:
+            break
+        if iteration < len(candidates):
+            choice = iteration
+        else:
+            scores = values / visits + exploration * np.sqrt(
+                math.log(iteration) / visits
+            )
+            choice = int(np.argmax(scores))
+        visits[choice] += 1
+        values[choice] += _rollout(root, candidates[choice], rollout_agents, rng)
+    return visits, values
+
+
+class SearchAgent:
+    """
+    This is an agent that picks its actions by information-set Monte Carlo search.
+
+    Args:
+        iterations (int): The largest number of rollouts per move.
+        time_limit (float, optional): The seconds to search per move. The search stops
+            at whichever of iterations and time_limit is reached first.
+        rollout_agents (Sequence[Callable]): Picklable factories of the agents that
+            play the rollouts, assigned to players in turn.
+        num_bets (int): The number of bets to consider, see candidate_actions.
+        exploration (float): The UCB1 exploration constant.
+        executor (concurrent.futures.Executor, optional): Runs num_workers searches
+            in parallel, each with its share of the iterations.
+        num_workers (int): The number of parallel searches when there is an executor.
+        seed (int, optional): Seed for the searches.
+    """
+
+    # round_results does nothing, so the game loop may skip building the result
+    ignores_round_results = True
+
+    def __init__(
+        self,
+        iterations: int = 200,
+        time_limit: Optional[float] = None,
+        rollout_agents: Sequence[Callable] = (agents.MaxAgent,),
+        num_bets: int = 8,
+        exploration: float = 1.0,
+        executor=None,
+        num_workers: int = 4,
+        seed=None,
+    ):
+        self.iterations = iterations
+        self.time_limit = time_limit
+        self.rollout_agents = tuple(rollout_agents)
+        self.num_bets = num_bets
+        self.exploration = exploration
+        self.executor = executor
+        self.num_workers = num_workers
+        self.seed_sequence = np.random.SeedSequence(seed)
+
+    def policy(self, observation: game.Observation):
+        """
+        Play a turn.
+
+        Args:
+            observation (Observation): The observation of the current state of the game.
+
+        Returns:
+            action (Action): The action to take.
+        """
+        root = _root(observation)
+        candidates = _candidate_actions(root, self.num_bets)
+        if len(candidates) == 1:
+            return candidates[0]
+
+        if self.executor is None:
+            visits, values = _search(
+                root,
+                candidates,
+                self.rollout_agents,
+                self.iterations,
+                self.time_limit,
+                self.exploration,
+                self.seed_sequence.spawn(1)[0],
+            )
+        else:
+            iterations = -(-self.iterations // self.num_workers)
+            futures = [
+                self.executor.submit(
+                    _search,
+                    root,
+                    candidates,
+                    self.rollout_agents,
+                    iterations,
+                    self.time_limit,
+                    self.exploration,
+                    seed,
+                )
+                for seed in self.seed_sequence.spawn(self.num_workers)
+            ]
+            visits = np.zeros(len(candidates))
+            values = np.zeros(len(candidates))
+            for future in futures:
+                worker_visits, worker_values = future.result()
+                visits += worker_visits
+                values += worker_values
+
+        best = np.flatnonzero(visits == visits.max())
+        means = values[best] / visits[best]
+        return candidates[best[int(np.argmax(means))]]
+
+    def round_results(self, result: game.RoundResult):
+        """
+        Update the agent's internal state based on the results of the round.
+
+        Args:
+            result (RoundResult): The outcome of the round.
+        """
+        # pylint: disable=unnecessary-pass
+        pass
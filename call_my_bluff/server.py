@@ -0,0 +1,594 @@
+"""
+The server module hosts games for agents that run in other processes.
+
+A GameServer runs many tables on one asyncio event loop and talks to its agents over
+TCP or Unix sockets. Every message is a JSON object on a line of its own:
+
+    client: {"type": "hello", "name": str, "round_results": bool}
+    server: {"type": "seat", "table": int, "player": int, "num_players": int}
+    server: {"type": "turn", "table": int, "turn": int, "deadline": float,
+             "observation": {...}}
+    client: {"type": "action", "turn": int, "action": {...}}
+    server: {"type": "round_result", "table": int, "result": {...}}
+    server: {"type": "game_over", "table": int, "winner": int}
+    server: {"type": "close"}
+
+A move that is not answered before the deadline, or that is not a legal action, is
+replaced by forced_action. Connections are seated in the order they become free, and
+after each game they wait for the next table until all games have been played.
+
+Usage:
+    python -m call_my_bluff.server serve --players 3 --games 100 --port 7000
+    python -m call_my_bluff.server connect MaxAgent --port 7000 --count 3
+"""
+from typing import List, Optional
+from dataclasses import dataclass
+import argparse
+import asyncio
+import collections
+import json
+
+import numpy as np
+
+from call_my_bluff import game
+from call_my_bluff import tournament
+
+DEFAULT_MOVE_TIMEOUT = 1.0
+
+
+def observation_to_json(observation: game.Observation) -> dict:
+    """
+    Converts an observation to a JSON-friendly dict.
+
+    The action log is sent as its rows, see game.ACTION_LOG_COLUMNS.
+
+    Args:
+        observation (Observation): The observation to convert.
+
+    Returns:
+        dict: The observation.
+    """
+    return {
+        "player": observation.player,
+        "turn_order": list(observation.turn_order),
+        "num_dice": list(observation.num_dice),
+        "bet": observation.bet.index,
+        "unknown_dice": list(observation.unknown_dice),
+        "known_dice": [list(dice) for dice in observation.known_dice],
+        "player_locked_dice": list(observation.player_locked_dice),
+        "action_log": observation.action_log.columns.tolist(),
+    }
+
+
+def observation_from_json(data: dict) -> game.Observation:
+    """
+    Rebuilds an observation from observation_to_json.
+
+    Args:
+        data (dict): The converted observation.
+
+    Returns:
+        Observation: The observation.
+    """
+    known_dice = tuple(tuple(dice) for dice in data["known_dice"])
+    known_counts = [0] * 6
+    for dice in known_dice:
+        for dice_value in dice:
+            known_counts[dice_value] += 1
+    return game.Observation(
+        player=data["player"],
+        turn_order=tuple(data["turn_order"]),
+        num_dice=tuple(data["num_dice"]),
+        bet=game.Bet(index=data["bet"]),
+        unknown_dice=tuple(data["unknown_dice"]),
+        known_dice=known_dice,
+        known_counts=tuple(known_counts),
+        player_locked_dice=tuple(data["player_locked_dice"]),
+        action_log=game.ActionLogView(game.ActionLog.from_columns(data["action_log"])),
+    )
+
+
+def action_to_json(action: game.Action) -> dict:
+    """
+    Converts an action to a JSON-friendly dict.
+
+    Args:
+        action (Action): The action to convert.
+
+    Returns:
+        dict: The action type name, bet index and dice to lock.
+    """
+    return {
+        "type": action.type.name,
+        "bet": None if action.bet is None else action.bet.index,
+        "dice_to_lock": (
+            None if action.dice_to_lock is None else list(action.dice_to_lock)
+        ),
+    }
+
+
+def action_from_json(data: dict) -> game.Action:
+    """
+    Rebuilds an action from action_to_json.
+
+    Args:
+        data (dict): The converted action.
+
+    Returns:
+        Action: The action.
+
+    Raises:
+        ValueError: If the action is malformed.
+    """
+    try:
+        action_type = game.ActionType[data["type"]]
+        bet = data.get("bet")
+        dice_to_lock = data.get("dice_to_lock")
+        return game.Action(
+            type=action_type,
+            bet=None if bet is None else game.Bet(index=int(bet)),
+            dice_to_lock=(
+                None if dice_to_lock is None else tuple(bool(x) for x in dice_to_lock)
+            ),
+        )
+    except (KeyError, TypeError, AttributeError) as error:
+        raise ValueError("Malformed action.") from error
+
+
+def result_to_json(result: game.RoundResult) -> dict:
+    """
+    Converts a round result to a JSON-friendly dict.
+
+    Args:
+        result (RoundResult): The result to convert.
+
+    Returns:
+        dict: The result.
+    """
+    return {
+        "dice": [list(dice) for dice in result.dice],
+        "num_dice": list(result.num_dice),
+        "bet": result.bet.index,
+        "bettor": result.bettor,
+        "caller": result.caller,
+        "loser": result.loser,
+        "dice_lost": result.dice_lost,
+        "actual_num_dice": result.actual_num_dice,
+        "action_log": result.action_log.columns.tolist(),
+    }
+
+
+def result_from_json(data: dict) -> game.RoundResult:
+    """
+    Rebuilds a round result from result_to_json.
+
+    Args:
+        data (dict): The converted result.
+
+    Returns:
+        RoundResult: The result.
+    """
+    return game.RoundResult(
+        dice=tuple(tuple(dice) for dice in data["dice"]),
+        num_dice=tuple(data["num_dice"]),
+        bet=game.Bet(index=data["bet"]),
+        bettor=data["bettor"],
+        caller=data["caller"],
+        loser=data["loser"],
+        dice_lost=data["dice_lost"],
+        actual_num_dice=data["actual_num_dice"],
+        action_log=game.ActionLogView(game.ActionLog.from_columns(data["action_log"])),
+    )
+
+
+def forced_action(state: game.State) -> game.Action:
+    """
+    Returns the action played for a player who did not answer in time.
+
+    Args:
+        state (State): The state of the game.
+
+    Returns:
+        Action: A call, or the lowest bet if there is nothing to call.
+    """
+    if state.bet.index == game.NO_BET_INDEX:
+        return game.Action(type=game.ActionType.BET, bet=game.Bet(index=0))
+    return game.Action(type=game.ActionType.CALL)
+
+
+def _encode(message: dict) -> bytes:
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode()
+
+
+@dataclass
+class TableResult:
+    """This class holds the outcome of a game played on the server."""
+
+    table: int
+    agent_names: List[str]
+    result: tournament.GameResult
+    forced_moves: List[int]
+
+
+class _Connection:
+    # One connected agent, with a task reading its replies in the background
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.name = "unknown"
+        self.round_results = False
+        self.closed = False
+        self.done = asyncio.Event()
+        self._turn = 0
+        self._pending: Optional[asyncio.Future] = None
+        self._read_task: Optional[asyncio.Task] = None
+
+    async def hello(self) -> bool:
+        try:
+            message = json.loads(await self.reader.readline())
+        except ValueError:
+            return False
+        if not isinstance(message, dict) or message.get("type") != "hello":
+            return False
+        self.name = str(message.get("name", self.name))
+        self.round_results = bool(message.get("round_results", False))
+        self._read_task = asyncio.create_task(self._read())
+        return True
+
+    async def _read(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                pending = self._pending
+                if (
+                    isinstance(message, dict)
+                    and message.get("type") == "action"
+                    and message.get("turn") == self._turn
+                    and pending is not None
+                    and not pending.done()
+                ):
+                    pending.set_result(message.get("action"))
+        except ConnectionError:
+            pass
+        self.closed = True
+        if self._pending is not None and not self._pending.done():
+            self._pending.set_result(None)
+
+    def send(self, message: dict):
+        if not self.closed:
+            self.writer.write(_encode(message))
+
+    async def request_action(
+        self, table: int, observation: game.Observation, timeout: float
+    ) -> Optional[dict]:
+        # Returns the action the agent sent, None if it did not answer in time
+        if self.closed:
+            return None
+        self._turn += 1
+        self._pending = asyncio.get_running_loop().create_future()
+        self.send(
+            {
+                "type": "turn",
+                "table": table,
+                "turn": self._turn,
+                "deadline": timeout,
+                "observation": observation_to_json(observation),
+            }
+        )
+        try:
+            await self.writer.drain()
+            return await asyncio.wait_for(self._pending, timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            return None
+
+    async def close(self):
+        self.send({"type": "close"})
+        self.closed = True
+        try:
+            self.writer.close()
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+        if self._read_task is not None:
+            self._read_task.cancel()
+        self.done.set()
+
+
+class GameServer:
+    """
+    This class is responsible for running tables of games for connected agents.
+
+    Every table is a task on the event loop, so tables whose agents are thinking do not
+    hold up the others. Game i is seeded with tournament.game_seed(seed, i).
+
+    Args:
+        num_players (int): The number of players at every table.
+        num_games (int, optional): The number of games to play, unlimited if None.
+        move_timeout (float): The seconds an agent has to answer each move.
+        seed (int, optional): The seed of the games, drawn at random if None.
+    """
+
+    def __init__(
+        self,
+        num_players: int,
+        num_games: Optional[int] = None,
+        move_timeout: float = DEFAULT_MOVE_TIMEOUT,
+        seed: Optional[int] = None,
+    ):
+        self.num_players = num_players
+        self.num_games = num_games
+        self.move_timeout = move_timeout
+        if seed is None:
+            seed = int(np.random.SeedSequence().generate_state(1)[0])
+        self.seed = seed
+        self.results: List[TableResult] = []
+        self._lobby: Optional[asyncio.Queue] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._tasks = set()
+        self._connections = set()
+        self._finished: Optional[asyncio.Event] = None
+
+    async def start(
+        self, host: str = "127.0.0.1", port: int = 0, path: Optional[str] = None
+    ) -> asyncio.AbstractServer:
+        """
+        Starts listening for agents.
+
+        Args:
+            host (str): The TCP host to listen on.
+            port (int): The TCP port to listen on, any free port if 0.
+            path (str, optional): Listen on this Unix socket instead of TCP.
+
+        Returns:
+            asyncio.AbstractServer: The listening server.
+        """
+        self._lobby = asyncio.Queue()
+        self._finished = asyncio.Event()
+        if path is None:
+            self._server = await asyncio.start_server(self._handle, host, port)
+        else:
+            self._server = await asyncio.start_unix_server(self._handle, path)
+        self._spawn(self._seat_tables())
+        return self._server
+
+    @property
+    def port(self) -> Optional[int]:
+        """The TCP port the server listens on."""
+        for sock in self._server.sockets:
+            address = sock.getsockname()
+            if isinstance(address, tuple):
+                return address[1]
+        return None
+
+    async def wait_finished(self) -> List[TableResult]:
+        """
+        Waits until all games have been played and closes the server.
+
+        Returns:
+            List[TableResult]: The outcome of every game, in table order.
+        """
+        await self._finished.wait()
+        await self.close()
+        return sorted(self.results, key=lambda result: result.table)
+
+    async def close(self):
+        """Stops the server and disconnects every agent."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in list(self._tasks):
+            task.cancel()
+        for connection in list(self._connections):
+            await connection.close()
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        connection = _Connection(reader, writer)
+        if not await connection.hello():
+            writer.close()
+            return
+        self._connections.add(connection)
+        await self._lobby.put(connection)
+        await connection.done.wait()
+        self._connections.discard(connection)
+
+    async def _seat_tables(self):
+        table = 0
+        while self.num_games is None or table < self.num_games:
+            seats = []
+            while len(seats) < self.num_players:
+                connection = await self._lobby.get()
+                if not connection.closed:
+                    seats.append(connection)
+            self._spawn(self._play_table(table, seats))
+            table += 1
+
+    async def _play_table(self, table: int, seats: List[_Connection]):
+        state = game.initialize_game(
+            self.num_players, seed=tournament.game_seed(self.seed, table)
+        )
+        for player, connection in enumerate(seats):
+            connection.send(
+                {
+                    "type": "seat",
+                    "table": table,
+                    "player": player,
+                    "num_players": self.num_players,
+                }
+            )
+        forced_moves = [0] * self.num_players
+        turn_order = list(state.turn_order)
+        num_rounds = 0
+        num_turns = 0
+        while not game.game_over(state):
+            while not game.round_over(state):
+                player = state.player_curr
+                observation = game.player_observation(state)
+                message = await seats[player].request_action(
+                    table, observation, self.move_timeout
+                )
+                try:
+                    state = game.player_action(state, action_from_json(message))
+                except ValueError:
+                    forced_moves[player] += 1
+                    state = game.player_action(state, forced_action(state))
+                num_turns += 1
+
+            listeners = [seat for seat in seats if seat.round_results]
+            if listeners:
+                result = {
+                    "type": "round_result",
+                    "table": table,
+                    "result": result_to_json(game.player_result(state)),
+                }
+                for connection in listeners:
+                    connection.send(result)
+            state = game.new_round(state)
+            num_rounds += 1
+
+        for connection in seats:
+            connection.send(
+                {"type": "game_over", "table": table, "winner": state.player_curr}
+            )
+        self.results.append(
+            TableResult(
+                table=table,
+                agent_names=[connection.name for connection in seats],
+                result=tournament.GameResult(
+                    winner=state.player_curr,
+                    turn_order=turn_order,
+                    num_rounds=num_rounds,
+                    num_turns=num_turns,
+                ),
+                forced_moves=forced_moves,
+            )
+        )
+        if self.num_games is not None and len(self.results) >= self.num_games:
+            self._finished.set()
+            return
+        for connection in seats:
+            await self._lobby.put(connection)
+
+
+class AgentClient:
+    """
+    This class is responsible for connecting an in-process agent to a GameServer.
+
+    The agent plays every table it is seated at until the server closes.
+
+    Args:
+        agent: An agent with policy and round_results methods.
+        name (str, optional): The name sent to the server, the agent class if None.
+    """
+
+    def __init__(self, agent, name: Optional[str] = None):
+        self.agent = agent
+        self.name = type(agent).__name__ if name is None else name
+        self.num_games = 0
+
+    async def run(
+        self, host: str = "127.0.0.1", port: int = 0, path: Optional[str] = None
+    ) -> int:
+        """
+        Plays games until the server closes the connection.
+
+        Args:
+            host (str): The TCP host of the server.
+            port (int): The TCP port of the server.
+            path (str, optional): Connect to this Unix socket instead of TCP.
+
+        Returns:
+            int: The number of games played.
+        """
+        if path is None:
+            reader, writer = await asyncio.open_connection(host, port)
+        else:
+            reader, writer = await asyncio.open_unix_connection(path)
+        wants_results = not getattr(self.agent, "ignores_round_results", False)
+        writer.write(
+            _encode(
+                {"type": "hello", "name": self.name, "round_results": wants_results}
+            )
+        )
+        try:
+            async for line in reader:
+                message = json.loads(line)
+                if message["type"] == "turn":
+                    observation = observation_from_json(message["observation"])
+                    action = self.agent.policy(observation)
+                    writer.write(
+                        _encode(
+                            {
+                                "type": "action",
+                                "turn": message["turn"],
+                                "action": action_to_json(action),
+                            }
+                        )
+                    )
+                    await writer.drain()
+                elif message["type"] == "round_result":
+                    self.agent.round_results(result_from_json(message["result"]))
+                elif message["type"] == "game_over":
+                    self.num_games += 1
+                elif message["type"] == "close":
+                    break
+        finally:
+            writer.close()
+        return self.num_games
+
+
+def main(argv: Optional[List[str]] = None):
+    """Runs a server or connects agents from the command line."""
+    parser = argparse.ArgumentParser(
+        prog="python -m call_my_bluff.server", description=__doc__.split("\n")[1]
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="Host games.")
+    serve.add_argument("--players", type=int, default=2)
+    serve.add_argument("--games", type=int, default=None)
+    serve.add_argument("--timeout", type=float, default=DEFAULT_MOVE_TIMEOUT)
+    serve.add_argument("--seed", type=int, default=None)
+    connect = commands.add_parser("connect", help="Connect agents to a server.")
+    connect.add_argument("agent", help="An agent class name or module:Class spec.")
+    connect.add_argument("--count", type=int, default=1)
+    for command in (serve, connect):
+        command.add_argument("--host", default="127.0.0.1")
+        command.add_argument("--port", type=int, default=7000)
+        command.add_argument("--unix", metavar="PATH", help="Use a Unix socket.")
+    args = parser.parse_args(argv)
+
+    async def serve_games():
+        server = GameServer(
+            args.players, args.games, move_timeout=args.timeout, seed=args.seed
+        )
+        await server.start(args.host, args.port, path=args.unix)
+        print(f"Serving {args.players} player tables.")
+        results = await server.wait_finished()
+        wins = collections.Counter(
+            result.agent_names[result.result.winner] for result in results
+        )
+        for name, count in wins.most_common():
+            print(f"{name}: {count / max(len(results), 1)}")
+
+    async def connect_agents():
+        factory = tournament.load_agent(args.agent)
+        clients = [AgentClient(factory()) for _ in range(args.count)]
+        await asyncio.gather(
+            *(client.run(args.host, args.port, path=args.unix) for client in clients)
+        )
+
+    asyncio.run(serve_games() if args.command == "serve" else connect_agents())
+
+
+if __name__ == "__main__":
+    main()
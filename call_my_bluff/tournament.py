@@ -0,0 +1,629 @@
+"""
+The tournament module plays many games between a lineup of agents on a process pool.
+
+Every game is seeded from the tournament seed and its own game index, so a tournament
+gives the same result however many workers it is spread over. A tournament can also be
+split into shards that are played on separate machines, each writing a result file,
+and merging the files of all shards gives the same result as playing them in one run.
+
+Usage:
+    python -m call_my_bluff.tournament MaxAgent SimpleAgent --games 10000 --seed 0
+    python -m call_my_bluff.tournament MaxAgent SimpleAgent --games 10000 --seed 0 \
+        --shard-index 0 --shard-count 4 --output shard0.json
+    python -m call_my_bluff merge shard*.json
+"""
+from typing import Callable, List, Optional, Sequence, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+import argparse
+import importlib
+import json
+import math
+import os
+import time
+
+import numpy as np
+from tqdm import tqdm
+
+from call_my_bluff import agents as bundled_agents
+from call_my_bluff import game
+from call_my_bluff import instrument
+from call_my_bluff import replay
+
+DEFAULT_CHUNK_SIZE = 100
+ELO_SCALE = 400 / math.log(10)
+
+
+@dataclass
+class GameResult:
+    """This class holds the outcome of a single game."""
+
+    winner: int
+    turn_order: List[int]
+    num_rounds: int
+    num_turns: int
+
+
+@dataclass
+class TournamentResult:
+    """
+    This class holds the merged statistics of a tournament.
+
+    Seats are positions in the shuffled turn order at the start of a game, so seat 0 is
+    the player who bets first.
+    """
+
+    agent_names: List[str]
+    seed: int
+    num_games: int = 0
+    num_rounds: int = 0
+    num_turns: int = 0
+    wins: np.ndarray = field(default=None)
+    seat_games: np.ndarray = field(default=None)
+    seat_wins: np.ndarray = field(default=None)
+
+    def __post_init__(self):
+        num_agents = len(self.agent_names)
+        if self.wins is None:
+            self.wins = np.zeros(num_agents, dtype=np.int64)
+        if self.seat_games is None:
+            self.seat_games = np.zeros((num_agents, num_agents), dtype=np.int64)
+        if self.seat_wins is None:
+            self.seat_wins = np.zeros((num_agents, num_agents), dtype=np.int64)
+
+    def add_game(self, result: GameResult):
+        """
+        Adds the outcome of one game to the statistics.
+
+        Args:
+            result (GameResult): The outcome of the game.
+        """
+        self.num_games += 1
+        self.num_rounds += result.num_rounds
+        self.num_turns += result.num_turns
+        self.wins[result.winner] += 1
+        for seat, player in enumerate(result.turn_order):
+            self.seat_games[player, seat] += 1
+        self.seat_wins[result.winner, result.turn_order.index(result.winner)] += 1
+
+    def merge(self, other: "TournamentResult"):
+        """
+        Adds the statistics of another part of the same tournament.
+
+        Args:
+            other (TournamentResult): The statistics to add.
+        """
+        if other.agent_names != self.agent_names:
+            raise ValueError("Cannot merge results for different lineups.")
+        self.num_games += other.num_games
+        self.num_rounds += other.num_rounds
+        self.num_turns += other.num_turns
+        self.wins += other.wins
+        self.seat_games += other.seat_games
+        self.seat_wins += other.seat_wins
+
+    def win_rates(self) -> np.ndarray:
+        """The fraction of games won by each agent."""
+        return self.wins / max(self.num_games, 1)
+
+    def rating_deltas(self) -> np.ndarray:
+        """
+        Returns the Elo rating of each agent relative to the lineup average.
+
+        The chance of winning a game is taken to be proportional to an agent's
+        strength, and every agent is given one extra win so that the ratings are
+        finite.
+
+        Returns:
+            np.ndarray: The rating differences, which sum to zero.
+        """
+        log_strengths = np.log(self.wins + 1.0)
+        return ELO_SCALE * (log_strengths - log_strengths.mean())
+
+    def to_json(self) -> dict:
+        """Returns the statistics as a JSON-friendly dict."""
+        return {
+            "agent_names": self.agent_names,
+            "seed": self.seed,
+            "num_games": self.num_games,
+            "num_rounds": self.num_rounds,
+            "num_turns": self.num_turns,
+            "wins": self.wins.tolist(),
+            "seat_games": self.seat_games.tolist(),
+            "seat_wins": self.seat_wins.tolist(),
+            # not read back, the deltas of merged results are computed from their wins
+            "rating_deltas": [round(delta, 3) for delta in self.rating_deltas()],
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "TournamentResult":
+        """Rebuilds the statistics from to_json."""
+        return cls(
+            agent_names=data["agent_names"],
+            seed=data["seed"],
+            num_games=data["num_games"],
+            num_rounds=data["num_rounds"],
+            num_turns=data["num_turns"],
+            wins=np.array(data["wins"], dtype=np.int64),
+            seat_games=np.array(data["seat_games"], dtype=np.int64),
+            seat_wins=np.array(data["seat_wins"], dtype=np.int64),
+        )
+
+
+@dataclass
+class ShardResult:
+    """
+    This class holds the statistics of some of the shards of a tournament.
+
+    A tournament of num_games games is cut into chunks of chunk_size games, and shard i
+    of shard_count plays chunks i, i + shard_count, and so on. Since the games of a
+    chunk only depend on the seed and the chunk, the merged statistics of all shards
+    are those of the whole tournament played in one run.
+    """
+
+    result: TournamentResult
+    num_games: int
+    chunk_size: int
+    shard_count: int
+    shards: List[int]
+
+    @property
+    def complete(self) -> bool:
+        """Whether every shard of the tournament has been merged."""
+        return len(self.shards) == self.shard_count
+
+    def merge(self, other: "ShardResult"):
+        """
+        Adds the statistics of other shards of the same tournament.
+
+        Args:
+            other (ShardResult): The statistics to add.
+
+        Raises:
+            ValueError: If the shards belong to a different tournament or were
+                already merged.
+        """
+        settings = (self.result.seed, self.num_games, self.chunk_size)
+        if (other.result.seed, other.num_games, other.chunk_size) != settings:
+            raise ValueError("Cannot merge shards of different tournaments.")
+        if other.shard_count != self.shard_count:
+            raise ValueError("Cannot merge shards of different shard counts.")
+        if set(other.shards) & set(self.shards):
+            raise ValueError("Cannot merge a shard twice.")
+        self.result.merge(other.result)
+        self.shards = sorted(self.shards + other.shards)
+
+    def to_json(self) -> dict:
+        """Returns the shards as a JSON-friendly dict."""
+        return {
+            "num_games": self.num_games,
+            "chunk_size": self.chunk_size,
+            "shard_count": self.shard_count,
+            "shards": self.shards,
+            "result": self.result.to_json(),
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "ShardResult":
+        """Rebuilds the shards from to_json."""
+        return cls(
+            result=TournamentResult.from_json(data["result"]),
+            num_games=data["num_games"],
+            chunk_size=data["chunk_size"],
+            shard_count=data["shard_count"],
+            shards=list(data["shards"]),
+        )
+
+    def save(self, path: str):
+        """
+        Writes the shards to a JSON file.
+
+        Args:
+            path (str): The file to write.
+        """
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.to_json(), file, indent=1)
+
+    @classmethod
+    def load(cls, path: str) -> "ShardResult":
+        """
+        Reads shards written by save.
+
+        Args:
+            path (str): The file to read.
+
+        Returns:
+            ShardResult: The shards.
+        """
+        with open(path, encoding="utf-8") as file:
+            return cls.from_json(json.load(file))
+
+
+def merge_shards(paths: Sequence[str]) -> ShardResult:
+    """
+    Merges shard files of one tournament.
+
+    The merged statistics do not depend on the order of the files.
+
+    Args:
+        paths (Sequence[str]): The files written by ShardResult.save.
+
+    Returns:
+        ShardResult: The statistics of all shards in the files.
+
+    Raises:
+        ValueError: If there are no files, or their shards cannot be merged.
+    """
+    shards = sorted(
+        (ShardResult.load(path) for path in paths), key=lambda shard: shard.shards
+    )
+    if not shards:
+        raise ValueError("No shard files to merge.")
+    merged = shards[0]
+    for shard in shards[1:]:
+        merged.merge(shard)
+    return merged
+
+
+def game_seed(seed: int, game_index: int) -> int:
+    """
+    Returns the seed of one game of a tournament.
+
+    Args:
+        seed (int): The tournament seed.
+        game_index (int): The index of the game in the tournament.
+
+    Returns:
+        int: A 32 bit seed for the game.
+    """
+    sequence = np.random.SeedSequence(seed, spawn_key=(game_index,))
+    return int(sequence.generate_state(1)[0])
+
+
+def agent_name(factory: Callable) -> str:
+    """Returns a readable name for an agent factory."""
+    return getattr(factory, "__name__", type(factory).__name__)
+
+
+def load_agent(spec: str) -> Callable:
+    """
+    Resolves an agent factory from its name.
+
+    Args:
+        spec (str): The name of a class in call_my_bluff.agents or "module:Class".
+
+    Returns:
+        Callable: The agent factory.
+
+    Raises:
+        ValueError: If the agent cannot be found.
+    """
+    if ":" in spec:
+        module_name, class_name = spec.split(":", 1)
+        module = importlib.import_module(module_name)
+    else:
+        module, class_name = bundled_agents, spec
+    try:
+        return getattr(module, class_name)
+    except AttributeError as error:
+        raise ValueError(f"Unknown agent {spec}.") from error
+
+
+def play_game(
+    agents: Sequence,
+    seed: Optional[int] = None,
+    recorder: Optional[replay.ReplayWriter] = None,
+) -> GameResult:
+    """
+    Plays one game between the agents, with agent i as player i.
+
+    Args:
+        agents (Sequence): The agents, each with policy and round_results methods.
+        seed (int, optional): Seed for the game and for the global NumPy random state
+            used by the agents.
+        recorder (ReplayWriter, optional): Records the game. Without a seed, the game
+            is seeded at random so that it can be replayed.
+
+    Returns:
+        GameResult: The outcome of the game.
+    """
+    if seed is not None:
+        np.random.seed(seed)
+    profiler = instrument.active_profiler()
+    if profiler is None:
+        take_turn, end_round = _take_turn, _end_round
+    else:
+        timer = _GameTimer(profiler, agents)
+        take_turn, end_round = timer.take_turn, timer.end_round
+    state = _initialize_game(len(agents), seed, recorder)
+    turn_order = list(state.turn_order)
+    num_rounds = 0
+    num_turns = 0
+    while not game.game_over(state):
+        while not game.round_over(state):
+            state = take_turn(state, agents)
+            num_turns += 1
+
+        if recorder is not None:
+            recorder.record_round(state)
+        state = end_round(state, agents)
+        num_rounds += 1
+    if profiler is not None:
+        profiler.add_game(num_rounds, num_turns)
+    return GameResult(
+        winner=state.player_curr,
+        turn_order=turn_order,
+        num_rounds=num_rounds,
+        num_turns=num_turns,
+    )
+
+
+def _take_turn(state: game.State, agents: Sequence) -> game.State:
+    observation = game.player_observation(state)
+    action = agents[state.player_curr].policy(observation)
+    return game.player_action(state, action)
+
+
+def _end_round(state: game.State, agents: Sequence) -> game.State:
+    bundled_agents.share_round_results(agents, state)
+    return game.new_round(state)
+
+
+class _GameTimer:
+    # The steps of play_game with every phase timed and reported to a profiler, only
+    # used when instrumentation is on so that plain games never read the clock
+
+    def __init__(self, profiler: instrument.Profiler, agents: Sequence):
+        self.profiler = profiler
+        self.names = [type(agent).__name__ for agent in agents]
+
+    def take_turn(self, state: game.State, agents: Sequence) -> game.State:
+        clock = time.perf_counter
+        start = clock()
+        observation = game.player_observation(state)
+        observed = clock()
+        action = agents[state.player_curr].policy(observation)
+        decided = clock()
+        state = game.player_action(state, action)
+        self.profiler.add_turn(
+            self.names[observation.player],
+            action,
+            observed - start,
+            decided - observed,
+            clock() - decided,
+        )
+        return state
+
+    def end_round(self, state: game.State, agents: Sequence) -> game.State:
+        clock = time.perf_counter
+        start = clock()
+        bundled_agents.share_round_results(agents, state)
+        shared = clock()
+        state = game.new_round(state)
+        self.profiler.add_round(shared - start, clock() - shared)
+        return state
+
+
+def _initialize_game(
+    num_players: int, seed: Optional[int], recorder: Optional[replay.ReplayWriter]
+) -> game.State:
+    if recorder is None:
+        return game.initialize_game(num_players, seed=seed)
+    if seed is None:
+        seed = int(np.random.SeedSequence().generate_state(1)[0])
+    state = game.initialize_game(num_players, seed=seed)
+    recorder.start_game(state, seed)
+    return state
+
+
+def play_games(
+    agent_factories: Sequence[Callable], seed: int, start: int, stop: int
+) -> TournamentResult:
+    """
+    Plays the games of a tournament from index start up to stop with one lineup.
+
+    Args:
+        agent_factories (Sequence[Callable]): Callables that build the agents.
+        seed (int): The tournament seed.
+        start (int): The index of the first game.
+        stop (int): The index after the last game.
+
+    Returns:
+        TournamentResult: The statistics of the games.
+    """
+    agents = [factory() for factory in agent_factories]
+    result = TournamentResult(
+        agent_names=[agent_name(factory) for factory in agent_factories], seed=seed
+    )
+    for game_index in range(start, stop):
+        result.add_game(play_game(agents, game_seed(seed, game_index)))
+    return result
+
+
+def _play_chunk_profiled(
+    agent_factories: Sequence[Callable], seed: int, start: int, stop: int
+) -> Tuple[TournamentResult, dict]:
+    # Forked workers inherit a copy of the parent's profiler, so start from an empty one
+    instrument.disable()
+    profiler = instrument.enable()
+    result = play_games(agent_factories, seed, start, stop)
+    return result, profiler.snapshot()
+
+
+def run_tournament(
+    agent_factories: Sequence[Callable],
+    num_games: int,
+    num_workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    seed: Optional[int] = None,
+    progress: bool = False,
+    shard_index: int = 0,
+    shard_count: int = 1,
+) -> TournamentResult:
+    """
+    Plays games between a lineup of agents, spread over a process pool.
+
+    Games are played in chunks of chunk_size, and each chunk builds a fresh lineup from
+    the factories. The result only depends on the seed and chunk_size. If
+    instrumentation is on, the timings of games played in worker processes are merged
+    into the active profiler. With more than one shard only the chunks of one shard
+    are played, see ShardResult.
+
+    Args:
+        agent_factories (Sequence[Callable]): Picklable callables that build the agents.
+        num_games (int): The number of games to play.
+        num_workers (int, optional): The number of processes, os.cpu_count() if None.
+            With one worker the games are played in this process.
+        chunk_size (int): The number of games handed to a worker at once.
+        seed (int, optional): The tournament seed, drawn at random if None.
+        progress (bool): Show a progress bar.
+        shard_index (int): The shard to play.
+        shard_count (int): The number of shards the tournament is split into.
+
+    Returns:
+        TournamentResult: The merged statistics of all games played.
+
+    Raises:
+        ValueError: If the shard index is not below the shard count.
+    """
+    if not 0 <= shard_index < shard_count:
+        raise ValueError("Shard index must be between 0 and the shard count.")
+    if seed is None:
+        seed = int(np.random.SeedSequence().generate_state(1)[0])
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    result = TournamentResult(
+        agent_names=[agent_name(factory) for factory in agent_factories], seed=seed
+    )
+    chunks = [
+        (start, min(start + chunk_size, num_games))
+        for start in range(0, num_games, chunk_size)
+    ][shard_index::shard_count]
+    bar = tqdm(total=sum(stop - start for start, stop in chunks), disable=not progress)
+
+    if num_workers == 1:
+        random_state = np.random.get_state()
+        try:
+            for start, stop in chunks:
+                result.merge(play_games(agent_factories, seed, start, stop))
+                bar.update(stop - start)
+        finally:
+            np.random.set_state(random_state)
+    else:
+        profiler = instrument.active_profiler()
+        play_chunk = play_games if profiler is None else _play_chunk_profiled
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            futures = [
+                executor.submit(play_chunk, agent_factories, seed, start, stop)
+                for start, stop in chunks
+            ]
+            for future in as_completed(futures):
+                chunk_result = future.result()
+                if profiler is not None:
+                    chunk_result, snapshot = chunk_result
+                    profiler.merge(snapshot)
+                result.merge(chunk_result)
+                bar.update(chunk_result.num_games)
+    bar.close()
+    return result
+
+
+def format_result(result: TournamentResult) -> str:
+    """
+    Returns a report of the win percentages, per-seat win percentages and rating
+    deltas of a tournament.
+
+    The report only depends on the statistics, so a tournament played in shards and
+    merged gives the same report as one played in one run.
+
+    Args:
+        result (TournamentResult): The tournament statistics.
+
+    Returns:
+        str: The report, one line per row.
+    """
+    lines = [f"Win percentages after {result.num_games} games (seed {result.seed}):"]
+    for i, name in enumerate(result.agent_names):
+        lines.append(f"{name}: {result.wins[i] / max(result.num_games, 1)}")
+    lines.append("Win percentages by seat:")
+    seat_rates = result.seat_wins / np.maximum(result.seat_games, 1)
+    for i, name in enumerate(result.agent_names):
+        rates = ", ".join(f"{rate:.3f}" for rate in seat_rates[i])
+        lines.append(f"{name}: [{rates}]")
+    lines.append("Elo rating relative to the lineup average:")
+    for name, delta in zip(result.agent_names, result.rating_deltas()):
+        lines.append(f"{name}: {delta:+.1f}")
+    return "\n".join(lines)
+
+
+def print_result(result: TournamentResult):
+    """
+    Prints the report of a tournament, see format_result.
+
+    Args:
+        result (TournamentResult): The tournament statistics.
+    """
+    print(format_result(result))
+
+
+def main(argv: Optional[List[str]] = None):
+    """Runs a tournament from the command line."""
+    parser = argparse.ArgumentParser(
+        prog="python -m call_my_bluff.tournament", description=__doc__.split("\n")[1]
+    )
+    parser.add_argument(
+        "agents", nargs="+", help="Agent class names or module:Class specs."
+    )
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="Time the game loop and write the snapshot to this JSON file at exit.",
+    )
+    parser.add_argument("--shard-index", type=int, default=0)
+    parser.add_argument(
+        "--shard-count",
+        type=int,
+        default=1,
+        help="Only play one of this many shards, which needs a --seed.",
+    )
+    parser.add_argument(
+        "--output",
+        metavar="FILE",
+        help="Write the result to this JSON file, to merge with other shards.",
+    )
+    args = parser.parse_args(argv)
+    if not 0 <= args.shard_index < args.shard_count:
+        parser.error("--shard-index must be between 0 and --shard-count.")
+    if args.shard_count > 1 and args.seed is None:
+        parser.error("--seed is required to split a tournament into shards.")
+    if args.profile:
+        instrument.dump_at_exit(args.profile)
+
+    agent_factories = [load_agent(spec) for spec in args.agents]
+    result = run_tournament(
+        agent_factories,
+        args.games,
+        num_workers=args.workers,
+        chunk_size=args.chunk_size,
+        seed=args.seed,
+        progress=True,
+        shard_index=args.shard_index,
+        shard_count=args.shard_count,
+    )
+    if args.output:
+        ShardResult(
+            result=result,
+            num_games=args.games,
+            chunk_size=args.chunk_size,
+            shard_count=args.shard_count,
+            shards=[args.shard_index],
+        ).save(args.output)
+    print_result(result)
+
+
+if __name__ == "__main__":
+    main()
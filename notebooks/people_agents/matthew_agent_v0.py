@@ -9,6 +9,9 @@ class MatthewAgentV0:
     This is an agent that does dumb stuff
     """
 
+    # round_results does nothing, so the game loop may skip building the result
+    ignores_round_results = True
+
     def __init__(self):
         pass
 
@@ -37,12 +40,29 @@ class MatthewAgentV0:
 
         return action
 
-    def round_results(self, state: cmb.game.State):
+    def policy_batch(self, observations: cmb.batched.ObservationBatch):
+        """
+        Play a turn in many games, making the same decisions as policy.
+
+        Args:
+            observations (ObservationBatch): The observations.
+
+        Returns:
+            actions (ActionBatch): The actions to take.
+        """
+        bet = observations.bet
+        is_bet = bet != cmb.game.MAX_BET_INDEX
+        actions = cmb.batched.ActionBatch.empty(len(observations))
+        actions.action_type[is_bet] = cmb.game.ActionType.BET.value
+        actions.bet[is_bet] = bet[is_bet] + 1
+        return actions
+
+    def round_results(self, result: cmb.game.RoundResult):
         """
         Update the agent's internal state based on the results of the round.
 
         Args:
-            state (State): The state of the game at the end of the round.
+            result (RoundResult): The outcome of the round.
         """
         # pylint: disable=unnecessary-pass
         pass
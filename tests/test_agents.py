@@ -0,0 +1,64 @@
+"""
+This module contains tests for the call_my_bluff.agents module.
+"""
+import os
+import sys
+import unittest
+
+import numpy as np
+
+import call_my_bluff as cmb
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "notebooks")
+)
+# pylint: disable=wrong-import-position
+from people_agents.matthew_agent_v0 import MatthewAgentV0
+
+
+def random_observations(num_observations, num_players, rng):
+    # Observations from random points of random games, with locked dice and lost dice
+    observations = []
+    while len(observations) < num_observations:
+        state = cmb.game.initialize_game(num_players, seed=int(rng.integers(1 << 32)))
+        for player in range(num_players):
+            num_dice = int(rng.integers(1, cmb.game.NUM_DICE + 1))
+            state.num_dice[player] = num_dice
+            state.dice[player] = state.dice[player][:num_dice]
+            state.dice_locked[player] = (rng.random(num_dice) < 0.3).tolist()
+        bet_index = int(rng.integers(cmb.game.NO_BET_INDEX, cmb.game.MAX_BET_INDEX + 1))
+        state.bet = cmb.game.Bet(index=bet_index)
+        observations.append(cmb.game.player_observation(state))
+    return observations
+
+
+# no class or method docstrings in tests
+# pylint: disable=missing-class-docstring, missing-function-docstring
+class TestAgents(unittest.TestCase):
+    def test_max_agent_caps_bets_at_large_tables(self):
+        # Ensure that MaxAgent never bets past MAX_BET_INDEX
+        state = cmb.game.initialize_game(12, seed=0)
+        state.dice[state.player_curr] = [5, 5, 5, 5, 5]
+        action = cmb.agents.MaxAgent().policy(cmb.game.player_observation(state))
+        self.assertEqual(action.type, cmb.game.ActionType.BET)
+        self.assertLessEqual(action.bet.index, cmb.game.MAX_BET_INDEX)
+
+    def test_policy_batch_matches_policy(self):
+        rng = np.random.default_rng(0)
+        for num_players in (2, 3, 6):
+            observations = random_observations(300, num_players, rng)
+            batch = cmb.batched.ObservationBatch.from_observations(observations)
+            for agent in (
+                cmb.agents.SimpleAgent(),
+                cmb.agents.MaxAgent(),
+                MatthewAgentV0(),
+            ):
+                np.random.seed(num_players)
+                expected = [agent.policy(observation) for observation in observations]
+                np.random.seed(num_players)
+                actions = agent.policy_batch(batch)
+                for row, observation in enumerate(observations):
+                    num_dice = observation.num_dice[observation.player]
+                    self.assertEqual(
+                        actions.action(row, num_dice), expected[row], (agent, row)
+                    )
@@ -0,0 +1,234 @@
+"""
+This module contains tests for the call_my_bluff.batched module.
+"""
+import unittest
+
+import numpy as np
+
+import call_my_bluff as cmb
+
+
+def random_action(state, rng):
+    # Pick a legal action for the current player of a scalar state
+    if state.bet.index != cmb.game.NO_BET_INDEX and (
+        state.bet.index == cmb.game.MAX_BET_INDEX or rng.random() < 0.3
+    ):
+        return cmb.game.Action(type=cmb.game.ActionType.CALL)
+    bet = cmb.game.Bet(
+        index=int(rng.integers(state.bet.index + 1, state.bet.index + 4))
+    )
+    if bet.index > cmb.game.MAX_BET_INDEX:
+        bet = cmb.game.Bet(index=cmb.game.MAX_BET_INDEX)
+    unlocked = [
+        i for i, locked in enumerate(state.dice_locked[state.player_curr]) if not locked
+    ]
+    if unlocked and rng.random() < 0.3:
+        dice_to_lock = [False] * len(state.dice_locked[state.player_curr])
+        dice_to_lock[int(rng.choice(unlocked))] = True
+        return cmb.game.Action(
+            type=cmb.game.ActionType.REROLL_BET, bet=bet, dice_to_lock=dice_to_lock
+        )
+    return cmb.game.Action(type=cmb.game.ActionType.BET, bet=bet)
+
+
+# no class or method docstrings in tests
+# pylint: disable=missing-class-docstring, missing-function-docstring
+class TestBatchedGame(unittest.TestCase):
+    def test_reset_starts_every_game(self):
+        batch = cmb.batched.BatchedGame(8, 3, seed=0)
+        self.assertTrue(np.all(batch.num_dice == cmb.game.NUM_DICE))
+        self.assertTrue(np.all(batch.alive))
+        self.assertTrue(np.all(batch.bet == cmb.game.NO_BET_INDEX))
+        self.assertTrue(np.all(batch.player_curr == batch.turn_order[:, 0]))
+        self.assertTrue(np.all((batch.dice >= 0) & (batch.dice < 6)))
+
+    def test_same_seed_same_games(self):
+        first = cmb.batched.BatchedGame(4, 2, seed=7)
+        second = cmb.batched.BatchedGame(4, 2, seed=7)
+        self.assertTrue(np.array_equal(first.dice, second.dice))
+        self.assertTrue(np.array_equal(first.turn_order, second.turn_order))
+
+    def test_invalid_call_raises(self):
+        batch = cmb.batched.BatchedGame(2, 2, seed=0)
+        with self.assertRaises(ValueError):
+            batch.step(np.full(2, cmb.game.ActionType.CALL.value))
+
+    def test_lower_bet_raises(self):
+        batch = cmb.batched.BatchedGame(2, 2, seed=0)
+        batch.step(np.full(2, cmb.game.ActionType.BET.value), np.array([5, 5]))
+        with self.assertRaises(ValueError):
+            batch.step(np.full(2, cmb.game.ActionType.BET.value), np.array([6, 5]))
+
+    def test_lock_already_locked_raises(self):
+        batch = cmb.batched.BatchedGame(1, 2, seed=0)
+        batch.dice_locked[0, batch.player_curr[0], 0] = True
+        dice_to_lock = np.zeros((1, cmb.game.NUM_DICE), dtype=bool)
+        dice_to_lock[0, 0] = True
+        with self.assertRaises(ValueError):
+            batch.step(
+                np.array([cmb.game.ActionType.REROLL_BET.value]),
+                np.array([0]),
+                dice_to_lock,
+            )
+
+    def test_state_round_trip(self):
+        state = cmb.game.initialize_game(4)
+        state.num_dice[2] = 0
+        state.turn_order = [player for player in state.turn_order if player != 2]
+        state.dice[2] = []
+        state.dice_locked[2] = []
+        batch = cmb.batched.BatchedGame(1, 4, seed=0)
+        batch.load_state(0, state)
+        copy = batch.to_state(0)
+        self.assertEqual(copy.turn_order, state.turn_order)
+        self.assertEqual(copy.num_dice, state.num_dice)
+        self.assertEqual(copy.dice, state.dice)
+        self.assertEqual(copy.player_curr, state.player_curr)
+
+    def test_to_state_rolls_from_the_batch_seed(self):
+        states = [cmb.batched.BatchedGame(2, 3, seed=5).to_state(1) for _ in range(2)]
+        states = [cmb.game.new_round(state) for state in states]
+        self.assertEqual(states[0].dice, states[1].dice)
+
+    def test_legal_actions_match_scalar(self):
+        rng = np.random.default_rng(1)
+        batch = cmb.batched.BatchedGame(6, 3, seed=1)
+        states = []
+        for index in range(batch.num_games):
+            state = cmb.game.initialize_game(3, seed=index)
+            for _ in range(index):
+                state = cmb.game.player_action(state, random_action(state, rng))
+                if cmb.game.round_over(state):
+                    state = cmb.game.new_round(state)
+            batch.load_state(index, state)
+            states.append(state)
+        masks = batch.legal_actions()
+        for index, state in enumerate(states):
+            legal = cmb.game.legal_actions(state)
+            self.assertTrue(np.array_equal(masks.bets[index], legal.bets))
+            self.assertEqual(masks.can_call[index], legal.can_call)
+            self.assertTrue(np.array_equal(masks.lock_masks[index], legal.lock_masks))
+
+    def test_observation_batch_matches_observations(self):
+        rng = np.random.default_rng(2)
+        batch = cmb.batched.BatchedGame(8, 3, seed=2)
+        for _ in range(5):
+            actions = cmb.batched.ActionBatch.empty(batch.num_games)
+            for index in range(batch.num_games):
+                state = batch.to_state(index)
+                actions.set(index, random_action(state, rng))
+            batch.step(actions.action_type, actions.bet, actions.dice_to_lock)
+        observations = [batch.observation(index) for index in range(batch.num_games)]
+        expected = cmb.batched.ObservationBatch.from_observations(observations)
+        observed = batch.observation_batch()
+        for name in vars(expected):
+            self.assertTrue(
+                np.array_equal(getattr(observed, name), getattr(expected, name)), name
+            )
+
+        games = np.array([1, 4])
+        actions = cmb.batched.policy_batch(cmb.agents.MaxAgent(), batch, games)
+        fallback = cmb.batched.policy_batch(
+            cmb.search.SearchAgent(iterations=5, seed=0), batch, games
+        )
+        self.assertEqual(len(actions), 2)
+        self.assertEqual(len(fallback), 2)
+
+    def test_matches_scalar_rules(self):
+        # Apply the same actions to scalar games and to the batched engine
+        rng = np.random.default_rng(0)
+        batch = cmb.batched.BatchedGame(1, 3, seed=1)
+        for _ in range(20):
+            state = cmb.game.initialize_game(3)
+            while not cmb.game.game_over(state):
+                while not cmb.game.round_over(state):
+                    batch.load_state(0, state)
+                    action = random_action(state, rng)
+                    dice_to_lock = np.zeros((1, cmb.game.NUM_DICE), dtype=bool)
+                    if action.dice_to_lock is not None:
+                        dice_to_lock[
+                            0, : len(action.dice_to_lock)
+                        ] = action.dice_to_lock
+                    bet = (
+                        cmb.game.NO_BET_INDEX
+                        if action.bet is None
+                        else action.bet.index
+                    )
+                    result = batch.step(
+                        np.array([action.type.value]), np.array([bet]), dice_to_lock
+                    )
+                    state = cmb.game.player_action(state, action)
+                    self.assertEqual(
+                        bool(result.round_over[0]), cmb.game.round_over(state)
+                    )
+                    if cmb.game.round_over(state):
+                        self.assertEqual(
+                            (
+                                int(result.loser[0]),
+                                int(result.dice_lost[0]),
+                                int(result.actual_num_dice[0]),
+                                int(result.dice_value[0]),
+                            ),
+                            state.action_log[-1].result,
+                        )
+                        self.assertEqual(
+                            bool(result.game_over[0]), cmb.game.game_over(state)
+                        )
+                        if result.game_over[0]:
+                            self.assertEqual(int(result.winner[0]), state.player_curr)
+                            continue
+                    copy = batch.to_state(0)
+                    self.assertEqual(copy.num_dice, state.num_dice)
+                    self.assertEqual(copy.player_curr, state.player_curr)
+                    self.assertEqual(copy.turn_order, state.turn_order)
+                    if not cmb.game.round_over(state):
+                        self.assertEqual(copy.bet.index, state.bet.index)
+                        self.assertEqual(copy.dice_locked, state.dice_locked)
+                state = cmb.game.new_round(state)
+
+    def test_games_finish_and_reset(self):
+        batch = cmb.batched.BatchedGame(16, 2, seed=3)
+        finished = 0
+        for _ in range(2000):
+            calls = (batch.bet != cmb.game.NO_BET_INDEX) & (
+                (batch.bet == cmb.game.MAX_BET_INDEX) | (batch.bet >= 4)
+            )
+            action_type = np.where(
+                calls, cmb.game.ActionType.CALL.value, cmb.game.ActionType.BET.value
+            )
+            result = batch.step(action_type, batch.bet + 1)
+            finished += int(result.game_over.sum())
+            winners = result.winner[result.game_over]
+            self.assertTrue(np.all((winners >= 0) & (winners < 2)))
+        self.assertGreater(finished, 0)
+        self.assertTrue(np.all(batch.alive.sum(axis=1) >= 2))
+
+    def test_history_rebuilds_action_log(self):
+        batch = cmb.batched.BatchedGame(1, 3, seed=0, history=2)
+        dice_to_lock = np.zeros((1, cmb.game.NUM_DICE), dtype=bool)
+        dice_to_lock[0, 1] = True
+        players = []
+        for bet in range(2):
+            players.append(int(batch.player_curr[0]))
+            batch.step(np.array([cmb.game.ActionType.BET.value]), np.array([bet]))
+        players.append(int(batch.player_curr[0]))
+        batch.step(
+            np.array([cmb.game.ActionType.REROLL_BET.value]),
+            np.array([2]),
+            dice_to_lock,
+        )
+        action_log = batch.to_state(0).action_log
+        self.assertEqual([action.bet.index for action in action_log], [1, 2])
+        self.assertEqual([action.player for action in action_log], players[1:])
+        self.assertEqual(action_log[-1].dice_to_lock[:2], (False, True))
+
+    def test_inactive_games_are_untouched(self):
+        batch = cmb.batched.BatchedGame(2, 2, seed=0)
+        before = batch.to_state(1)
+        batch.step(
+            np.full(2, cmb.game.ActionType.BET.value),
+            np.array([3, 3]),
+            active=np.array([True, False]),
+        )
+        self.assertEqual(batch.bet.tolist(), [3, cmb.game.NO_BET_INDEX])
+        self.assertEqual(batch.to_state(1).player_curr, before.player_curr)
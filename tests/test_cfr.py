@@ -0,0 +1,91 @@
+"""
+This module contains tests for the call_my_bluff.cfr module.
+"""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import call_my_bluff as cmb
+from call_my_bluff import cfr
+from call_my_bluff import tournament
+
+
+def one_die_state(dice):
+    state = cmb.game.initialize_game(2, seed=0)
+    state.num_dice = [1, 1]
+    state.dice = [[dice[0]], [dice[1]]]
+    state.dice_locked = [[False], [False]]
+    return state
+
+
+# no class or method docstrings in tests
+# pylint: disable=missing-class-docstring, missing-function-docstring
+class TestCFR(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_hands(self):
+        hand_list, probabilities = cfr.hands(2)
+        self.assertEqual(len(hand_list), 21)
+        self.assertAlmostEqual(probabilities.sum(), 1)
+        self.assertAlmostEqual(probabilities[hand_list.index((0, 1))], 2 / 36)
+
+    def test_infoset_keys_are_compact(self):
+        solver = cfr.CFRSolver(num_dice=1, max_bet=3)
+        keys = {
+            solver.infoset_key(hand, history)
+            for hand in solver.hands
+            for history in range(1 << solver.num_bets)
+        }
+        self.assertEqual(keys, set(range(solver.num_infosets)))
+
+    def test_exploitability_goes_to_zero(self):
+        solver = cfr.CFRSolver(num_dice=1, max_bet=4)
+        start = solver.exploitability()
+        solver.iterate(200)
+        self.assertGreater(start, 0.1)
+        self.assertLess(solver.exploitability(), 1e-3)
+        stats = solver.stats()
+        self.assertEqual(stats["iterations"], 200)
+        self.assertEqual(stats["memory_bytes"], 2 * solver.regrets.nbytes)
+
+    def test_checkpoint_resumes(self):
+        path = os.path.join(self.directory, "checkpoint.npz")
+        solver = cfr.CFRSolver(num_dice=1, max_bet=3)
+        solver.iterate(10)
+        solver.save(path)
+        solver.iterate(5)
+        resumed = cfr.CFRSolver.load(path)
+        resumed.iterate(5)
+        self.assertEqual(resumed.iterations, 15)
+        self.assertTrue(np.allclose(resumed.strategy_sum, solver.strategy_sum))
+
+    def test_lookup_agent_follows_table(self):
+        solver = cfr.CFRSolver(num_dice=1, max_bet=5)
+        solver.iterate(50)
+        path = os.path.join(self.directory, "policy.npz")
+        solver.policy_table().save(path)
+        table = cfr.PolicyTable.load(path)
+        agent = cfr.LookupAgent(table, seed=0)
+
+        state = one_die_state([2, 5])
+        hand = table.hand_codes[state.dice[state.player_curr][0]]
+        for _ in range(20):
+            action = agent.policy(cmb.game.player_observation(state))
+            self.assertEqual(action.type, cmb.game.ActionType.BET)
+            self.assertGreater(table.probabilities[hand, 0, action.bet.index + 1], 0)
+
+        state = cmb.game.player_action(state, action)
+        action = agent.policy(cmb.game.player_observation(state))
+        # raises ValueError if the action is illegal
+        cmb.game.player_action(state, action)
+
+    def test_lookup_agent_falls_back_outside_table(self):
+        table = cfr.CFRSolver(num_dice=1, max_bet=2).policy_table()
+        lineup = [cfr.LookupAgent(table, seed=0), cmb.agents.MaxAgent()]
+        result = tournament.play_game(lineup, seed=0)
+        self.assertIn(result.winner, [0, 1])
@@ -0,0 +1,102 @@
+"""
+This module contains tests for the call_my_bluff.env module.
+"""
+import unittest
+
+import numpy as np
+
+import call_my_bluff as cmb
+
+
+def random_legal_actions(legal, rng):
+    # Prefer plain bets and calls so that games finish quickly
+    actions = []
+    for row in legal:
+        choices = np.flatnonzero(row[: cmb.env.NUM_BETS])
+        if row[cmb.env.CALL_ACTION] and (len(choices) == 0 or rng.random() < 0.5):
+            actions.append(cmb.env.CALL_ACTION)
+        elif rng.random() < 0.2 and row[cmb.env.NUM_BETS :].any():
+            actions.append(rng.choice(np.flatnonzero(row[: cmb.env.CALL_ACTION])))
+        else:
+            actions.append(choices[0])
+    return np.array(actions)
+
+
+# no class or method docstrings in tests
+# pylint: disable=missing-class-docstring, missing-function-docstring
+class TestVecEnv(unittest.TestCase):
+    def test_reset(self):
+        env = cmb.env.VecEnv(6, [cmb.agents.MaxAgent, cmb.agents.SimpleAgent], seed=0)
+        observations, legal = env.reset()
+        self.assertEqual(observations.shape, (6, env.observation_size))
+        self.assertEqual(legal.shape, (6, cmb.env.NUM_ACTIONS))
+        self.assertTrue(np.all(env.batch.player_curr == cmb.env.LEARNER))
+
+    def test_legal_actions(self):
+        env = cmb.env.VecEnv(1, [cmb.agents.MaxAgent], seed=0)
+        env.batch.bet[:] = 10
+        env.batch.dice_locked[0, cmb.env.LEARNER] = [True, False, False, False, False]
+        legal = env.legal_actions()[0]
+        self.assertTrue(legal[cmb.env.CALL_ACTION])
+        self.assertFalse(legal[10])
+        self.assertTrue(legal[11])
+        self.assertFalse(legal[1 * cmb.env.NUM_BETS + 11])
+        self.assertTrue(legal[2 * cmb.env.NUM_BETS + 11])
+        self.assertTrue(legal[30 * cmb.env.NUM_BETS + 11])
+        self.assertFalse(legal[31 * cmb.env.NUM_BETS + 11])
+
+    def test_illegal_action_raises(self):
+        env = cmb.env.VecEnv(2, [cmb.agents.MaxAgent], seed=0)
+        env.reset()
+        env.batch.bet[:] = cmb.game.NO_BET_INDEX
+        with self.assertRaises(ValueError):
+            env.step(np.full(2, cmb.env.CALL_ACTION))
+        with self.assertRaises(ValueError):
+            env.step(np.full(2, cmb.env.NUM_ACTIONS))
+
+    def test_episodes_finish(self):
+        rng = np.random.default_rng(0)
+        env = cmb.env.VecEnv(8, [cmb.agents.SimpleAgent, cmb.agents.MaxAgent], seed=1)
+        _, legal = env.reset()
+        episodes = 0
+        for _ in range(300):
+            observations, rewards, dones, legal = env.step(
+                random_legal_actions(legal, rng)
+            )
+            self.assertEqual(observations.shape, (8, env.observation_size))
+            self.assertTrue(np.all(np.isin(rewards, [-1, 0, 1])))
+            self.assertTrue(np.all(dones == (rewards != 0)))
+            self.assertTrue(np.all(env.batch.player_curr == cmb.env.LEARNER))
+            self.assertTrue(np.all(env.batch.alive[:, cmb.env.LEARNER]))
+            episodes += int(dones.sum())
+        self.assertGreater(episodes, 0)
+
+    def test_runs_are_reproducible_from_the_seed(self):
+        runs = []
+        for run in range(2):
+            # the opponents do not depend on the global random state
+            np.random.seed(run)
+            rng = np.random.default_rng(0)
+            env = cmb.env.VecEnv(
+                4, [cmb.agents.SimpleAgent, cmb.agents.SimpleAgent], seed=3
+            )
+            observations, legal = env.reset()
+            steps = [observations]
+            for _ in range(30):
+                observations, rewards, dones, legal = env.step(
+                    random_legal_actions(legal, rng)
+                )
+                steps += [observations, rewards, dones]
+            runs.append(steps)
+        for first, second in zip(*runs):
+            self.assertTrue(np.array_equal(first, second))
+
+    def test_observations_match_encoder(self):
+        rng = np.random.default_rng(1)
+        env = cmb.env.VecEnv(4, [cmb.agents.MaxAgent, cmb.agents.SimpleAgent], seed=2)
+        _, legal = env.reset()
+        for _ in range(5):
+            observations, _, _, legal = env.step(random_legal_actions(legal, rng))
+        for index in range(4):
+            expected = env.encoder.encode(env.batch.observation(index))
+            self.assertTrue(np.array_equal(observations[index], expected))
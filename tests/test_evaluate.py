@@ -0,0 +1,78 @@
+"""
+This module contains tests for the call_my_bluff.evaluate module.
+"""
+import unittest
+
+import numpy as np
+
+import call_my_bluff as cmb
+from call_my_bluff import evaluate
+from call_my_bluff import tournament
+
+
+# no class or method docstrings in tests
+# pylint: disable=missing-class-docstring, missing-function-docstring
+class TestEvaluate(unittest.TestCase):
+    def test_wilson_interval(self):
+        intervals = evaluate.wilson_interval(np.array([50, 0]), 100)
+        self.assertAlmostEqual(intervals[0, 0], 0.4038, places=4)
+        self.assertAlmostEqual(intervals[0, 1], 0.5962, places=4)
+        self.assertEqual(intervals[1, 0], 0)
+        self.assertGreater(intervals[1, 1], 0)
+        self.assertTrue(
+            np.array_equal(evaluate.wilson_interval([0, 0], 0), [[0, 1]] * 2)
+        )
+
+    def test_sprt_decides(self):
+        sprt = evaluate.SPRT(margin=0.1, alpha=0.05, beta=0.05)
+        self.assertIsNone(sprt.decide(10, 8))
+        self.assertEqual(sprt.decide(30, 10), 0)
+        self.assertEqual(sprt.decide(10, 30), 1)
+        with self.assertRaises(ValueError):
+            evaluate.SPRT(margin=0.5)
+
+    def test_sprt_stops_a_lopsided_matchup_early(self):
+        evaluation = evaluate.evaluate(
+            [cmb.agents.MaxAgent, cmb.agents.SimpleAgent],
+            max_games=1000,
+            batch_size=20,
+            precision=None,
+            sprt=evaluate.SPRT(margin=0.1),
+            seed=0,
+        )
+        self.assertEqual(evaluation.stop_reason, evaluate.STOP_SPRT)
+        self.assertEqual(evaluation.sprt_winner, 0)
+        self.assertEqual(evaluation.num_games, 20)
+
+    def test_matches_the_same_tournament(self):
+        lineup = [cmb.agents.MaxAgent, cmb.agents.SimpleAgent, cmb.agents.MaxAgent]
+        evaluation = evaluate.evaluate(
+            lineup, max_games=150, batch_size=50, precision=0.001, seed=3
+        )
+        self.assertEqual(evaluation.stop_reason, evaluate.STOP_MAX_GAMES)
+        expected = tournament.run_tournament(lineup, 150, num_workers=1, seed=3)
+        self.assertTrue(np.array_equal(evaluation.result.wins, expected.wins))
+        self.assertEqual(evaluation.intervals.shape, (3, 2))
+
+    def test_stops_at_precision(self):
+        evaluation = evaluate.evaluate(
+            [cmb.agents.MaxAgent, cmb.agents.SimpleAgent],
+            max_games=2000,
+            batch_size=100,
+            precision=0.05,
+            seed=1,
+        )
+        self.assertEqual(evaluation.stop_reason, evaluate.STOP_PRECISION)
+        self.assertLess(evaluation.num_games, 2000)
+        half_widths = np.diff(evaluation.intervals, axis=1) / 2
+        self.assertTrue(np.all(half_widths <= 0.05))
+
+    def test_sprt_needs_two_agents(self):
+        with self.assertRaises(ValueError):
+            evaluate.evaluate(
+                [cmb.agents.MaxAgent] * 3, sprt=evaluate.SPRT(), max_games=10
+            )
+
+    def test_batch_size_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            evaluate.evaluate([cmb.agents.MaxAgent] * 2, batch_size=0)
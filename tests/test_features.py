@@ -0,0 +1,96 @@
+"""
+This module contains tests for the call_my_bluff.features module.
+"""
+import unittest
+
+import numpy as np
+
+import call_my_bluff as cmb
+
+
+def play_turns(state, num_turns):
+    for index in range(num_turns):
+        state = cmb.game.player_action(
+            state,
+            cmb.game.Action(
+                type=cmb.game.ActionType.BET, bet=cmb.game.Bet(index=index)
+            ),
+        )
+    return state
+
+
+# no class or method docstrings in tests
+# pylint: disable=missing-class-docstring, missing-function-docstring
+class TestObservationEncoder(unittest.TestCase):
+    def test_encode_size(self):
+        encoder = cmb.features.ObservationEncoder(3, history=4)
+        state = cmb.game.initialize_game(3, seed=0)
+        features = encoder.encode(cmb.game.player_observation(state))
+        self.assertEqual(features.shape, (encoder.size,))
+        self.assertEqual(features.dtype, np.float32)
+
+    def test_encode_contents(self):
+        encoder = cmb.features.ObservationEncoder(2, history=2)
+        state = cmb.game.initialize_game(2, seed=0)
+        state = play_turns(state, 3)
+        observer = state.player_curr
+        other = 1 - observer
+        state.dice[observer] = [0, 1, 1, 5, 2]
+        state.dice[other] = [3, 3, 4, 4, 4]
+        state.dice_locked[other] = [True, False, True, False, False]
+        features = encoder.encode(cmb.game.player_observation(state))
+
+        self.assertEqual(features[encoder.bet_offset + 2 + 1], 1)
+        self.assertEqual(features[encoder.bet_offset : encoder.known_offset].sum(), 1)
+        own = features[encoder.known_offset : encoder.known_offset + 6]
+        self.assertEqual(own.tolist(), [1, 2, 1, 0, 0, 1])
+        others = features[encoder.known_offset + 6 : encoder.known_offset + 12]
+        self.assertEqual(others.tolist(), [0, 0, 0, 1, 1, 0])
+        unknown = features[encoder.unknown_offset : encoder.unknown_offset + 2]
+        self.assertEqual(unknown.tolist(), [0, 3])
+        self.assertEqual(features[encoder.dice_offset + 3 * 6 + 5], 1)
+
+        last = features[
+            encoder.history_offset : encoder.history_offset + encoder.action_size
+        ]
+        self.assertEqual(last[1], 1)  # a bet
+        self.assertEqual(last[3 + 1], 1)  # by the other player
+        self.assertAlmostEqual(last[-1], 2 / cmb.game.MAX_BET_INDEX)
+
+    def test_encode_batch_matches_encode(self):
+        encoder = cmb.features.ObservationEncoder(4)
+        observations = []
+        for seed in range(5):
+            state = play_turns(cmb.game.initialize_game(4, seed=seed), seed)
+            observations.append(cmb.game.player_observation(state))
+        out = np.full((8, encoder.size), 7, dtype=np.float32)
+        rows = encoder.encode_batch(observations, out)
+        self.assertEqual(rows.shape, (5, encoder.size))
+        self.assertTrue(np.shares_memory(rows, out))
+        for row, observation in zip(rows, observations):
+            self.assertTrue(np.array_equal(row, encoder.encode(observation)))
+        self.assertTrue(np.all(out[5:] == 7))
+
+    def test_encode_batch_matches_encode_with_rerolls(self):
+        encoder = cmb.features.ObservationEncoder(3, history=4)
+        rng = np.random.default_rng(0)
+        observations = []
+        state = cmb.game.initialize_game(3, seed=1)
+        while not cmb.game.game_over(state):
+            observation = cmb.game.player_observation(state)
+            observations.append(observation)
+            legal = cmb.game.legal_actions(observation)
+            bets = np.flatnonzero(legal.bets)
+            if legal.can_call and (len(bets) == 0 or rng.random() < 0.2):
+                action = cmb.game.Action(type=cmb.game.ActionType.CALL)
+            else:
+                lock_masks = np.append(0, np.flatnonzero(legal.lock_masks))
+                lock_mask = int(rng.choice(lock_masks))
+                action = legal.bet_action(int(rng.choice(bets)), lock_mask)
+            state = cmb.game.player_action(state, action)
+            if cmb.game.round_over(state):
+                state = cmb.game.new_round(state)
+        rows = encoder.encode_batch(observations)
+        for row, observation in zip(rows, observations):
+            self.assertTrue(np.array_equal(row, encoder.encode(observation)))
+        self.assertEqual(encoder.encode_batch([]).shape, (0, encoder.size))
@@ -1,8 +1,12 @@
 """
 This module contains tests for the call_my_bluff.game module.
 """
+import copy
+import pickle
 import unittest
 
+import numpy as np
+
 import call_my_bluff as cmb
 
 
@@ -93,3 +97,379 @@ class TestGame(unittest.TestCase):
         state.player_curr = 1
         observation = cmb.game.player_observation(state)
         self.assertEqual(observation.player, 1)
+
+    def test_player_observation_is_read_only(self):
+        # Ensure that the observation cannot be used to change the state
+        state = cmb.game.initialize_game(2)
+        observation = cmb.game.player_observation(state)
+        with self.assertRaises(AttributeError):
+            observation.player = 1
+        with self.assertRaises(TypeError):
+            observation.known_dice[state.player_curr][0] = 0
+        with self.assertRaises(TypeError):
+            observation.num_dice[0] = 0
+
+    def test_player_observation_action_log_view(self):
+        # Ensure that the observed action log does not see later actions
+        state = cmb.game.initialize_game(2)
+        bet = cmb.game.Bet(index=0)
+        state = cmb.game.player_action(
+            state, cmb.game.Action(type=cmb.game.ActionType.BET, bet=bet)
+        )
+        observation = cmb.game.player_observation(state)
+        state = cmb.game.player_action(
+            state,
+            cmb.game.Action(type=cmb.game.ActionType.BET, bet=cmb.game.Bet(index=1)),
+        )
+        self.assertEqual(len(observation.action_log), 1)
+        self.assertEqual(observation.action_log[-1].bet.index, 0)
+        self.assertEqual(len(observation.action_log[:]), 1)
+        with self.assertRaises(IndexError):
+            _ = observation.action_log[1]
+
+    def test_player_action_logs_a_copy(self):
+        # Ensure that changing a submitted action does not change the log
+        state = cmb.game.initialize_game(2)
+        action = cmb.game.Action(
+            type=cmb.game.ActionType.REROLL_BET,
+            bet=cmb.game.Bet(index=3),
+            dice_to_lock=[True, False, False, False, False],
+        )
+        player = state.player_curr
+        state = cmb.game.player_action(state, action)
+        action.dice_to_lock[1] = True
+        self.assertEqual(state.action_log[-1].player, player)
+        self.assertEqual(state.action_log[-1].dice_to_lock[1], False)
+        self.assertIsNone(action.player)
+
+    def test_action_log_grows_and_round_trips(self):
+        action_log = cmb.game.ActionLog(capacity=2)
+        actions = [
+            cmb.game.Action(
+                type=cmb.game.ActionType.BET, bet=cmb.game.Bet(index=0), player=1
+            ),
+            cmb.game.Action(
+                type=cmb.game.ActionType.REROLL_BET,
+                bet=cmb.game.Bet(index=4),
+                dice_to_lock=(False, True, False),
+                player=0,
+            ),
+            cmb.game.Action(type=cmb.game.ActionType.CALL, player=1),
+            cmb.game.Action(type=cmb.game.ActionType.RESULT, result=(-1, 1, 3, 5)),
+        ]
+        for action in actions:
+            action_log.append(action)
+        self.assertEqual(list(action_log), actions)
+        self.assertEqual(action_log[1:3], tuple(actions[1:3]))
+        self.assertEqual(action_log.last_type(), cmb.game.ActionType.RESULT)
+        columns = action_log.columns
+        self.assertEqual(columns.shape, (4, len(cmb.game.ACTION_LOG_COLUMNS)))
+        self.assertEqual(columns[1, cmb.game.ACTION_LOG_COLUMNS.index("lock_mask")], 2)
+        with self.assertRaises(ValueError):
+            columns[0, 0] = 1
+
+    def test_player_result_before_round_over_raises(self):
+        state = cmb.game.initialize_game(2)
+        with self.assertRaises(ValueError):
+            cmb.game.player_result(state)
+
+    def test_player_result(self):
+        # Ensure that player_result summarises the round that just ended
+        state = cmb.game.initialize_game(2)
+        state.dice = [[0, 0, 0, 0, 0], [1, 1, 1, 1, 1]]
+        bettor = state.player_curr
+        state = cmb.game.player_action(
+            state,
+            cmb.game.Action(
+                type=cmb.game.ActionType.BET,
+                bet=cmb.game.Bet(num_dice=7, dice_value=0),
+            ),
+        )
+        caller = state.player_curr
+        state = cmb.game.player_action(
+            state, cmb.game.Action(type=cmb.game.ActionType.CALL)
+        )
+        result = cmb.game.player_result(state)
+        self.assertIsInstance(result, cmb.game.RoundResult)
+        self.assertEqual(result.bettor, bettor)
+        self.assertEqual(result.caller, caller)
+        self.assertEqual(result.loser, bettor)
+        self.assertEqual(result.dice_lost, 2)
+        self.assertEqual(result.actual_num_dice, 5)
+        self.assertEqual(result.num_dice[bettor], 3)
+        self.assertEqual(len(result.action_log), 3)
+        with self.assertRaises(AttributeError):
+            result.loser = caller
+
+    def test_bets_are_interned(self):
+        # Ensure that equal bets are the same object
+        bet = cmb.game.Bet(num_dice=2, dice_value=3)
+        self.assertIs(bet, cmb.game.Bet(index=bet.index))
+        self.assertIs(
+            cmb.game.Bet(num_dice=0, dice_value=0),
+            cmb.game.Bet(index=cmb.game.NO_BET_INDEX),
+        )
+
+    def test_bet_is_immutable(self):
+        bet = cmb.game.Bet(index=10)
+        with self.assertRaises(AttributeError):
+            bet.index = 11
+        with self.assertRaises(AttributeError):
+            bet.num_dice = 3
+
+    def test_invalid_bet_raises(self):
+        with self.assertRaises(ValueError):
+            cmb.game.Bet(index=cmb.game.MAX_BET_INDEX + 1)
+        with self.assertRaises(ValueError):
+            cmb.game.Bet(num_dice=21, dice_value=0)
+        with self.assertRaises(ValueError):
+            cmb.game.Bet(num_dice=1, dice_value=6)
+
+    def test_bet_round_trip(self):
+        for index in range(cmb.game.NO_BET_INDEX, cmb.game.MAX_BET_INDEX + 1):
+            bet = cmb.game.Bet(index=index)
+            self.assertIs(
+                cmb.game.Bet(num_dice=bet.num_dice, dice_value=bet.dice_value), bet
+            )
+
+    def test_vectorized_bet_conversion(self):
+        indices = np.arange(cmb.game.NO_BET_INDEX, cmb.game.MAX_BET_INDEX + 1)
+        num_dice, dice_value = cmb.game.bet_index_to_bet(indices)
+        for index, bet_num_dice, bet_dice_value in zip(indices, num_dice, dice_value):
+            bet = cmb.game.Bet(index=int(index))
+            self.assertEqual(
+                (bet.num_dice, bet.dice_value), (bet_num_dice, bet_dice_value)
+            )
+        self.assertTrue(
+            np.array_equal(cmb.game.bet_to_bet_index(num_dice, dice_value), indices)
+        )
+        with self.assertRaises(ValueError):
+            cmb.game.bet_to_bet_index([1, 21], [0, 0])
+
+    def test_bet_survives_pickle(self):
+        bet = cmb.game.Bet(index=42)
+        self.assertIs(pickle.loads(pickle.dumps(bet)), bet)
+        self.assertIs(copy.deepcopy(bet), bet)
+
+    def test_initialize_game_seed_is_reproducible(self):
+        first = cmb.game.initialize_game(4, seed=3)
+        second = cmb.game.initialize_game(4, seed=3)
+        self.assertEqual(first.turn_order, second.turn_order)
+        self.assertEqual(first.dice, second.dice)
+        first = cmb.game.new_round(first)
+        second = cmb.game.new_round(second)
+        self.assertEqual(first.dice, second.dice)
+
+    def test_states_compare_without_their_rollers(self):
+        first = cmb.game.initialize_game(3, seed=6)
+        second = cmb.game.initialize_game(3, seed=6)
+        self.assertEqual(first, second)
+        self.assertNotIn("roller", repr(first))
+
+    def test_reroll_is_reproducible(self):
+        action = cmb.game.Action(
+            type=cmb.game.ActionType.REROLL_BET,
+            bet=cmb.game.Bet(index=0),
+            dice_to_lock=[True, False, False, False, False],
+        )
+        states = [cmb.game.initialize_game(2, seed=8) for _ in range(2)]
+        states = [cmb.game.player_action(state, action) for state in states]
+        self.assertEqual(states[0].dice, states[1].dice)
+        self.assertEqual(states[0].dice_locked, states[1].dice_locked)
+
+    def test_dice_roller_refills_buffer(self):
+        roller = cmb.game.DiceRoller(np.random.default_rng(0), buffer_size=7)
+        dice = [die for _ in range(10) for die in roller.roll(3)]
+        dice += roller.roll(20)
+        self.assertEqual(len(dice), 50)
+        self.assertTrue(all(isinstance(die, int) and 0 <= die < 6 for die in dice))
+        again = cmb.game.DiceRoller(np.random.default_rng(0), buffer_size=7)
+        self.assertEqual([die for _ in range(10) for die in again.roll(3)], dice[:30])
+
+    def test_legal_actions_match_validation(self):
+        state = cmb.game.initialize_game(3, seed=0)
+        state.bet = cmb.game.Bet(index=100)
+        state.num_dice[state.player_curr] = 4
+        state.dice[state.player_curr] = state.dice[state.player_curr][:4]
+        state.dice_locked[state.player_curr] = [True, False, True, False]
+        legal = cmb.game.legal_actions(state)
+        observation = cmb.game.player_observation(state)
+        self.assertEqual(cmb.game.legal_actions(observation).free_mask, legal.free_mask)
+        self.assertTrue(legal.can_call)
+        for bet_index in range(cmb.game.MAX_BET_INDEX + 1):
+            for lock_mask in range(1 << 4):
+                action = legal.bet_action(bet_index, lock_mask)
+                expected = legal.bets[bet_index] and (
+                    lock_mask == 0 or legal.lock_masks[lock_mask]
+                )
+                try:
+                    cmb.game._validate_action(  # pylint: disable=protected-access
+                        state, action
+                    )
+                    valid = True
+                except ValueError:
+                    valid = False
+                self.assertEqual(valid, expected, (bet_index, lock_mask))
+
+    def test_face_counts_follow_the_dice(self):
+        agents = [
+            cmb.agents.SimpleAgent(),
+            cmb.agents.MaxAgent(),
+            cmb.agents.MaxAgent(),
+        ]
+        rng = np.random.default_rng(0)
+        state = cmb.game.initialize_game(3, seed=0)
+        while not cmb.game.game_over(state):
+            if cmb.game.round_over(state):
+                state = cmb.game.new_round(state)
+            observation = cmb.game.player_observation(state)
+            action = agents[state.player_curr].policy(observation)
+            unlocked = [
+                i
+                for i, locked in enumerate(observation.player_locked_dice)
+                if not locked
+            ]
+            if (
+                action.type == cmb.game.ActionType.BET
+                and unlocked
+                and rng.random() < 0.5
+            ):
+                dice_to_lock = [False] * len(observation.player_locked_dice)
+                dice_to_lock[int(rng.choice(unlocked))] = True
+                action = cmb.game.Action(
+                    type=cmb.game.ActionType.REROLL_BET,
+                    bet=action.bet,
+                    dice_to_lock=dice_to_lock,
+                )
+            state = cmb.game.player_action(state, action)
+            for player in range(state.num_players):
+                # the engine keeps the counts in step, so they are not counted again
+                cached = state.histograms[player]
+                self.assertIs(cached.dice, state.dice[player])
+                self.assertIs(cached.dice_locked, state.dice_locked[player])
+                counts = cmb.game.face_counts(state, player)
+                self.assertIs(counts, cached)
+                fresh = cmb.game.FaceCounts(
+                    state.dice[player], state.dice_locked[player]
+                )
+                self.assertEqual(counts.locked, fresh.locked)
+                self.assertEqual(counts.unlocked, fresh.unlocked)
+                self.assertEqual(counts.num_locked, fresh.num_locked)
+
+        state = cmb.game.initialize_game(2, seed=1)
+        state.dice[0] = [5, 5, 1, 1, 1]
+        state.dice_locked[1] = [True, True, False, False, False]
+        state.player_curr = 0
+        observation = cmb.game.player_observation(state)
+        expected = [0] * 6
+        for dice_value in [5, 5, 1, 1, 1] + state.dice[1][:2]:
+            expected[dice_value] += 1
+        self.assertEqual(observation.known_counts, tuple(expected))
+
+    def test_call_counts_dice_set_mid_round(self):
+        state = cmb.game.initialize_game(2, seed=0)
+        cmb.game.player_observation(state)
+        for player in range(2):
+            cmb.game.set_dice(state, player, [1] * cmb.game.NUM_DICE)
+        state = cmb.game.player_action(
+            state,
+            cmb.game.Action(
+                type=cmb.game.ActionType.BET,
+                bet=cmb.game.Bet(num_dice=10, dice_value=1),
+            ),
+        )
+        self.assertEqual(cmb.game.player_observation(state).known_counts[1], 5)
+        state = cmb.game.player_action(
+            state, cmb.game.Action(type=cmb.game.ActionType.CALL)
+        )
+        self.assertEqual(state.action_log[-1].result, (-1, 1, 10, 1))
+
+    def test_turn_order_follows_the_links(self):
+        state = cmb.game.initialize_game(4, seed=0)
+        order = state.turn_order
+        state.turn_order.remove(order[2])
+        self.assertEqual(state.turn_order, order)
+        state.turn_order = order[:2] + order[3:]
+        self.assertEqual(state.players_alive, 3)
+        self.assertEqual(state.next_player[order[1]], order[3])
+        # pylint: disable=protected-access
+        state = cmb.game._lose_dice(state, order[0], cmb.game.NUM_DICE)
+        self.assertEqual(state.turn_order, [order[1], order[3]])
+        self.assertEqual(state.next_player[order[0]], order[0])
+
+    def test_turn_order_scales_to_large_tables(self):
+        state = cmb.game.initialize_game(300, seed=0)
+        order = list(state.turn_order)
+        for position, player in enumerate(order):
+            self.assertEqual(state.next_player[player], order[(position + 1) % 300])
+        # an exact call knocks out every player with one die except the bettor
+        bettor = state.player_curr
+        for player in range(300):
+            state.num_dice[player] = 1 if player % 2 else 2
+            state.dice[player] = [1] * state.num_dice[player]
+            state.dice_locked[player] = [False] * state.num_dice[player]
+        state.dice[bettor][0] = 0
+        state = cmb.game.player_action(
+            state,
+            cmb.game.Action(type=cmb.game.ActionType.BET, bet=cmb.game.Bet(index=0)),
+        )
+        state = cmb.game.player_action(
+            state, cmb.game.Action(type=cmb.game.ActionType.CALL)
+        )
+        self.assertEqual(state.action_log[-1].result, (-1, 1, 1, 0))
+        # knockouts only unlink players, the list is rebuilt when it is read
+        self.assertIsNone(state._turn_order)  # pylint: disable=protected-access
+        alive = [player for player in order if player == bettor or player % 2 == 0]
+        self.assertEqual(state.turn_order, alive)
+        self.assertEqual(state.players_alive, len(alive))
+        for position, player in enumerate(alive):
+            following = alive[(position + 1) % len(alive)]
+            self.assertEqual(state.next_player[player], following)
+            self.assertEqual(state.prev_player[following], player)
+
+    def test_fork_and_restore_play_out_like_the_original(self):
+        def play_out(state):
+            agent = cmb.agents.MaxAgent()
+            history = []
+            while not cmb.game.game_over(state):
+                observation = cmb.game.player_observation(state)
+                state = cmb.game.player_action(state, agent.policy(observation))
+                history.append(state.action_log.columns.tolist())
+                if cmb.game.round_over(state) and not cmb.game.game_over(state):
+                    state = cmb.game.new_round(state)
+                    history.append(copy.deepcopy(state.dice))
+            return history, state.player_curr
+
+        state = cmb.game.initialize_game(3, seed=4)
+        state.roller = cmb.game.DiceRoller(np.random.default_rng(4), buffer_size=7)
+        state = cmb.game.player_action(
+            state,
+            cmb.game.Action(
+                type=cmb.game.ActionType.REROLL_BET,
+                bet=cmb.game.Bet(index=0),
+                dice_to_lock=[True, False, False, False, False],
+            ),
+        )
+        forked = cmb.game.fork(state)
+        saved = cmb.game.snapshot(state)
+        dice = copy.deepcopy(state.dice)
+        expected = play_out(state)
+        self.assertGreater(len(expected[0]), 10)
+        self.assertEqual(play_out(forked), expected)
+        self.assertEqual(saved.dice, tuple(map(tuple, dice)))
+        self.assertEqual(play_out(cmb.game.restore(saved)), expected)
+        self.assertEqual(play_out(cmb.game.restore(saved)), expected)
+        reseeded = cmb.game.restore(saved, seed=1)
+        self.assertEqual(reseeded.dice, dice)
+        self.assertEqual(len(reseeded.action_log), 1)
+
+    def test_forked_action_logs_copy_on_append(self):
+        action_log = cmb.game.ActionLog(capacity=4)
+        bet = cmb.game.Action(type=cmb.game.ActionType.BET, bet=cmb.game.Bet(index=3))
+        action_log.append(bet, player=0)
+        forked = action_log.fork()
+        forked.append(cmb.game.Action(type=cmb.game.ActionType.CALL), player=1)
+        action_log.append(bet, player=2)
+        self.assertEqual([action.player for action in action_log], [0, 2])
+        self.assertEqual([action.player for action in forked], [0, 1])
+        self.assertEqual(forked[1].type, cmb.game.ActionType.CALL)
@@ -0,0 +1,84 @@
+"""
+This module contains tests for the call_my_bluff.instrument module.
+"""
+from unittest import mock
+import unittest
+
+import call_my_bluff as cmb
+from call_my_bluff import instrument
+from call_my_bluff import tournament
+
+
+# no class or method docstrings in tests
+# pylint: disable=missing-class-docstring, missing-function-docstring
+class TestInstrument(unittest.TestCase):
+    def setUp(self):
+        instrument.disable()
+
+    def tearDown(self):
+        instrument.disable()
+
+    def test_off_by_default(self):
+        self.assertIsNone(instrument.active_profiler())
+        self.assertIsNone(instrument.snapshot())
+
+    def test_plain_game_does_not_read_the_clock(self):
+        agents = [cmb.agents.MaxAgent(), cmb.agents.SimpleAgent()]
+        with mock.patch.object(
+            tournament.time, "perf_counter", side_effect=AssertionError
+        ):
+            result = tournament.play_game(agents, seed=4)
+        self.assertGreater(result.num_turns, 0)
+
+    def test_profiled_game_matches_plain_game(self):
+        agents = [cmb.agents.MaxAgent(), cmb.agents.SimpleAgent()]
+        plain = tournament.play_game(agents, seed=4)
+        profiler = instrument.enable()
+        profiled = tournament.play_game(agents, seed=4)
+        self.assertEqual(plain, profiled)
+
+        snapshot = profiler.snapshot()
+        self.assertEqual(snapshot["counts"]["games"], 1)
+        self.assertEqual(snapshot["counts"]["rounds"], profiled.num_rounds)
+        self.assertEqual(snapshot["counts"]["turns"], profiled.num_turns)
+        self.assertEqual(snapshot["counts"]["calls"], profiled.num_rounds)
+        self.assertEqual(snapshot["phases"]["observation"]["calls"], profiled.num_turns)
+        self.assertEqual(snapshot["phases"]["new_round"]["calls"], profiled.num_rounds)
+        agent_turns = sum(data["count"] for data in snapshot["agents"].values())
+        self.assertEqual(agent_turns, profiled.num_turns)
+        self.assertEqual(set(snapshot["agents"]), {"MaxAgent", "SimpleAgent"})
+
+    def test_histogram_percentiles(self):
+        histogram = instrument.LatencyHistogram()
+        for _ in range(99):
+            histogram.add(1e-5)
+        histogram.add(1e-2)
+        self.assertAlmostEqual(histogram.max, 1e-2)
+        self.assertGreaterEqual(histogram.percentile(0.5), 1e-5)
+        self.assertLess(histogram.percentile(0.5), 1.3e-5)
+        self.assertLess(histogram.percentile(0.99), 1.3e-5)
+        self.assertEqual(histogram.percentile(1.0), 1e-2)
+
+    def test_merge_snapshots(self):
+        first, second = instrument.Profiler(), instrument.Profiler()
+        first.add_policy("A", 1e-4)
+        second.add_policy("A", 3e-4)
+        second.add_policy("B", 2e-4)
+        second.counts["turns"] += 2
+        merged = instrument.merge_snapshots([first.snapshot(), second.snapshot()])
+        self.assertEqual(merged["agents"]["A"]["count"], 2)
+        self.assertAlmostEqual(merged["agents"]["A"]["max"], 3e-4)
+        self.assertEqual(merged["agents"]["B"]["count"], 1)
+        self.assertEqual(merged["phases"]["policy"]["calls"], 3)
+        self.assertEqual(merged["counts"]["turns"], 2)
+
+    def test_process_pool_run_is_merged(self):
+        lineup = [cmb.agents.MaxAgent, cmb.agents.SimpleAgent]
+        profiler = instrument.enable()
+        result = tournament.run_tournament(
+            lineup, 20, num_workers=2, chunk_size=5, seed=2
+        )
+        snapshot = profiler.snapshot()
+        self.assertEqual(snapshot["counts"]["games"], 20)
+        self.assertEqual(snapshot["counts"]["turns"], result.num_turns)
+        self.assertEqual(snapshot["counts"]["rounds"], result.num_rounds)
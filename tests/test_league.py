@@ -0,0 +1,74 @@
+"""
+This module contains tests for the call_my_bluff.league module.
+"""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from call_my_bluff import league
+from call_my_bluff import tournament
+
+
+def result(wins, num_games):
+    return tournament.TournamentResult(
+        agent_names=[str(player) for player in range(len(wins))],
+        seed=0,
+        num_games=num_games,
+        wins=np.array(wins),
+    )
+
+
+# no class or method docstrings in tests
+# pylint: disable=missing-class-docstring, missing-function-docstring
+class TestLeague(unittest.TestCase):
+    def test_ratings_follow_win_rates(self):
+        table = league.League(["A", "B", "C"])
+        table.record(("A", "B"), result([90, 10], 100))
+        table.record(("B", "C"), result([90, 10], 100))
+        board = table.leaderboard()
+        self.assertEqual([rating.name for rating in board], ["A", "B", "C"])
+        self.assertEqual([rating.games for rating in board], [100, 200, 100])
+        # 9 to 1 odds are about 380 Elo points
+        self.assertAlmostEqual(board[0].rating - board[1].rating, 380, delta=40)
+        self.assertLess(board[1].uncertainty, board[0].uncertainty)
+
+    def test_results_are_additive(self):
+        once = league.League(["A", "B", "C"], table_size=3)
+        once.record(("A", "B", "C"), result([50, 30, 20], 100))
+        first = league.League(["A", "B", "C"], table_size=3)
+        first.record(("A", "B", "C"), result([20, 20, 10], 50))
+        second = league.League(["A", "B", "C"], table_size=3)
+        second.record(("C", "A", "B"), result([10, 30, 10], 50))
+        first.merge(second)
+        self.assertTrue(np.array_equal(first.wins, once.wins))
+        self.assertEqual(first.leaderboard(), once.leaderboard())
+
+    def test_schedule_prefers_close_pairs(self):
+        table = league.League(["A", "B", "C", "D"])
+        table.record(("A", "B"), result([990, 10], 1000))
+        table.record(("B", "C"), result([990, 10], 1000))
+        table.record(("C", "D"), result([500, 500], 1000))
+        self.assertEqual(set(table.schedule(1)[0]), {"C", "D"})
+
+        table = league.League(["A", "B", "C", "D"], table_size=3)
+        for lineup in table.schedule(5):
+            self.assertEqual(len(set(lineup)), 3)
+
+    def test_run_batch_and_persist(self):
+        table = league.League(["MaxAgent", "SimpleAgent"], seed=1)
+        table.run_batch(num_tables=2, games_per_table=50, num_workers=1)
+        self.assertEqual(table.num_batches, 1)
+        self.assertEqual(table.leaderboard()[0].name, "MaxAgent")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "league.json")
+            table.save(path)
+            loaded = league.League.load(path)
+        self.assertEqual(loaded.leaderboard(), table.leaderboard())
+        self.assertEqual(loaded.num_batches, 1)
+        loaded.add_agent("call_my_bluff.search:SearchAgent")
+        games = {rating.name: rating.games for rating in loaded.leaderboard()}
+        self.assertEqual(games["call_my_bluff.search:SearchAgent"], 0)
+        self.assertIn("call_my_bluff.search:SearchAgent", loaded.schedule(1)[0])
@@ -0,0 +1,89 @@
+"""
+This module contains tests for the call_my_bluff.__main__ module.
+"""
+from contextlib import redirect_stdout
+from unittest import mock
+import io
+import os
+import tempfile
+import unittest
+
+import call_my_bluff as cmb
+from call_my_bluff import __main__ as cli
+from call_my_bluff import replay
+from call_my_bluff import tournament
+
+
+def run(argv):
+    output = io.StringIO()
+    with redirect_stdout(output):
+        cli.main(argv)
+    return output.getvalue()
+
+
+# no class or method docstrings in tests
+# pylint: disable=missing-class-docstring, missing-function-docstring
+class TestMain(unittest.TestCase):
+    def test_play(self):
+        output = run(["play", "MaxAgent", "SimpleAgent", "--seed", "0"])
+        winner = tournament.play_game(
+            [cmb.agents.MaxAgent(), cmb.agents.SimpleAgent()], seed=0
+        ).winner
+        self.assertIn(f"Player {winner} wins!", output)
+
+    def test_play_is_reproducible(self):
+        argv = ["play", "SimpleAgent", "SimpleAgent", "SimpleAgent", "--seed", "0"]
+        self.assertEqual(run(argv), run(argv))
+
+    def test_simulate(self):
+        output = run(
+            ["simulate", "MaxAgent", "MaxAgent", "--games", "20", "--workers", "1"]
+        )
+        self.assertIn("Win percentages after 20 games", output)
+
+    def test_replay(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "games.cmbr")
+            agents = [cmb.agents.MaxAgent(), cmb.agents.SimpleAgent()]
+            with replay.ReplayWriter(path) as recorder:
+                winners = [
+                    tournament.play_game(agents, seed, recorder=recorder).winner
+                    for seed in range(3)
+                ]
+            output = run(["replay", path])
+        for index, winner in enumerate(winners):
+            self.assertIn(f"Game {index}: player {winner} wins.", output)
+        self.assertIn("3 of 3 games replayed.", output)
+
+    def test_merge(self):
+        arguments = ["MaxAgent", "SimpleAgent", "--games", "30", "--seed", "4"]
+        arguments += ["--workers", "1", "--chunk-size", "10"]
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, f"shard{index}.json") for index in (0, 1)]
+            for index, path in enumerate(paths):
+                run(
+                    ["simulate", *arguments, "--shard-count", "2"]
+                    + ["--shard-index", str(index), "--output", path]
+                )
+            merged = run(["merge", *reversed(paths)])
+        self.assertEqual(merged, run(["simulate", *arguments]))
+
+    def test_merge_rejects_a_repeated_shard(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "shard0.json")
+            run(
+                ["simulate", "MaxAgent", "MaxAgent", "--games", "10", "--seed", "1"]
+                + ["--workers", "1", "--shard-count", "2", "--output", path]
+            )
+            with self.assertRaises(SystemExit) as context:
+                run(["merge", path, path])
+        self.assertEqual(context.exception.code, "merge: Cannot merge a shard twice.")
+
+    def test_startup_seconds_from_another_directory(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            self.addCleanup(os.chdir, cwd)
+            with mock.patch.dict(os.environ, {"PYTHONPATH": ""}):
+                seconds = cli.startup_seconds("import call_my_bluff.rules", repeat=1)
+        self.assertGreater(seconds, 0)
@@ -0,0 +1,72 @@
+"""
+This module contains tests for the call_my_bluff.probability module.
+"""
+import math
+import unittest
+
+import numpy as np
+
+import call_my_bluff as cmb
+
+
+def binomial_tail(num_unknown, probability, needed):
+    return sum(
+        math.comb(num_unknown, k)
+        * probability**k
+        * (1 - probability) ** (num_unknown - k)
+        for k in range(max(needed, 0), num_unknown + 1)
+    )
+
+
+# no class or method docstrings in tests
+# pylint: disable=missing-class-docstring, missing-function-docstring
+class TestProbability(unittest.TestCase):
+    def test_tail_table_matches_binomial(self):
+        table = cmb.probability.tail_table(12)
+        for num_unknown in range(13):
+            for needed in range(num_unknown + 2):
+                self.assertAlmostEqual(
+                    table[num_unknown, 0, needed],
+                    binomial_tail(num_unknown, 1 / 3, needed),
+                )
+                self.assertAlmostEqual(
+                    table[num_unknown, 1, needed],
+                    binomial_tail(num_unknown, 1 / 6, needed),
+                )
+
+    def test_tail_table_is_cached_and_read_only(self):
+        table = cmb.probability.tail_table(5)
+        self.assertIs(table, cmb.probability.tail_table(7))
+        with self.assertRaises(ValueError):
+            table[0, 0, 0] = 0.5
+
+    def test_bet_probabilities(self):
+        state = cmb.game.initialize_game(3, seed=0)
+        state.dice[state.player_curr] = [0, 0, 5, 2, 3]
+        observation = cmb.game.player_observation(state)
+        probabilities = cmb.probability.bet_probabilities(observation)
+        self.assertEqual(probabilities.shape, (cmb.game.MAX_BET_INDEX + 1,))
+        for index in range(cmb.game.MAX_BET_INDEX + 1):
+            bet = cmb.game.Bet(index=index)
+            known = observation.known_dice[state.player_curr]
+            matches = known.count(bet.dice_value)
+            probability = 1 / 6
+            if bet.dice_value != cmb.game.STAR:
+                matches += known.count(cmb.game.STAR)
+                probability = 1 / 3
+            self.assertAlmostEqual(
+                probabilities[index],
+                binomial_tail(10, probability, bet.num_dice - matches),
+            )
+
+    def test_batched_probabilities(self):
+        known_counts = np.array([[3, 0, 0, 0, 0, 1], [0, 0, 0, 0, 0, 0]])
+        probabilities = cmb.probability.bet_probabilities_from_counts(
+            known_counts, np.array([0, 40])
+        )
+        self.assertEqual(probabilities.shape, (2, cmb.game.MAX_BET_INDEX + 1))
+        four_zeros = cmb.game.Bet(num_dice=4, dice_value=0).index
+        five_zeros = cmb.game.Bet(num_dice=5, dice_value=0).index
+        self.assertEqual(probabilities[0, four_zeros], 1.0)
+        self.assertEqual(probabilities[0, five_zeros], 0.0)
+        self.assertTrue(np.all(np.diff(probabilities[1, :5]) == 0))
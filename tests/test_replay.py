@@ -0,0 +1,110 @@
+"""
+This module contains tests for the call_my_bluff.replay module.
+"""
+from unittest import mock
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import call_my_bluff as cmb
+from call_my_bluff import replay
+from call_my_bluff import tournament
+
+
+# no class or method docstrings in tests
+# pylint: disable=missing-class-docstring, missing-function-docstring
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "games.cmbr")
+
+    def record(self, agents, seeds):
+        results = []
+        with replay.ReplayWriter(self.path, buffer_size=64) as recorder:
+            for seed in seeds:
+                results.append(tournament.play_game(agents, seed, recorder=recorder))
+        return results
+
+    def test_replay_matches_recorded_games(self):
+        agents = [cmb.agents.MaxAgent(), cmb.agents.SimpleAgent()]
+        results = self.record(agents, range(5))
+        reader = replay.ReplayReader(self.path)
+        self.assertEqual(reader.num_games, 5)
+        for index, result in enumerate(results):
+            state = reader.replay(index)
+            self.assertTrue(cmb.game.game_over(state))
+            self.assertEqual(state.player_curr, result.winner)
+
+    def test_large_tables_round_trip(self):
+        state = cmb.game.initialize_game(150, seed=2)
+        agent = cmb.agents.MaxAgent()
+        with replay.ReplayWriter(self.path) as recorder:
+            recorder.start_game(state, 2)
+            while not cmb.game.round_over(state):
+                observation = cmb.game.player_observation(state)
+                state = cmb.game.player_action(state, agent.policy(observation))
+            recorder.record_round(state)
+        reader = replay.ReplayReader(self.path)
+        self.assertEqual(int(reader.records[0]["player"]), 150)
+        result = reader.records[-1]
+        self.assertEqual(
+            tuple(int(result[field]) for field in ("loser", "dice_lost")),
+            state.action_log[-1].result[:2],
+        )
+        self.assertGreater(int(result["actual_num_dice"]), 127)
+        replayed = reader.replay(0)
+        self.assertEqual(replayed.num_dice, state.num_dice)
+        self.assertEqual(replayed.player_curr, state.player_curr)
+
+    def test_columns_are_memory_mapped(self):
+        agents = [
+            cmb.agents.MaxAgent(),
+            cmb.agents.SimpleAgent(),
+            cmb.agents.MaxAgent(),
+        ]
+        results = self.record(agents, [3, 4])
+        reader = replay.ReplayReader(self.path)
+        self.assertIsInstance(reader.records, np.memmap)
+        self.assertEqual(
+            reader.action_mask().sum(), sum(result.num_turns for result in results)
+        )
+        calls = reader.records["kind"] == cmb.game.ActionType.CALL.value
+        self.assertEqual(calls.sum(), sum(result.num_rounds for result in results))
+        results_mask = reader.records["kind"] == cmb.game.ActionType.RESULT.value
+        self.assertTrue(np.all(reader.records["loser"][results_mask] >= -1))
+        self.assertEqual(reader.game_records(1)[0]["value"], 4)
+
+    def test_records_are_16_aligned_bytes(self):
+        self.assertEqual(replay.RECORD_DTYPE.itemsize, 16)
+        for dtype, offset in replay.RECORD_DTYPE.fields.values():
+            self.assertEqual(offset % dtype.itemsize, 0)
+
+    def test_game_starts_are_found_across_chunks(self):
+        agents = [cmb.agents.MaxAgent(), cmb.agents.SimpleAgent()]
+        self.record(agents, range(4))
+        expected = replay.ReplayReader(self.path).game_starts
+        with mock.patch.object(replay, "SCAN_CHUNK_SIZE", 7):
+            reader = replay.ReplayReader(self.path)
+            np.testing.assert_array_equal(reader.game_starts, expected)
+        self.assertEqual(reader.num_games, 4)
+        self.assertEqual(reader.game_starts[-1], len(reader.records))
+
+    def test_replay_rejects_tampered_file(self):
+        self.record([cmb.agents.MaxAgent(), cmb.agents.MaxAgent()], [0])
+        records = np.memmap(
+            self.path, dtype=replay.RECORD_DTYPE, mode="r+", offset=replay.HEADER_SIZE
+        )
+        records[0]["value"] += 1
+        records.flush()
+        del records
+        with self.assertRaises(ValueError):
+            replay.ReplayReader(self.path).replay(0)
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as file:
+            file.write(b"not a replay file")
+        with self.assertRaises(ValueError):
+            replay.ReplayReader(self.path)
@@ -0,0 +1,29 @@
+"""
+This module contains tests for the call_my_bluff.rules module.
+"""
+import subprocess
+import sys
+import unittest
+
+import call_my_bluff as cmb
+from call_my_bluff import rules
+
+
+# no class or method docstrings in tests
+# pylint: disable=missing-class-docstring, missing-function-docstring
+class TestRules(unittest.TestCase):
+    def test_imports_without_numpy(self):
+        code = (
+            "import sys, call_my_bluff, call_my_bluff.rules; "
+            "print('numpy' in sys.modules)"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code], check=True, capture_output=True, text=True
+        )
+        self.assertEqual(output.stdout.strip(), "False")
+
+    def test_game_reexports_rules(self):
+        self.assertIs(cmb.game.Bet, rules.Bet)
+        self.assertIs(cmb.game.Action, rules.Action)
+        self.assertIs(cmb.game.Bet(index=12), rules.BETS[13])
+        self.assertEqual(rules.Bet(num_dice=3, dice_value=1).index, 12)
@@ -0,0 +1,84 @@
+"""
+This module contains tests for the call_my_bluff.search module.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import unittest
+
+import numpy as np
+
+import call_my_bluff as cmb
+from call_my_bluff import search
+from call_my_bluff import tournament
+
+
+def bet(state, index, dice_to_lock=None):
+    action_type = cmb.game.ActionType.BET
+    if dice_to_lock is not None:
+        action_type = cmb.game.ActionType.REROLL_BET
+    return cmb.game.player_action(
+        state,
+        cmb.game.Action(
+            type=action_type,
+            bet=cmb.game.Bet(index=index),
+            dice_to_lock=dice_to_lock,
+        ),
+    )
+
+
+# no class or method docstrings in tests
+# pylint: disable=missing-class-docstring, missing-function-docstring
+class TestSearch(unittest.TestCase):
+    def test_determinize_keeps_known_dice(self):
+        state = cmb.game.initialize_game(3, seed=0)
+        locker = state.player_curr
+        state = bet(state, 2, [True, True, False, False, False])
+        observation = cmb.game.player_observation(state)
+        rng = np.random.default_rng(0)
+        for _ in range(10):
+            sample = search.determinize(observation, rng)
+            self.assertEqual(sample.player_curr, observation.player)
+            self.assertEqual(sample.player_prev, locker)
+            self.assertEqual(
+                sample.dice[observation.player], state.dice[observation.player]
+            )
+            self.assertEqual(sample.dice[locker][:2], state.dice[locker][:2])
+            self.assertEqual(sample.dice_locked[locker], [True] * 2 + [False] * 3)
+            self.assertEqual([len(dice) for dice in sample.dice], [5, 5, 5])
+
+    def test_candidate_actions_are_legal(self):
+        state = cmb.game.initialize_game(2, seed=1)
+        state = bet(state, 10)
+        observation = cmb.game.player_observation(state)
+        candidates = search.candidate_actions(observation, num_bets=4)
+        self.assertEqual(candidates[0].type, cmb.game.ActionType.CALL)
+        for action in candidates:
+            # raises ValueError if the action is illegal
+            cmb.game._validate_action(state, action)  # pylint: disable=protected-access
+
+    def test_calls_an_impossible_bet(self):
+        state = cmb.game.initialize_game(2, seed=2)
+        state = bet(state, cmb.game.Bet(num_dice=11, dice_value=0).index)
+        observation = cmb.game.player_observation(state)
+        action = search.SearchAgent(iterations=50, seed=0).policy(observation)
+        self.assertEqual(action.type, cmb.game.ActionType.CALL)
+
+    def test_plays_full_games(self):
+        lineup = [
+            search.SearchAgent(iterations=20, seed=0),
+            cmb.agents.MaxAgent(),
+            cmb.agents.SimpleAgent(),
+        ]
+        for seed in range(3):
+            result = tournament.play_game(lineup, seed=seed)
+            self.assertIn(result.winner, [0, 1, 2])
+
+    def test_executor_runs_parallel_searches(self):
+        state = cmb.game.initialize_game(3, seed=3)
+        state = bet(state, 5)
+        observation = cmb.game.player_observation(state)
+        with ThreadPoolExecutor(2) as executor:
+            agent = search.SearchAgent(
+                iterations=40, executor=executor, num_workers=2, seed=0
+            )
+            action = agent.policy(observation)
+        self.assertIn(action, search.candidate_actions(observation))
@@ -0,0 +1,120 @@
+"""
+This module contains tests for the call_my_bluff.server module.
+"""
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import unittest
+
+import call_my_bluff as cmb
+from call_my_bluff import server
+
+
+class SilentClient:
+    # Connects and never answers a move
+    def __init__(self, port):
+        self.port = port
+
+    async def run(self):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        writer.write(b'{"type": "hello", "name": "Silent"}\n')
+        async for line in reader:
+            if json.loads(line)["type"] == "close":
+                break
+        writer.close()
+
+
+# no class or method docstrings in tests
+# pylint: disable=missing-class-docstring, missing-function-docstring
+class TestCodecs(unittest.TestCase):
+    def test_observation_round_trip(self):
+        state = cmb.game.initialize_game(3, seed=0)
+        state = cmb.game.player_action(
+            state,
+            cmb.game.Action(
+                type=cmb.game.ActionType.REROLL_BET,
+                bet=cmb.game.Bet(index=4),
+                dice_to_lock=[True, False, False, False, False],
+            ),
+        )
+        observation = cmb.game.player_observation(state)
+        data = json.loads(json.dumps(server.observation_to_json(observation)))
+        rebuilt = server.observation_from_json(data)
+        self.assertEqual(rebuilt.known_dice, observation.known_dice)
+        self.assertEqual(rebuilt.bet, observation.bet)
+        self.assertEqual(list(rebuilt.action_log), list(observation.action_log))
+
+    def test_action_round_trip(self):
+        action = cmb.game.Action(
+            type=cmb.game.ActionType.REROLL_BET,
+            bet=cmb.game.Bet(index=9),
+            dice_to_lock=(False, True),
+        )
+        self.assertEqual(server.action_from_json(server.action_to_json(action)), action)
+        with self.assertRaises(ValueError):
+            server.action_from_json({"type": "SHOUT"})
+        with self.assertRaises(ValueError):
+            server.action_from_json(None)
+
+    def test_forced_action(self):
+        state = cmb.game.initialize_game(2, seed=0)
+        self.assertEqual(server.forced_action(state).type, cmb.game.ActionType.BET)
+        state = cmb.game.player_action(state, server.forced_action(state))
+        self.assertEqual(server.forced_action(state).type, cmb.game.ActionType.CALL)
+
+
+class TestServer(unittest.IsolatedAsyncioTestCase):
+    async def test_tables_run_concurrently_over_tcp(self):
+        game_server = server.GameServer(2, num_games=6, move_timeout=5, seed=0)
+        await game_server.start(port=0)
+        clients = [
+            server.AgentClient(cmb.agents.MaxAgent()),
+            server.AgentClient(cmb.agents.SimpleAgent()),
+            server.AgentClient(cmb.agents.MaxAgent()),
+            server.AgentClient(cmb.agents.SimpleAgent()),
+        ]
+        runs = [
+            asyncio.create_task(client.run(port=game_server.port)) for client in clients
+        ]
+        results = await asyncio.wait_for(game_server.wait_finished(), 30)
+        played = await asyncio.gather(*runs)
+        self.assertEqual([result.table for result in results], list(range(6)))
+        self.assertEqual(sum(played), 12)
+        for result in results:
+            self.assertIn(result.result.winner, [0, 1])
+            self.assertEqual(result.forced_moves, [0, 0])
+
+    async def test_timed_out_moves_are_forced(self):
+        game_server = server.GameServer(2, num_games=1, move_timeout=0.01, seed=1)
+        await game_server.start(port=0)
+        silent = SilentClient(game_server.port)
+        runs = [
+            asyncio.create_task(silent.run()),
+            asyncio.create_task(
+                server.AgentClient(cmb.agents.MaxAgent()).run(port=game_server.port)
+            ),
+        ]
+        results = await asyncio.wait_for(game_server.wait_finished(), 30)
+        await asyncio.gather(*runs)
+        (result,) = results
+        silent_player = result.agent_names.index("Silent")
+        self.assertGreater(result.forced_moves[silent_player], 0)
+        self.assertEqual(result.forced_moves[1 - silent_player], 0)
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "needs Unix sockets")
+    async def test_unix_socket(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "server.sock")
+            game_server = server.GameServer(3, num_games=2, seed=2)
+            await game_server.start(path=path)
+            runs = [
+                asyncio.create_task(
+                    server.AgentClient(cmb.agents.MaxAgent()).run(path=path)
+                )
+                for _ in range(3)
+            ]
+            results = await asyncio.wait_for(game_server.wait_finished(), 30)
+            await asyncio.gather(*runs)
+        self.assertEqual(len(results), 2)
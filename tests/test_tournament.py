@@ -0,0 +1,123 @@
+"""
+This module contains tests for the call_my_bluff.tournament module.
+"""
+import unittest
+
+import numpy as np
+
+import call_my_bluff as cmb
+from call_my_bluff import tournament
+
+
+# no class or method docstrings in tests
+# pylint: disable=missing-class-docstring, missing-function-docstring
+class TestTournament(unittest.TestCase):
+    def test_play_game_returns_winner(self):
+        agents = [cmb.agents.MaxAgent(), cmb.agents.SimpleAgent()]
+        result = tournament.play_game(agents, seed=0)
+        self.assertIn(result.winner, [0, 1])
+        self.assertEqual(sorted(result.turn_order), [0, 1])
+        self.assertGreater(result.num_rounds, 0)
+
+    def test_play_game_is_reproducible(self):
+        agents = [cmb.agents.SimpleAgent(), cmb.agents.SimpleAgent()]
+        first = tournament.play_game(agents, seed=5)
+        second = tournament.play_game(agents, seed=5)
+        self.assertEqual(first, second)
+
+    def test_statistics_add_up(self):
+        lineup = [cmb.agents.MaxAgent, cmb.agents.SimpleAgent, cmb.agents.SimpleAgent]
+        result = tournament.run_tournament(lineup, 30, num_workers=1, seed=1)
+        self.assertEqual(result.num_games, 30)
+        self.assertEqual(result.wins.sum(), 30)
+        self.assertEqual(result.seat_wins.sum(), 30)
+        self.assertTrue(np.all(result.seat_games.sum(axis=0) == 30))
+        self.assertTrue(np.all(result.seat_games.sum(axis=1) == 30))
+
+    def test_result_independent_of_workers(self):
+        lineup = [cmb.agents.MaxAgent, cmb.agents.SimpleAgent]
+        single = tournament.run_tournament(
+            lineup, 40, num_workers=1, chunk_size=10, seed=3
+        )
+        pooled = tournament.run_tournament(
+            lineup, 40, num_workers=2, chunk_size=10, seed=3
+        )
+        self.assertTrue(np.array_equal(single.wins, pooled.wins))
+        self.assertTrue(np.array_equal(single.seat_wins, pooled.seat_wins))
+        self.assertEqual(single.num_turns, pooled.num_turns)
+
+    def test_in_process_run_keeps_global_random_state(self):
+        np.random.seed(11)
+        expected = np.random.random()
+        np.random.seed(11)
+        tournament.run_tournament([cmb.agents.MaxAgent] * 2, 3, num_workers=1, seed=0)
+        self.assertEqual(np.random.random(), expected)
+
+    def test_merge_rejects_other_lineup(self):
+        first = tournament.TournamentResult(agent_names=["A", "B"], seed=0)
+        second = tournament.TournamentResult(agent_names=["A", "C"], seed=0)
+        with self.assertRaises(ValueError):
+            first.merge(second)
+
+    def test_shards_add_up_to_the_tournament(self):
+        lineup = [cmb.agents.MaxAgent, cmb.agents.SimpleAgent, cmb.agents.MaxAgent]
+        expected = tournament.run_tournament(lineup, 70, chunk_size=20, seed=2)
+        shards = [
+            tournament.ShardResult(
+                result=tournament.run_tournament(
+                    lineup,
+                    70,
+                    num_workers=1,
+                    chunk_size=20,
+                    seed=2,
+                    shard_index=index,
+                    shard_count=3,
+                ),
+                num_games=70,
+                chunk_size=20,
+                shard_count=3,
+                shards=[index],
+            )
+            for index in range(3)
+        ]
+        self.assertEqual([shard.result.num_games for shard in shards], [30, 20, 20])
+        merged = tournament.ShardResult.from_json(shards[2].to_json())
+        merged.merge(shards[0])
+        self.assertFalse(merged.complete)
+        with self.assertRaises(ValueError):
+            merged.merge(shards[0])
+        merged.merge(shards[1])
+        self.assertTrue(merged.complete)
+        self.assertEqual(merged.shards, [0, 1, 2])
+        self.assertEqual(merged.result.to_json(), expected.to_json())
+        self.assertEqual(
+            tournament.format_result(merged.result), tournament.format_result(expected)
+        )
+
+    def test_load_agent(self):
+        self.assertIs(tournament.load_agent("MaxAgent"), cmb.agents.MaxAgent)
+        self.assertIs(
+            tournament.load_agent("call_my_bluff.agents:SimpleAgent"),
+            cmb.agents.SimpleAgent,
+        )
+        with self.assertRaises(ValueError):
+            tournament.load_agent("NoSuchAgent")
+
+    def test_round_results_are_shared(self):
+        class RecordingAgent(cmb.agents.MaxAgent):
+            ignores_round_results = False
+
+            def __init__(self):
+                super().__init__()
+                self.results = []
+
+            def round_results(self, result):
+                self.results.append(result)
+
+        agents = [RecordingAgent(), RecordingAgent(), cmb.agents.SimpleAgent()]
+        tournament.play_game(agents, seed=2)
+        self.assertGreater(len(agents[0].results), 0)
+        self.assertEqual(len(agents[0].results), len(agents[1].results))
+        self.assertTrue(
+            all(a is b for a, b in zip(agents[0].results, agents[1].results))
+        )